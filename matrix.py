@@ -18,56 +18,181 @@ from mpl_toolkits.mplot3d import Axes3D
 import plotly.graph_objects as go
 import plotly.figure_factory as ff
 from plotly.subplots import make_subplots
-import trimesh
+import gzip
 import json
+import math
 import os
+import re
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Tuple, Dict, Optional, Union
+from typing import Callable, List, Tuple, Dict, Optional, Union
 import warnings
 warnings.filterwarnings('ignore')
 
 class Vector3D:
     """Clase para manejar vectores 3D con operaciones matemáticas"""
-    
+
+    __slots__ = ('x', 'y', 'z')
+
     def __init__(self, x: float = 0, y: float = 0, z: float = 0):
         self.x, self.y, self.z = float(x), float(y), float(z)
-    
+
+    def __repr__(self):
+        return f"Vector3D({self.x}, {self.y}, {self.z})"
+
+    def __iter__(self):
+        yield self.x
+        yield self.y
+        yield self.z
+
     def __add__(self, other):
+        if isinstance(other, VectorArray):
+            return NotImplemented
         return Vector3D(self.x + other.x, self.y + other.y, self.z + other.z)
-    
+
     def __sub__(self, other):
+        if isinstance(other, VectorArray):
+            return NotImplemented
         return Vector3D(self.x - other.x, self.y - other.y, self.z - other.z)
-    
+
     def __mul__(self, scalar):
         return Vector3D(self.x * scalar, self.y * scalar, self.z * scalar)
-    
+
     def cross(self, other):
         """Producto cruzado"""
+        if isinstance(other, VectorArray):
+            return VectorArray(np.cross(self.to_array(), other.data))
         return Vector3D(
             self.y * other.z - self.z * other.y,
             self.z * other.x - self.x * other.z,
             self.x * other.y - self.y * other.x
         )
-    
+
     def dot(self, other):
         """Producto punto"""
+        if isinstance(other, VectorArray):
+            return other.dot(self)
         return self.x * other.x + self.y * other.y + self.z * other.z
-    
+
     def magnitude(self):
         """Magnitud del vector"""
-        return np.sqrt(self.x**2 + self.y**2 + self.z**2)
-    
+        return math.sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
+
     def normalize(self):
         """Normalizar vector"""
         mag = self.magnitude()
         if mag == 0:
             return Vector3D(0, 0, 0)
         return Vector3D(self.x/mag, self.y/mag, self.z/mag)
-    
+
     def to_array(self):
         """Convertir a numpy array"""
         return np.array([self.x, self.y, self.z])
 
+def _vector_operand(other):
+    """Convertir un operando (Vector3D, VectorArray, array o escalar) a algo difundible"""
+    if isinstance(other, VectorArray):
+        return other.data
+    if isinstance(other, Vector3D):
+        return np.array((other.x, other.y, other.z))
+    return np.asarray(other, dtype=np.float64)
+
+class VectorArray:
+    """Lote de vectores 3D en un array (N, 3) con las mismas operaciones que Vector3D"""
+
+    __slots__ = ('data',)
+
+    def __init__(self, data=None):
+        if data is None:
+            data = np.empty((0, 3))
+        if isinstance(data, VectorArray):
+            data = data.data
+        elif not isinstance(data, np.ndarray):
+            data = [tuple(v) if isinstance(v, Vector3D) else v for v in data]
+        self.data = np.asarray(data, dtype=np.float64).reshape(-1, 3)
+
+    @classmethod
+    def from_vectors(cls, vectors: List[Vector3D]) -> 'VectorArray':
+        """Crear desde una lista de Vector3D"""
+        return cls(np.array([(v.x, v.y, v.z) for v in vectors], dtype=np.float64))
+
+    def to_vectors(self) -> List[Vector3D]:
+        """Convertir a lista de Vector3D"""
+        return [Vector3D(x, y, z) for x, y, z in self.data.tolist()]
+
+    def to_array(self) -> np.ndarray:
+        """Array (N, 3) subyacente"""
+        return self.data
+
+    @property
+    def x(self) -> np.ndarray:
+        return self.data[:, 0]
+
+    @property
+    def y(self) -> np.ndarray:
+        return self.data[:, 1]
+
+    @property
+    def z(self) -> np.ndarray:
+        return self.data[:, 2]
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        selected = self.data[index]
+        if selected.ndim == 1:
+            return Vector3D(*selected.tolist())
+        return VectorArray(selected)
+
+    def __iter__(self):
+        return iter(self.to_vectors())
+
+    def __repr__(self):
+        return f"VectorArray({len(self.data)} vectores)"
+
+    def __add__(self, other):
+        return VectorArray(self.data + _vector_operand(other))
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return VectorArray(self.data - _vector_operand(other))
+
+    def __rsub__(self, other):
+        return VectorArray(_vector_operand(other) - self.data)
+
+    def __mul__(self, scalar):
+        scalar = np.asarray(scalar, dtype=np.float64)
+        if scalar.ndim == 1:
+            scalar = scalar[:, None]
+        return VectorArray(self.data * scalar)
+
+    __rmul__ = __mul__
+
+    def cross(self, other) -> 'VectorArray':
+        """Producto cruzado fila a fila"""
+        return VectorArray(np.cross(self.data, _vector_operand(other)))
+
+    def dot(self, other) -> np.ndarray:
+        """Producto punto fila a fila"""
+        other = _vector_operand(other)
+        if other.ndim == 1:
+            return self.data @ other
+        return np.einsum('ij,ij->i', self.data, other)
+
+    def magnitude(self) -> np.ndarray:
+        """Magnitud de cada vector"""
+        return np.sqrt(np.einsum('ij,ij->i', self.data, self.data))
+
+    def normalize(self) -> 'VectorArray':
+        """Normalizar cada vector (los vectores nulos quedan en cero)"""
+        mag = self.magnitude()
+        safe = np.where(mag == 0, 1.0, mag)
+        return VectorArray(self.data / safe[:, None])
+
 class Transformations3D:
     """Clase para manejar transformaciones 3D (rotación, traslación, escala)"""
     
@@ -124,382 +249,3159 @@ class Transformations3D:
             [0, 0, 0, 1]
         ])
 
+    @staticmethod
+    def apply_to_points(matrix: np.ndarray, points: np.ndarray) -> np.ndarray:
+        """Aplicar una matriz 4x4 a un array (N, 3) de puntos en un solo producto"""
+        matrix = np.asarray(matrix, dtype=np.float64)
+        transformed = points @ matrix[:3, :3].T + matrix[:3, 3]
+        projective = matrix[3]
+        if np.array_equal(projective, (0, 0, 0, 1)):
+            return transformed
+        # Transformación proyectiva: dividir por la coordenada homogénea
+        w = points @ projective[:3] + projective[3]
+        return transformed / w[:, None]
+
+def _to_vertex_array(data) -> np.ndarray:
+    """Convertir vértices (Vector3D, listas o arrays) a un array contiguo (N, 3)"""
+    if isinstance(data, VertexView):
+        return data.geometry.vertex_array.copy()
+    if isinstance(data, VectorArray):
+        return data.data.copy()
+    if isinstance(data, np.ndarray):
+        return np.ascontiguousarray(data, dtype=np.float64).reshape(-1, 3)
+    data = list(data)
+    if data and isinstance(data[0], Vector3D):
+        return np.array([(v.x, v.y, v.z) for v in data], dtype=np.float64).reshape(-1, 3)
+    return np.asarray(data, dtype=np.float64).reshape(-1, 3)
+
+def _to_face_arrays(faces) -> Tuple[np.ndarray, np.ndarray]:
+    """Convertir lista de caras a índices planos más offsets (estilo CSR)"""
+    if isinstance(faces, FaceView):
+        return faces.geometry.face_indices.copy(), faces.geometry.face_offsets.copy()
+    faces = [list(face) for face in faces]
+    sizes = np.fromiter((len(face) for face in faces), dtype=np.int64, count=len(faces))
+    offsets = np.zeros(len(faces) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    indices = np.fromiter((idx for face in faces for idx in face),
+                          dtype=np.int64, count=int(offsets[-1]))
+    return indices, offsets
+
+def _frozen(array: np.ndarray) -> np.ndarray:
+    """Vista de sólo lectura: las ediciones deben pasar por los setters (y limpiar cachés)"""
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+def _is_rigid_affine(matrix: np.ndarray) -> bool:
+    """Transformación afín invertible (conserva convexidad y triangulación de las caras)"""
+    return (np.array_equal(matrix[3], (0, 0, 0, 1))
+            and abs(np.linalg.det(matrix[:3, :3])) > 1e-12)
+
+def _fan_triangles(indices: np.ndarray, offsets: np.ndarray,
+                   face_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Triangulación en abanico vectorizada de polígonos en formato índices + offsets"""
+    sizes = np.diff(offsets)
+    tri_counts = sizes - 2
+    face_of_tri = np.repeat(np.arange(len(sizes)), tri_counts)
+    first = np.repeat(np.cumsum(tri_counts) - tri_counts, tri_counts)
+    j = np.arange(len(face_of_tri)) - first + 1
+    start = offsets[face_of_tri]
+    triangles = np.stack([indices[start], indices[start + j], indices[start + j + 1]], axis=1)
+    return triangles.reshape(-1, 3), face_ids[face_of_tri]
+
+def _polygon_normals(vertices: np.ndarray, indices: np.ndarray,
+                     offsets: np.ndarray) -> np.ndarray:
+    """Normales de Newell (sin normalizar, módulo = 2 * área) de cada polígono"""
+    sizes = np.diff(offsets)
+    if not np.all(sizes > 0):
+        # reduceat no admite tramos vacíos: las caras vacías quedan en cero
+        normals = np.zeros((len(sizes), 3))
+        filled = sizes > 0
+        if filled.any():
+            filled_offsets = np.zeros(int(filled.sum()) + 1, dtype=np.int64)
+            np.cumsum(sizes[filled], out=filled_offsets[1:])
+            normals[filled] = _polygon_normals(vertices, indices, filled_offsets)
+        return normals
+    following = np.arange(1, len(indices) + 1)
+    following[offsets[1:] - 1] = offsets[:-1]
+    edge_cross = np.cross(vertices[indices], vertices[indices[following]])
+    if len(edge_cross) == 0:
+        return np.empty((0, 3))
+    return np.add.reduceat(edge_cross, offsets[:-1], axis=0)
+
+def _concave_polygons(vertices: np.ndarray, indices: np.ndarray,
+                      offsets: np.ndarray) -> np.ndarray:
+    """Máscara de polígonos con alguna esquina reflexa respecto a su normal"""
+    sizes = np.diff(offsets)
+    face_of_element = np.repeat(np.arange(len(sizes)), sizes)
+    following = np.arange(1, len(indices) + 1)
+    following[offsets[1:] - 1] = offsets[:-1]
+    previous = np.arange(-1, len(indices) - 1)
+    previous[offsets[:-1]] = offsets[1:] - 1
+
+    normals = _polygon_normals(vertices, indices, offsets)
+    corner = vertices[indices]
+    turn = np.cross(corner - vertices[indices[previous]], vertices[indices[following]] - corner)
+    alignment = np.einsum('ij,ij->i', turn, normals[face_of_element])
+    tolerance = 1e-9 * np.linalg.norm(turn, axis=1) * np.linalg.norm(normals[face_of_element], axis=1)
+    reflex = alignment < -tolerance
+    return np.bincount(face_of_element, weights=reflex, minlength=len(sizes)) > 0
+
+def _ear_clip(points: np.ndarray, polygon: List[int]) -> List[Tuple[int, int, int]]:
+    """Triangular un polígono simple (posiblemente cóncavo) por recorte de orejas
+
+    `points` son las coordenadas 2D del polígono; los triángulos conservan
+    el sentido de giro original.
+    """
+    x, y = points[:, 0], points[:, 1]
+    orientation = 1.0 if np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y) >= 0 else -1.0
+    remaining = list(range(len(polygon)))
+    triangles = []
+
+    def turn(a, b, c):
+        return orientation * ((points[b, 0] - points[a, 0]) * (points[c, 1] - points[b, 1])
+                              - (points[b, 1] - points[a, 1]) * (points[c, 0] - points[b, 0]))
+
+    while len(remaining) > 3:
+        count = len(remaining)
+        for i in range(count):
+            a, b, c = remaining[i - 1], remaining[i], remaining[(i + 1) % count]
+            if turn(a, b, c) <= 0:
+                continue  # Esquina reflexa o degenerada
+            others = [k for k in remaining if k not in (a, b, c)]
+            p = points[others]
+            inside = ((orientation * np.cross(points[b] - points[a], p - points[a]) >= 0)
+                      & (orientation * np.cross(points[c] - points[b], p - points[b]) >= 0)
+                      & (orientation * np.cross(points[a] - points[c], p - points[c]) >= 0))
+            if inside.any():
+                continue
+            triangles.append((polygon[a], polygon[b], polygon[c]))
+            del remaining[i]
+            break
+        else:
+            # Polígono degenerado (autointersecante): cerrar el resto en abanico
+            triangles.extend((polygon[remaining[0]], polygon[remaining[k]], polygon[remaining[k + 1]])
+                             for k in range(1, len(remaining) - 1))
+            return triangles
+    triangles.append(tuple(polygon[k] for k in remaining))
+    return triangles
+
+def triangulate_polygons(vertices: np.ndarray, indices: np.ndarray,
+                         offsets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Triangular caras poligonales (índices + offsets)
+
+    Los triángulos y polígonos convexos se resuelven en abanico de forma
+    vectorizada; sólo los polígonos cóncavos pasan por recorte de orejas.
+    Devuelve los triángulos (T, 3) y la cara de origen de cada uno.
+    """
+    sizes = np.diff(offsets)
+    face_ids = np.flatnonzero(sizes >= 3)
+    if len(face_ids) < len(sizes):
+        element_keep = np.repeat(sizes >= 3, sizes)
+        indices = indices[element_keep]
+        offsets = np.zeros(len(face_ids) + 1, dtype=np.int64)
+        np.cumsum(sizes[face_ids], out=offsets[1:])
+        sizes = sizes[face_ids]
+
+    concave = np.zeros(len(sizes), dtype=bool)
+    polygons = np.flatnonzero(sizes > 3)
+    if len(polygons):
+        poly_sizes = sizes[polygons]
+        poly_offsets = np.zeros(len(polygons) + 1, dtype=np.int64)
+        np.cumsum(poly_sizes, out=poly_offsets[1:])
+        poly_indices = indices[np.repeat(offsets[polygons], poly_sizes)
+                               + np.arange(poly_offsets[-1]) - np.repeat(poly_offsets[:-1], poly_sizes)]
+        concave[polygons] = _concave_polygons(vertices, poly_indices, poly_offsets)
+
+    if not concave.any():
+        return _fan_triangles(indices, offsets, face_ids)
+
+    convex = ~concave
+    element_convex = np.repeat(convex, sizes)
+    convex_offsets = np.zeros(int(convex.sum()) + 1, dtype=np.int64)
+    np.cumsum(sizes[convex], out=convex_offsets[1:])
+    triangles, face_of_tri = _fan_triangles(indices[element_convex], convex_offsets, face_ids[convex])
+
+    ear_triangles, ear_faces = [], []
+    for face in np.flatnonzero(concave):
+        polygon = indices[offsets[face]:offsets[face + 1]]
+        normal = _polygon_normals(vertices, polygon, np.array([0, len(polygon)]))[0]
+        drop = int(np.argmax(np.abs(normal)))
+        points = vertices[polygon][:, [axis for axis in range(3) if axis != drop]]
+        clipped = _ear_clip(points, polygon.tolist())
+        ear_triangles.extend(clipped)
+        ear_faces.extend([face_ids[face]] * len(clipped))
+
+    triangles = np.concatenate([triangles, np.array(ear_triangles, dtype=np.int64).reshape(-1, 3)])
+    face_of_tri = np.concatenate([face_of_tri, np.array(ear_faces, dtype=np.int64)])
+    order = np.argsort(face_of_tri, kind='stable')
+    return triangles[order], face_of_tri[order]
+
+def _connected_labels(count: int, first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """Etiquetar componentes conexas de un grafo dado por parejas (first, second)
+
+    Cada nodo toma el menor índice de su componente: en cada ronda la raíz
+    mayor de cada pareja se engancha a la menor y se comprimen los caminos
+    con salto de punteros, así bastan pocas rondas aun en mallas grandes.
+    """
+    labels = np.arange(count)
+    while len(first):
+        root_first, root_second = labels[first], labels[second]
+        apart = root_first != root_second
+        if not apart.any():
+            break
+        first, second = first[apart], second[apart]
+        np.minimum.at(labels, np.maximum(root_first[apart], root_second[apart]),
+                      np.minimum(root_first[apart], root_second[apart]))
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+    return labels
+
+
+def weld_vertices(vertices: np.ndarray, tolerance: float = 1e-9) -> Tuple[np.ndarray, np.ndarray]:
+    """Fusionar vértices a menos de `tolerance` usando una rejilla hash
+
+    Cada vértice cae en una celda de lado `tolerance` (o mayor, para que las
+    coordenadas de celda quepan en 21 bits y la clave en un entero); sólo
+    se comparan vértices de la misma celda y de las 13 celdas vecinas "hacia
+    delante", así cada pareja se prueba una vez. Los grupos conectados se reducen al
+    vértice de menor índice, que conserva su posición.
+    Devuelve los vértices soldados y el índice nuevo de cada vértice original.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+    count = len(vertices)
+    if count == 0:
+        return vertices.copy(), np.empty(0, dtype=np.int64)
+    tolerance = max(float(tolerance), np.finfo(np.float64).tiny)
+
+    origin = vertices.min(axis=0)
+    cell_size = max(tolerance, float((vertices.max(axis=0) - origin).max()) / (2 ** 21 - 4))
+    cells = np.floor((vertices - origin) / cell_size).astype(np.int64) + 1
+    keys = (cells[:, 0] << 42) | (cells[:, 1] << 21) | cells[:, 2]
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    cell_offsets = np.flatnonzero(np.diff(sorted_keys, prepend=-1, append=-1))
+    cell_keys = sorted_keys[cell_offsets[:-1]]
+
+    neighbor_offsets = [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)
+                        if (dx, dy, dz) >= (0, 0, 0)]
+    pair_first, pair_second = [], []
+    for offset in neighbor_offsets:
+        # Las coordenadas desplazadas siguen dentro de sus 21 bits
+        target_keys = cell_keys + ((offset[0] << 42) + (offset[1] << 21) + offset[2])
+        found = np.minimum(np.searchsorted(cell_keys, target_keys), len(cell_keys) - 1)
+        exists = cell_keys[found] == target_keys
+        source_cells, target_cells = np.flatnonzero(exists), found[exists]
+        if not len(source_cells):
+            continue
+        # Todas las parejas (vértice de la celda, vértice de la celda vecina)
+        source_sizes = np.diff(cell_offsets)[source_cells]
+        target_sizes = np.diff(cell_offsets)[target_cells]
+        pair_counts = source_sizes * target_sizes
+        pair_cell = np.repeat(np.arange(len(source_cells)), pair_counts)
+        local = np.arange(pair_counts.sum()) - np.repeat(np.cumsum(pair_counts) - pair_counts, pair_counts)
+        first = order[cell_offsets[source_cells][pair_cell] + local // target_sizes[pair_cell]]
+        second = order[cell_offsets[target_cells][pair_cell] + local % target_sizes[pair_cell]]
+        if offset == (0, 0, 0):
+            keep = first < second
+            first, second = first[keep], second[keep]
+        close = np.einsum('ij,ij->i', vertices[first] - vertices[second],
+                          vertices[first] - vertices[second]) <= tolerance * tolerance
+        pair_first.append(first[close])
+        pair_second.append(second[close])
+
+    first = np.concatenate(pair_first) if pair_first else np.empty(0, dtype=np.int64)
+    second = np.concatenate(pair_second) if pair_second else np.empty(0, dtype=np.int64)
+    representative = _connected_labels(count, first, second)
+
+    kept = representative == np.arange(count)
+    new_index = np.cumsum(kept) - 1
+    return vertices[kept], new_index[representative]
+
+
+def remove_degenerate_faces(indices: np.ndarray, offsets: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Quitar vértices repetidos consecutivos y caras con menos de 3 vértices
+
+    Devuelve índices, offsets y la cara original de cada cara conservada.
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    sizes = np.diff(offsets)
+    face_of_element = np.repeat(np.arange(len(sizes)), sizes)
+    # Siguiente vértice dentro de la misma cara (cíclico)
+    following = np.arange(len(indices)) + 1
+    last = offsets[1:][sizes > 0] - 1
+    following[last] = offsets[:-1][sizes > 0]
+    keep = indices != indices[following] if len(indices) else np.zeros(0, dtype=bool)
+    new_sizes = np.bincount(face_of_element[keep], minlength=len(sizes))
+    faces = np.flatnonzero(new_sizes >= 3)
+    keep &= np.isin(face_of_element, faces)
+    new_offsets = np.zeros(len(faces) + 1, dtype=np.int64)
+    np.cumsum(new_sizes[faces], out=new_offsets[1:])
+    return indices[keep], new_offsets, faces
+
+class MeshAdjacency:
+    """Tablas de adyacencia (semiaristas y CSR) de una malla poligonal
+
+    Se construye una vez con ordenaciones vectorizadas a partir de los
+    índices + offsets de las caras. Cada semiarista va del vértice k de una
+    cara al k + 1; las aristas no dirigidas se numeran por su clave
+    (menor * V + mayor) ordenada. Las consultas por vértice, arista o cara
+    son cortes de arrays CSR.
+    """
+
+    def __init__(self, face_indices: np.ndarray, face_offsets: np.ndarray, vertex_count: int):
+        face_indices = np.asarray(face_indices, dtype=np.int64)
+        face_offsets = np.asarray(face_offsets, dtype=np.int64)
+        sizes = np.diff(face_offsets)
+        self.vertex_count = int(vertex_count)
+        self.face_count = len(sizes)
+        self.face_offsets = _frozen(face_offsets)
+
+        # Semiaristas
+        half_edges = np.arange(len(face_indices))
+        self.half_edge_face = _frozen(np.repeat(np.arange(self.face_count), sizes))
+        following = half_edges + 1
+        following[face_offsets[1:][sizes > 0] - 1] = face_offsets[:-1][sizes > 0]
+        self.half_edge_next = _frozen(following)
+        self.half_edge_origin = _frozen(face_indices)
+        self.half_edge_target = _frozen(face_indices[following])
+
+        # Aristas no dirigidas y sus semiaristas (CSR ordenado por arista)
+        low = np.minimum(self.half_edge_origin, self.half_edge_target)
+        high = np.maximum(self.half_edge_origin, self.half_edge_target)
+        keys = low * self.vertex_count + high
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.diff(sorted_keys, prepend=-1, append=-1))
+        self.edge_keys = _frozen(sorted_keys[starts[:-1]])
+        self.edge_vertices = _frozen(np.stack([low[order[starts[:-1]]], high[order[starts[:-1]]]], axis=1))
+        self.edge_half_edge_offsets = _frozen(starts)
+        self.edge_half_edges = _frozen(order)
+        self.edge_valence = _frozen(np.diff(starts))
+        half_edge_edge = np.empty(len(keys), dtype=np.int64)
+        half_edge_edge[order] = np.repeat(np.arange(len(self.edge_keys)), self.edge_valence)
+        self.half_edge_edge = _frozen(half_edge_edge)
+
+        # Gemela: la otra semiarista de una arista con exactamente dos
+        twin = np.full(len(keys), -1, dtype=np.int64)
+        manifold = np.flatnonzero(self.edge_valence == 2)
+        pair_first, pair_second = order[starts[manifold]], order[starts[manifold] + 1]
+        twin[pair_first], twin[pair_second] = pair_second, pair_first
+        self.half_edge_twin = _frozen(twin)
+
+        # Caras de cada vértice
+        order = np.argsort(face_indices, kind='stable')
+        self.vertex_face_offsets = _frozen(np.searchsorted(face_indices[order], np.arange(self.vertex_count + 1)))
+        self.vertex_faces = _frozen(self.half_edge_face[order])
+
+        # Vecinos de cada vértice a través de las aristas
+        ends = np.concatenate([self.edge_vertices[:, 0], self.edge_vertices[:, 1]])
+        others = np.concatenate([self.edge_vertices[:, 1], self.edge_vertices[:, 0]])
+        order = np.lexsort((others, ends))
+        self.vertex_neighbor_offsets = _frozen(np.searchsorted(ends[order], np.arange(self.vertex_count + 1)))
+        self.vertex_neighbors = _frozen(others[order])
+
+    @property
+    def edge_count(self) -> int:
+        """Número de aristas no dirigidas"""
+        return len(self.edge_keys)
+
+    def edge_id(self, first, second):
+        """Índice de la arista entre dos vértices (-1 si no existe); acepta arrays"""
+        first, second = np.asarray(first, dtype=np.int64), np.asarray(second, dtype=np.int64)
+        keys = np.minimum(first, second) * self.vertex_count + np.maximum(first, second)
+        if not self.edge_count:
+            return np.full(keys.shape, -1) if keys.ndim else -1
+        position = np.minimum(np.searchsorted(self.edge_keys, keys), self.edge_count - 1)
+        found = np.where(self.edge_keys[position] == keys, position, -1)
+        return found if found.ndim else int(found)
+
+    def edge_faces(self, edge: int) -> np.ndarray:
+        """Caras que comparten una arista"""
+        start, end = self.edge_half_edge_offsets[edge], self.edge_half_edge_offsets[edge + 1]
+        return self.half_edge_face[self.edge_half_edges[start:end]]
+
+    def vertex_face_list(self, vertex: int) -> np.ndarray:
+        """Caras que usan un vértice"""
+        return self.vertex_faces[self.vertex_face_offsets[vertex]:self.vertex_face_offsets[vertex + 1]]
+
+    def vertex_neighbor_list(self, vertex: int) -> np.ndarray:
+        """Vértices unidos a `vertex` por una arista"""
+        return self.vertex_neighbors[self.vertex_neighbor_offsets[vertex]:self.vertex_neighbor_offsets[vertex + 1]]
+
+    def face_neighbors(self, face: int) -> np.ndarray:
+        """Caras que comparten alguna arista con `face`"""
+        edges = self.half_edge_edge[self.face_offsets[face]:self.face_offsets[face + 1]]
+        counts = self.edge_valence[edges]
+        slots = (np.repeat(self.edge_half_edge_offsets[edges], counts)
+                 + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts))
+        faces = self.half_edge_face[self.edge_half_edges[slots]]
+        return np.unique(faces[faces != face])
+
+    def boundary_edges(self) -> np.ndarray:
+        """Aristas usadas por una sola cara"""
+        return np.flatnonzero(self.edge_valence == 1)
+
+    def non_manifold_edges(self) -> np.ndarray:
+        """Aristas compartidas por más de dos caras"""
+        return np.flatnonzero(self.edge_valence > 2)
+
+    @property
+    def is_closed(self) -> bool:
+        """Toda arista tiene exactamente dos caras"""
+        return bool(self.edge_count) and bool(np.all(self.edge_valence == 2))
+
+    def face_components(self) -> np.ndarray:
+        """Etiqueta de componente conexa de cada cara (unidas por aristas)
+
+        Las etiquetas se numeran 0..C-1 en orden de aparición.
+        """
+        starts = self.edge_half_edge_offsets[:-1]
+        # Unir la primera cara de cada arista con las demás
+        repeated = np.repeat(starts, self.edge_valence)
+        first = self.half_edge_face[self.edge_half_edges[repeated]]
+        second = self.half_edge_face[self.edge_half_edges]
+        labels = _connected_labels(self.face_count, first, second)
+        _, components = np.unique(labels, return_inverse=True)
+        return components.ravel()
+
+class VertexView:
+    """Vista de compatibilidad: entrega Vector3D sobre el arreglo de vértices"""
+
+    def __init__(self, geometry: 'Geometry3D'):
+        self.geometry = geometry
+
+    def __len__(self):
+        return len(self.geometry.vertex_array)
+
+    def __getitem__(self, index):
+        data = self.geometry.vertex_array[index]
+        if data.ndim == 2:
+            return [Vector3D(x, y, z) for x, y, z in data.tolist()]
+        return Vector3D(*data.tolist())
+
+    def __setitem__(self, index, value):
+        data = self.geometry.vertex_array.copy()
+        data[index] = value.to_array() if isinstance(value, Vector3D) else value
+        self.geometry.vertex_array = data
+
+    def __iter__(self):
+        for x, y, z in self.geometry.vertex_array.tolist():
+            yield Vector3D(x, y, z)
+
+class FaceView:
+    """Vista de compatibilidad: entrega cada cara como lista de índices"""
+
+    def __init__(self, geometry: 'Geometry3D'):
+        self.geometry = geometry
+
+    def __len__(self):
+        return len(self.geometry.face_offsets) - 1
+
+    def __getitem__(self, index):
+        offsets = self.geometry.face_offsets
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        return self.geometry.face_indices[offsets[index]:offsets[index + 1]].tolist()
+
+    def __iter__(self):
+        indices = self.geometry.face_indices.tolist()
+        offsets = self.geometry.face_offsets.tolist()
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            yield indices[start:end]
+
+    def copy(self) -> List[List[int]]:
+        """Copia como lista de listas"""
+        return list(self)
+
 class Geometry3D:
-    """Clase base para todas las geometrías 3D"""
-    
+    """Clase base para todas las geometrías 3D
+
+    Los vértices se guardan en un array contiguo (N, 3) y las caras como
+    índices planos más offsets. `vertices` y `faces` son vistas de
+    compatibilidad que entregan Vector3D y listas de índices.
+    """
+
     def __init__(self, name: str = "Geometry"):
         self.name = name
-        self.vertices = []
-        self.faces = []
-        self.normals = []
+        self.id: Optional[int] = None
+        self._vertex_array = np.empty((0, 3), dtype=np.float64)
+        self._pending_transform = None
+        self._face_indices = np.empty(0, dtype=np.int64)
+        self._face_offsets = np.zeros(1, dtype=np.int64)
+        self._cache: Dict[str, object] = {}
+        self.uv_array: Optional[np.ndarray] = None  # Coordenadas de textura (N, 2) opcionales
         self.materials = {}
         self.transform_matrix = np.identity(4)
-    
+
+    @property
+    def vertex_array(self) -> np.ndarray:
+        """Vértices como array (N, 3), con las transformaciones diferidas ya aplicadas"""
+        if self._pending_transform is not None:
+            self.bake_transform()
+        return self._vertex_array
+
+    @vertex_array.setter
+    def vertex_array(self, data):
+        vertex_count = len(self._vertex_array)
+        self._vertex_array = _frozen(_to_vertex_array(data))
+        self._pending_transform = None
+        # La adyacencia sólo depende de las caras y del número de vértices
+        self._invalidate_cache(keep=('adjacency',) if len(self._vertex_array) == vertex_count else ())
+
+    def _invalidate_cache(self, keep: Tuple[str, ...] = ()):
+        """Descartar datos derivados (triangulación, etc.) tras una edición"""
+        self._cache = {key: value for key, value in self._cache.items() if key in keep}
+
+    @property
+    def has_pending_transform(self) -> bool:
+        """Indica si hay transformaciones acumuladas sin aplicar a los vértices"""
+        return self._pending_transform is not None
+
+    def _vertex_version(self) -> tuple:
+        """Objetos que identifican el estado de los vértices (se comparan con `is`)"""
+        return (self.vertex_array,)
+
+    def bake_transform(self):
+        """Aplicar a los vértices la transformación diferida acumulada"""
+        if self._pending_transform is None:
+            return
+        pending, self._pending_transform = self._pending_transform, None
+        self._vertex_array = _frozen(Transformations3D.apply_to_points(pending, self._vertex_array))
+
+    def transform_vertices(self, matrix: np.ndarray, deferred: bool = False):
+        """Transformar todos los vértices con un único producto matricial
+
+        Con `deferred=True` sólo se acumula la matriz; los vértices se
+        calculan una vez cuando alguien los lee.
+        """
+        matrix = np.asarray(matrix, dtype=np.float64)
+        if deferred:
+            pending = self._pending_transform
+            self._pending_transform = matrix if pending is None else matrix @ pending
+        else:
+            self._vertex_array = _frozen(Transformations3D.apply_to_points(matrix, self.vertex_array))
+        # Una afín invertible no cambia la triangulación; la adyacencia no depende de las posiciones
+        self._invalidate_cache(keep=('triangles', 'adjacency') if _is_rigid_affine(matrix) else ('adjacency',))
+        self.apply_transformation(matrix)
+
+    @property
+    def vertices(self) -> VertexView:
+        """Vista de vértices como Vector3D"""
+        return VertexView(self)
+
+    @vertices.setter
+    def vertices(self, data):
+        self.vertex_array = data
+
+    def vector_array(self) -> VectorArray:
+        """Vértices como VectorArray para operar sobre todos a la vez"""
+        return VectorArray(self.vertex_array)
+
+    @property
+    def face_indices(self) -> np.ndarray:
+        """Índices de todas las caras concatenados"""
+        return self._face_indices
+
+    @property
+    def face_offsets(self) -> np.ndarray:
+        """Inicio de cada cara en `face_indices` (longitud F + 1)"""
+        return self._face_offsets
+
+    @property
+    def faces(self) -> FaceView:
+        """Vista de caras como listas de índices"""
+        return FaceView(self)
+
+    @faces.setter
+    def faces(self, faces):
+        self.set_face_arrays(*_to_face_arrays(faces))
+
+    def set_face_arrays(self, indices: np.ndarray, offsets: np.ndarray):
+        """Asignar caras directamente en formato índices + offsets"""
+        self._face_indices = _frozen(np.ascontiguousarray(indices, dtype=np.int64).ravel())
+        self._face_offsets = _frozen(np.ascontiguousarray(offsets, dtype=np.int64).ravel())
+        self._invalidate_cache()
+
+    @property
+    def face_sizes(self) -> np.ndarray:
+        """Número de vértices de cada cara"""
+        return np.diff(self.face_offsets)
+
+    def polygon_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Índices y offsets sólo de las caras con 3 o más vértices"""
+        sizes = self.face_sizes
+        if np.all(sizes >= 3):
+            return self.face_indices, self.face_offsets
+        keep = sizes >= 3
+        element_keep = np.repeat(keep, sizes)
+        offsets = np.zeros(int(keep.sum()) + 1, dtype=np.int64)
+        np.cumsum(sizes[keep], out=offsets[1:])
+        return self.face_indices[element_keep], offsets
+
+    def adjacency(self) -> MeshAdjacency:
+        """Tablas de adyacencia de las caras, construidas una vez y cacheadas"""
+        adjacency = self._cache.get('adjacency')
+        if adjacency is None:
+            adjacency = MeshAdjacency(self.face_indices, self.face_offsets, len(self._vertex_array))
+            self._cache['adjacency'] = adjacency
+        return adjacency
+
+    def weld_vertices(self, tolerance: float = 1e-9) -> Tuple[int, int]:
+        """Fusionar vértices coincidentes y quitar caras degeneradas
+
+        Devuelve (vértices eliminados, caras eliminadas).
+        """
+        original_vertices = len(self.vertex_array)
+        original_faces = len(self.face_offsets) - 1
+        welded, mapping = weld_vertices(self.vertex_array, tolerance)
+        if len(welded) == original_vertices:
+            indices, offsets, _ = remove_degenerate_faces(self.face_indices, self.face_offsets)
+            if len(offsets) - 1 == original_faces:
+                return 0, 0
+        else:
+            indices, offsets, _ = remove_degenerate_faces(mapping[self.face_indices], self.face_offsets)
+            self.vertex_array = welded
+        self.set_face_arrays(indices, offsets)
+        return original_vertices - len(welded), original_faces - (len(offsets) - 1)
+
+    def repair_mesh(self, max_hole_edges: int = 8) -> Dict[str, int]:
+        """Reparar la malla: quitar caras degeneradas, cerrar agujeros pequeños
+        y unificar la orientación
+
+        Los bordes cerrados de hasta `max_hole_edges` aristas se tapan con un
+        polígono. Después la orientación se propaga cara a cara por las
+        aristas compartidas y cada componente cerrada se orienta hacia fuera
+        (volumen positivo). Devuelve cuántas caras se quitaron, cuántos
+        agujeros se cerraron y cuántas caras se invirtieron.
+        """
+        original_faces = len(self.face_offsets) - 1
+        indices, offsets, _ = remove_degenerate_faces(self.face_indices, self.face_offsets)
+        self.set_face_arrays(indices, offsets)
+        removed = original_faces - (len(offsets) - 1)
+        vertex_count = len(self.vertex_array)
+
+        # Tapar agujeros pequeños recorriendo las aristas de borde
+        adjacency = self.adjacency()
+        boundary = adjacency.edge_half_edges[adjacency.edge_half_edge_offsets[:-1][adjacency.edge_valence == 1]]
+        hole_faces = []
+        if len(boundary) and max_hole_edges >= 3:
+            origin, target = adjacency.half_edge_origin[boundary], adjacency.half_edge_target[boundary]
+            directed = set((origin * vertex_count + target).tolist())
+            for path, closed in _trace_polylines(origin, target, vertex_count):
+                if closed and 3 <= len(path) <= max_hole_edges:
+                    # La tapa recorre el borde en sentido contrario a sus caras
+                    forward = path[0] * vertex_count + path[1] in directed
+                    hole_faces.append(path[::-1] if forward else path)
+        if hole_faces:
+            sizes = np.array([len(face) for face in hole_faces], dtype=np.int64)
+            offsets = np.concatenate([offsets, offsets[-1] + np.cumsum(sizes)])
+            indices = np.concatenate([indices, np.concatenate(hole_faces)])
+            self.set_face_arrays(indices, offsets)
+            adjacency = self.adjacency()
+
+        face_count = adjacency.face_count
+        if not face_count:
+            return {'removed_faces': removed, 'closed_holes': 0, 'flipped_faces': 0}
+
+        # Paridad entre caras vecinas: misma dirección en la arista => orientación opuesta
+        starts = adjacency.edge_half_edge_offsets[:-1][adjacency.edge_valence == 2]
+        first_half = adjacency.edge_half_edges[starts]
+        second_half = adjacency.edge_half_edges[starts + 1]
+        first_face = adjacency.half_edge_face[first_half]
+        second_face = adjacency.half_edge_face[second_half]
+        parity = adjacency.half_edge_origin[first_half] == adjacency.half_edge_origin[second_half]
+        ends = np.concatenate([first_face, second_face])
+        order = np.argsort(ends, kind='stable')
+        neighbor_offsets = np.searchsorted(ends[order], np.arange(face_count + 1)).tolist()
+        neighbors = np.concatenate([second_face, first_face])[order].tolist()
+        neighbor_parity = np.concatenate([parity, parity])[order].tolist()
+
+        flip = [False] * face_count
+        visited = [False] * face_count
+        for seed in range(face_count):
+            if visited[seed]:
+                continue
+            visited[seed] = True
+            stack = [seed]
+            while stack:
+                face = stack.pop()
+                for slot in range(neighbor_offsets[face], neighbor_offsets[face + 1]):
+                    other = neighbors[slot]
+                    if not visited[other]:
+                        visited[other] = True
+                        flip[other] = flip[face] != neighbor_parity[slot]
+                        stack.append(other)
+        flip = np.array(flip, dtype=bool)
+
+        # Orientar hacia fuera las componentes cerradas
+        components = adjacency.face_components()
+        open_components = np.unique(components[adjacency.half_edge_face[
+            adjacency.edge_half_edges[adjacency.edge_half_edge_offsets[:-1][adjacency.edge_valence != 2]]]])
+        newell = _polygon_normals(self.vertex_array, indices, offsets)
+        newell[flip] *= -1
+        centroids = np.add.reduceat(self.vertex_array[indices], offsets[:-1], axis=0) / np.diff(offsets)[:, None]
+        # Signo del volumen de cada componente: Σ c · n (n de Newell = 2 * área)
+        signed = np.bincount(components, weights=np.einsum('ij,ij->i', centroids, newell))
+        inward = signed < 0
+        inward[open_components] = False
+        flip ^= inward[components]
+
+        if flip.any():
+            sizes = np.diff(offsets)
+            face_of_element = np.repeat(np.arange(face_count), sizes)
+            position = np.arange(len(indices)) - offsets[face_of_element]
+            reversed_position = offsets[face_of_element] + sizes[face_of_element] - 1 - position
+            self.set_face_arrays(np.where(flip[face_of_element], indices[reversed_position], indices), offsets)
+        return {'removed_faces': removed,
+                'closed_holes': len(hole_faces),
+                'flipped_faces': int(flip.sum())}
+
+    def _triangulation(self) -> Tuple[np.ndarray, np.ndarray]:
+        triangulation = self._cache.get('triangles')
+        if triangulation is None:
+            triangles, face_of_tri = triangulate_polygons(
+                self.vertex_array, self.face_indices, self.face_offsets)
+            triangulation = (_frozen(triangles), _frozen(face_of_tri))
+            self._cache['triangles'] = triangulation
+        return triangulation
+
+    def get_triangles(self) -> np.ndarray:
+        """Triángulos (T, 3) de todas las caras, calculados una vez y cacheados"""
+        return self._triangulation()[0]
+
+    def get_triangle_faces(self) -> np.ndarray:
+        """Índice de la cara original de cada triángulo de `get_triangles()`"""
+        return self._triangulation()[1]
+
+    def _newell_normals(self) -> np.ndarray:
+        """Normales de Newell sin normalizar (módulo = 2 * área) de cada cara"""
+        normals = self._cache.get('newell_normals')
+        if normals is None:
+            normals = _frozen(_polygon_normals(self.vertex_array, self.face_indices, self.face_offsets))
+            self._cache['newell_normals'] = normals
+        return normals
+
+    def face_normals(self) -> np.ndarray:
+        """Normales unitarias (F, 3) de cada cara, cacheadas; cero en caras degeneradas"""
+        normals = self._cache.get('face_normals')
+        if normals is None:
+            newell = self._newell_normals()
+            lengths = np.linalg.norm(newell, axis=1, keepdims=True)
+            normals = _frozen(np.divide(newell, lengths, out=np.zeros_like(newell), where=lengths > 0))
+            self._cache['face_normals'] = normals
+        return normals
+
+    def vertex_normals(self) -> np.ndarray:
+        """Normales unitarias (N, 3) por vértice, promediadas por área de las caras"""
+        normals = self._cache.get('vertex_normals')
+        if normals is None:
+            newell = self._newell_normals()
+            face_of_element = np.repeat(np.arange(len(newell)), self.face_sizes)
+            count = len(self.vertex_array)
+            summed = np.stack([np.bincount(self.face_indices, weights=newell[face_of_element, axis],
+                                           minlength=count) for axis in range(3)], axis=1)
+            lengths = np.linalg.norm(summed, axis=1, keepdims=True)
+            # bincount sin elementos devuelve enteros: la salida se fija en float
+            normals = _frozen(np.divide(summed, lengths, out=np.zeros(summed.shape), where=lengths > 0))
+            self._cache['vertex_normals'] = normals
+        return normals
+
+    @property
+    def normals(self) -> VectorArray:
+        """Normales por vértice como VectorArray"""
+        return VectorArray(self.vertex_normals())
+
+    @normals.setter
+    def normals(self, data):
+        # Normales explícitas (p. ej. importadas); se descartan al editar la malla
+        normals = _to_vertex_array(data)
+        if not len(normals):
+            self._cache.pop('vertex_normals', None)
+            return
+        if len(normals) != len(self.vertex_array):
+            raise ValueError("Se necesita una normal por vértice")
+        self._cache['vertex_normals'] = _frozen(normals)
+
+    def edge_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Aristas de cada cara en orden (inicio, fin), cerrando el polígono"""
+        indices, offsets = self.polygon_arrays()
+        following = np.arange(1, len(indices) + 1)
+        following[offsets[1:] - 1] = offsets[:-1]
+        return indices, indices[following]
+
+    def outline_indices(self) -> np.ndarray:
+        """Índices para dibujar el contorno cerrado de cada cara, separados por -1"""
+        indices, offsets = self.polygon_arrays()
+        sizes = np.diff(offsets)
+        face_of_element = np.repeat(np.arange(len(sizes)), sizes)
+        outline = np.full(len(indices) + 2 * len(sizes), -1, dtype=np.int64)
+        outline[np.arange(len(indices)) + 2 * face_of_element] = indices
+        outline[offsets[1:] + 2 * np.arange(len(sizes))] = indices[offsets[:-1]]
+        return outline
+
+    def outline_coords(self, axes: Tuple[int, ...], scale: float = 1.0) -> Tuple[np.ndarray, ...]:
+        """Coordenadas de los contornos de caras (con NaN entre caras) para graficar"""
+        outline = self.outline_indices()
+        points = self.vertex_array[outline][:, list(axes)] * scale
+        points[outline < 0] = np.nan
+        return tuple(points.T)
+
+    def copy(self) -> 'Geometry3D':
+        """Copia independiente de la geometría"""
+        new_geometry = Geometry3D(self.name)
+        new_geometry.id = self.id
+        new_geometry._vertex_array = self._vertex_array
+        new_geometry._pending_transform = self._pending_transform
+        # Los arrays son de sólo lectura, así que la copia puede compartirlos
+        new_geometry._face_indices = self._face_indices
+        new_geometry._face_offsets = self._face_offsets
+        new_geometry._cache = dict(self._cache)
+        new_geometry.uv_array = self.uv_array
+        new_geometry.materials = self.materials.copy()
+        new_geometry.transform_matrix = self.transform_matrix.copy()
+        return new_geometry
+
     def apply_transformation(self, matrix: np.ndarray):
         """Aplicar transformación a la geometría"""
         self.transform_matrix = matrix @ self.transform_matrix
-    
+
     def get_bounding_box(self) -> Tuple[Vector3D, Vector3D]:
         """Obtener caja delimitadora"""
-        if not self.vertices:
+        if len(self.vertex_array) == 0:
             return Vector3D(), Vector3D()
-        
-        min_point = Vector3D(float('inf'), float('inf'), float('inf'))
-        max_point = Vector3D(float('-inf'), float('-inf'), float('-inf'))
-        
-        for vertex in self.vertices:
-            min_point.x = min(min_point.x, vertex.x)
-            min_point.y = min(min_point.y, vertex.y)
-            min_point.z = min(min_point.z, vertex.z)
-            max_point.x = max(max_point.x, vertex.x)
-            max_point.y = max(max_point.y, vertex.y)
-            max_point.z = max(max_point.z, vertex.z)
-        
-        return min_point, max_point
 
-class ArchitecturalElements:
-    """Clase para crear elementos arquitectónicos básicos"""
+        return Vector3D(*self.vertex_array.min(axis=0)), Vector3D(*self.vertex_array.max(axis=0))
+
+class GeometryInstance(Geometry3D):
+    """Instancia de una geometría prototipo
+
+    Sólo guarda su matriz 4x4 (`instance_matrix`) y un material propio
+    (`material_override`) que se combina con el del prototipo; caras,
+    triangulación y adyacencia son las del prototipo y los vértices se
+    calculan al leerlos, sin guardarse. Los cambios del prototipo se ven en
+    todas sus instancias. Transformar una instancia sólo cambia su matriz;
+    cualquier otra edición de vértices o caras la convierte antes en una
+    geometría independiente (`detach`).
+    """
+
+    def __init__(self, prototype: Geometry3D, matrix: Optional[np.ndarray] = None,
+                 materials: Optional[Dict] = None, name: Optional[str] = None):
+        self.prototype: Optional[Geometry3D] = prototype
+        self.instance_matrix = np.identity(4) if matrix is None else np.array(matrix, dtype=np.float64)
+        self.material_override: Dict = {}
+        self._uv_array = None
+        super().__init__(prototype.name if name is None else name)
+        self.material_override = dict(materials or {})
+
+    @property
+    def is_attached(self) -> bool:
+        """Indica si la instancia sigue compartiendo los datos del prototipo"""
+        return self.prototype is not None
+
+    def detach(self):
+        """Convertir la instancia en una geometría con sus propios arrays"""
+        prototype = self.prototype
+        if prototype is None:
+            return
+        vertices, materials, uvs = self.vertex_array, self.materials, self.uv_array
+        # La adyacencia sólo depende de las caras; la triangulación, de que la afín sea invertible
+        keep = ('triangles', 'adjacency') if _is_rigid_affine(self.instance_matrix) else ('adjacency',)
+        self._cache = {key: value for key, value in prototype._cache.items() if key in keep}
+        self._vertex_array = vertices
+        self._face_indices = prototype.face_indices
+        self._face_offsets = prototype.face_offsets
+        self._uv_array = uvs
+        self.prototype = None
+        self.material_override = dict(materials)
+
+    @property
+    def vertex_array(self) -> np.ndarray:
+        """Vértices del prototipo transformados por la matriz de la instancia"""
+        if self.prototype is None:
+            return Geometry3D.vertex_array.fget(self)
+        return _frozen(Transformations3D.apply_to_points(self.instance_matrix, self.prototype.vertex_array))
+
+    @vertex_array.setter
+    def vertex_array(self, data):
+        self.detach()
+        Geometry3D.vertex_array.fset(self, data)
+
+    def _vertex_version(self) -> tuple:
+        if self.prototype is None:
+            return super()._vertex_version()
+        return self.prototype._vertex_version() + (self.instance_matrix,)
+
+    def _shared_version(self) -> tuple:
+        """Estado del prototipo (vértices y caras) y de la matriz del que dependen los datos derivados"""
+        return self._vertex_version() + (self.prototype.face_indices, self.prototype.face_offsets)
+
+    @property
+    def _cache(self) -> Dict[str, object]:
+        # Mientras se comparta el prototipo, lo guardado sólo vale para su estado actual
+        if self.prototype is not None:
+            version = self._shared_version()
+            if (len(version) != len(self._cache_version)
+                    or any(current is not stored for current, stored in zip(version, self._cache_version))):
+                self._cache_data = {}
+                self._cache_version = version
+        return self._cache_data
+
+    @_cache.setter
+    def _cache(self, cache: Dict[str, object]):
+        self._cache_data = cache
+        self._cache_version = self._shared_version() if self.prototype is not None else ()
+
+    @property
+    def face_indices(self) -> np.ndarray:
+        """Índices de todas las caras concatenados"""
+        return self._face_indices if self.prototype is None else self.prototype.face_indices
+
+    @property
+    def face_offsets(self) -> np.ndarray:
+        """Inicio de cada cara en `face_indices` (longitud F + 1)"""
+        return self._face_offsets if self.prototype is None else self.prototype.face_offsets
+
+    def set_face_arrays(self, indices: np.ndarray, offsets: np.ndarray):
+        self.detach()
+        super().set_face_arrays(indices, offsets)
+
+    @property
+    def materials(self) -> Dict:
+        """Material del prototipo con las claves propias de la instancia encima"""
+        if self.prototype is None or not self.material_override:
+            return self.material_override if self.prototype is None else self.prototype.materials
+        return {**self.prototype.materials, **self.material_override}
+
+    @materials.setter
+    def materials(self, materials: Dict):
+        self.material_override = dict(materials)
+
+    @property
+    def uv_array(self) -> Optional[np.ndarray]:
+        """Coordenadas de textura propias o, si no hay, las del prototipo"""
+        if self._uv_array is None and self.prototype is not None:
+            return self.prototype.uv_array
+        return self._uv_array
+
+    @uv_array.setter
+    def uv_array(self, uvs: Optional[np.ndarray]):
+        self._uv_array = uvs
+
+    def transform_vertices(self, matrix: np.ndarray, deferred: bool = False):
+        """Transformar la instancia: sólo se compone su matriz"""
+        if self.prototype is None:
+            return super().transform_vertices(matrix, deferred)
+        matrix = np.asarray(matrix, dtype=np.float64)
+        self.instance_matrix = matrix @ self.instance_matrix
+        self._invalidate_cache()
+        self.apply_transformation(matrix)
+
+    def _triangulation(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self.prototype is not None and _is_rigid_affine(self.instance_matrix):
+            return self.prototype._triangulation()
+        return super()._triangulation()
+
+    def adjacency(self) -> MeshAdjacency:
+        """Tablas de adyacencia (las del prototipo mientras se compartan)"""
+        if self.prototype is not None:
+            return self.prototype.adjacency()
+        return super().adjacency()
+
+    def copy(self) -> Geometry3D:
+        """Copia: otra instancia del mismo prototipo (o una copia normal si ya no lo comparte)"""
+        if self.prototype is None:
+            return super().copy()
+        new_instance = GeometryInstance(self.prototype, self.instance_matrix.copy(),
+                                        self.material_override, self.name)
+        new_instance.id = self.id
+        new_instance._uv_array = self._uv_array
+        new_instance.transform_matrix = self.transform_matrix.copy()
+        return new_instance
+
+
+def _instance_source(geometry: Geometry3D) -> Tuple[Geometry3D, Optional[np.ndarray]]:
+    """(prototipo, matriz) de una instancia con afín invertible; (geometría, None) en otro caso"""
+    if isinstance(geometry, GeometryInstance) and geometry.is_attached and _is_rigid_affine(geometry.instance_matrix):
+        return geometry.prototype, geometry.instance_matrix
+    return geometry, None
+
+
+class PrimitiveCache:
+    """Caché LRU acotada de primitivas paramétricas unitarias
+
+    Cada entrada guarda, para unos parámetros de topología (segmentos,
+    dientes...), las tablas trigonométricas y las caras ya en formato CSR;
+    la pieza final sólo escala y traslada esas tablas. Con `directory` las
+    entradas también se guardan en disco (.npz) y se reutilizan entre
+    ejecuciones.
+    """
+
+    VERSION = 1
+
+    def __init__(self, max_entries: int = 128, directory: Optional[str] = None):
+        self.max_entries = max_entries
+        self.directory = directory
+        self._entries: 'OrderedDict[tuple, Dict[str, np.ndarray]]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: tuple, builder: Callable[[], Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+        """Arrays de la primitiva `key`, construyéndolos con `builder` si no están"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+        self.misses += 1
+        entry = self._load(key)
+        if entry is None:
+            entry = {name: _frozen(np.asarray(array)) for name, array in builder().items()}
+            self._store(key, entry)
+        else:
+            self.disk_hits += 1
+        self._entries[key] = entry
+        while len(self._entries) > max(self.max_entries, 0):
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    def _path(self, key: tuple) -> Optional[str]:
+        if not self.directory:
+            return None
+        name = "_".join(str(part) for part in key)
+        return os.path.join(self.directory, f"v{self.VERSION}_{name}.npz")
+
+    def _load(self, key: tuple) -> Optional[Dict[str, np.ndarray]]:
+        path = self._path(key)
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                return {name: _frozen(data[name]) for name in data.files}
+        except Exception:
+            # Archivo truncado o de otra versión: se reconstruye y se sobrescribe
+            return None
+
+    def _store(self, key: tuple, entry: Dict[str, np.ndarray]):
+        path = self._path(key)
+        if path is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        # Escribir aparte y renombrar: otro proceso nunca ve un archivo a medias
+        temporary = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(temporary, **entry)
+        os.replace(temporary, path)
+
+    def stats(self) -> Dict[str, int]:
+        """Aciertos, fallos, lecturas de disco, desalojos y tamaño actual"""
+        return {'hits': self.hits, 'misses': self.misses, 'disk_hits': self.disk_hits,
+                'evictions': self.evictions, 'entries': len(self._entries),
+                'max_entries': self.max_entries}
+
+    def clear(self):
+        """Vaciar la caché en memoria y reiniciar las estadísticas"""
+        self._entries.clear()
+        self.hits = self.misses = self.disk_hits = self.evictions = 0
+
+
+# Caché compartida por los generadores de ArchitecturalElements y MechanicalElements
+primitive_cache = PrimitiveCache()
+
+
+def _face_table(faces: List[List[int]]) -> Dict[str, np.ndarray]:
+    indices, offsets = _to_face_arrays(faces)
+    return {'face_indices': indices, 'face_offsets': offsets}
+
+
+def _box_primitive() -> Dict[str, np.ndarray]:
+    """Caras de un prisma de 8 vértices (paredes y puertas)"""
+    return _face_table([
+        [0, 1, 2, 3],  # Base
+        [4, 7, 6, 5],  # Techo
+        [0, 4, 5, 1],  # Frente
+        [2, 6, 7, 3],  # Atrás
+        [0, 3, 7, 4],  # Izquierda
+        [1, 5, 6, 2]   # Derecha
+    ])
+
+
+def _window_primitive() -> Dict[str, np.ndarray]:
+    """Caras del marco exterior y del cristal de una ventana"""
+    return _face_table([
+        [0, 1, 2, 3], [4, 7, 6, 5],  # Marco exterior
+        [8, 11, 10, 9], [12, 13, 14, 15]  # Cristal
+    ])
+
+
+def _roof_primitive() -> Dict[str, np.ndarray]:
+    """Caras de un techo a dos aguas"""
+    return _face_table([
+        [0, 1, 2, 3],  # Base
+        [0, 4, 5, 3],  # Lado izquierdo
+        [1, 2, 5, 4],  # Lado derecho
+        [0, 1, 4],     # Frente
+        [2, 3, 5]      # Atrás
+    ])
+
+
+def _stacked_faces(*blocks: np.ndarray) -> Dict[str, np.ndarray]:
+    """Caras en CSR a partir de bloques (F_k, n_k) de caras con el mismo tamaño"""
+    sizes = np.concatenate([np.full(len(block), block.shape[1], dtype=np.int64) for block in blocks])
+    offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    indices = np.concatenate([block.ravel() for block in blocks]).astype(np.int64)
+    return {'face_indices': indices, 'face_offsets': offsets}
+
+
+def _ring_table(count: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Cosenos y senos de `count` ángulos equiespaciados en la circunferencia
+
+    El ángulo se evalúa como 2π·i/count (no con np.linspace, que usa i·paso)
+    para reproducir bit a bit los valores de los generadores escalares.
+    """
+    angles = 2 * np.pi * np.arange(count) / count
+    return np.cos(angles), np.sin(angles)
+
+
+def _cylinder_primitive(segments: int) -> Dict[str, np.ndarray]:
+    """Cosenos y senos de los segmentos y caras de un cilindro"""
+    cosines, sines = _ring_table(segments)
+    current = np.arange(segments)
+    following = (current + 1) % segments
+    # Laterales y, después, las tapas intercaladas (inferior, superior) por segmento
+    sides = np.stack([current, following, following + segments, current + segments], axis=1)
+    caps = np.stack([
+        np.stack([np.full(segments, 2 * segments), current, following], axis=1),
+        np.stack([np.full(segments, 2 * segments + 1), following + segments, current + segments], axis=1)
+    ], axis=1).reshape(-1, 3)
+    return {'cos': cosines, 'sin': sines, **_stacked_faces(sides, caps)}
+
+
+def _sphere_primitive(u_segments: int, v_segments: int) -> Dict[str, np.ndarray]:
+    """Tablas de latitud (u) y longitud (v) y caras de una esfera"""
+    u = np.arange(u_segments + 1) * np.pi / u_segments
+    v = np.arange(v_segments) * 2 * np.pi / v_segments
     
-    @staticmethod
-    def create_wall(length: float, height: float, thickness: float, 
-                   position: Vector3D = Vector3D()) -> Geometry3D:
-        """Crear una pared"""
-        wall = Geometry3D("Wall")
-        
-        # Definir vértices de la pared
-        vertices = [
-            Vector3D(0, 0, 0),
-            Vector3D(length, 0, 0),
-            Vector3D(length, thickness, 0),
-            Vector3D(0, thickness, 0),
-            Vector3D(0, 0, height),
-            Vector3D(length, 0, height),
-            Vector3D(length, thickness, height),
-            Vector3D(0, thickness, height)
-        ]
-        
-        # Trasladar a la posición deseada
-        wall.vertices = [v + position for v in vertices]
-        
-        # Definir caras (cada cara como lista de índices de vértices)
-        wall.faces = [
-            [0, 1, 2, 3],  # Base
-            [4, 7, 6, 5],  # Techo
-            [0, 4, 5, 1],  # Frente
-            [2, 6, 7, 3],  # Atrás
-            [0, 3, 7, 4],  # Izquierda
-            [1, 5, 6, 2]   # Derecha
-        ]
-        
-        wall.materials = {
-            'color': '#8B4513',
-            'texture': 'brick',
-            'opacity': 1.0
-        }
-        
-        return wall
+    # Sin caras en el polo norte: los cuadriláteros empiezan en el anillo 1
+    rows = np.arange(1, u_segments)[:, None] * v_segments
+    columns = np.arange(v_segments)
+    next_columns = (columns + 1) % v_segments
+    quads = np.stack([rows + columns, rows + next_columns,
+                      rows + v_segments + next_columns, rows + v_segments + columns], axis=-1)
+    return {'sin_u': np.sin(u), 'cos_u': np.cos(u), 'cos_v': np.cos(v), 'sin_v': np.sin(v),
+            **_stacked_faces(quads.reshape(-1, 4))}
+
+
+def _gear_primitive(teeth: int) -> Dict[str, np.ndarray]:
+    """Cosenos y senos del perfil (2 puntos por diente) y caras de un engranaje"""
+    points = teeth * 2
+    cosines, sines = _ring_table(points)
+    bottom = np.arange(points) * 2
+    next_bottom = (np.arange(points) + 1) % points * 2
+    sides = np.stack([bottom, next_bottom, next_bottom + 1, bottom + 1], axis=1)
+    caps = np.stack([
+        np.stack([np.full(points, 2 * points), bottom, next_bottom], axis=1),
+        np.stack([np.full(points, 2 * points + 1), next_bottom + 1, bottom + 1], axis=1)
+    ], axis=1).reshape(-1, 3)
+    return {'cos': cosines, 'sin': sines, **_stacked_faces(sides, caps)}
+
+
+# Icosaedro regular con caras en sentido antihorario vistas desde fuera
+_ICOSAHEDRON_T = (1.0 + math.sqrt(5.0)) / 2.0
+_ICOSAHEDRON_VERTICES = np.array([
+    [-1, _ICOSAHEDRON_T, 0], [1, _ICOSAHEDRON_T, 0], [-1, -_ICOSAHEDRON_T, 0], [1, -_ICOSAHEDRON_T, 0],
+    [0, -1, _ICOSAHEDRON_T], [0, 1, _ICOSAHEDRON_T], [0, -1, -_ICOSAHEDRON_T], [0, 1, -_ICOSAHEDRON_T],
+    [_ICOSAHEDRON_T, 0, -1], [_ICOSAHEDRON_T, 0, 1], [-_ICOSAHEDRON_T, 0, -1], [-_ICOSAHEDRON_T, 0, 1]
+], dtype=np.float64)
+_ICOSAHEDRON_FACES = np.array([
+    [0, 11, 5], [0, 5, 1], [0, 1, 7], [0, 7, 10], [0, 10, 11],
+    [1, 5, 9], [5, 11, 4], [11, 10, 2], [10, 7, 6], [7, 1, 8],
+    [3, 9, 4], [3, 4, 2], [3, 2, 6], [3, 6, 8], [3, 8, 9],
+    [4, 9, 5], [2, 4, 11], [6, 2, 10], [8, 6, 7], [9, 8, 1]
+], dtype=np.int64)
+
+# Límites de la resolución adaptativa
+_MAX_ADAPTIVE_SEGMENTS = 4096
+_MAX_ICOSPHERE_FREQUENCY = 256
+
+
+def _triangle_grid(frequency: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Malla baricéntrica de un triángulo partido en `frequency`² triángulos
+
+    Devuelve los pasos (i, j) de cada punto hacia el segundo y el tercer
+    vértice y los triángulos como índices de esos puntos.
+    """
+    grid_i, grid_j = np.triu_indices(frequency + 1)
+    grid_j = grid_j - grid_i
+    lookup = np.full((frequency + 1, frequency + 1), -1, dtype=np.int64)
+    lookup[grid_i, grid_j] = np.arange(len(grid_i))
+    steps = np.add.outer(np.arange(frequency), np.arange(frequency))
+    up_i, up_j = np.nonzero(steps < frequency)
+    down_i, down_j = np.nonzero(steps < frequency - 1)
+    triangles = np.concatenate([
+        np.stack([lookup[up_i, up_j], lookup[up_i + 1, up_j], lookup[up_i, up_j + 1]], axis=1),
+        np.stack([lookup[down_i + 1, down_j], lookup[down_i + 1, down_j + 1], lookup[down_i, down_j + 1]], axis=1)
+    ])
+    return grid_i, grid_j, triangles
+
+
+def _icosphere_chord_error(frequency: int) -> float:
+    """Máxima separación entre la esfera unitaria y una icoesfera de esa partición
+
+    Las 20 caras del icosaedro son congruentes, así que basta con proyectar
+    la malla de una sola, sin construir (ni guardar) la icoesfera entera.
+    """
+    grid_i, grid_j, triangles = _triangle_grid(frequency)
+    a, b, c = _ICOSAHEDRON_VERTICES[_ICOSAHEDRON_FACES[0]]
+    points = np.outer(frequency - grid_i - grid_j, a) + np.outer(grid_i, b) + np.outer(grid_j, c)
+    points /= np.linalg.norm(points, axis=1)[:, None]
+    corners = points[triangles]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    distances = np.abs(np.einsum('ij,ij->i', normals, corners[:, 0])) / np.linalg.norm(normals, axis=1)
+    return float(1.0 - distances.min())
+
+
+def _icosphere_primitive(frequency: int) -> Dict[str, np.ndarray]:
+    """Vértices unitarios y caras de una icoesfera geodésica
+
+    Cada cara del icosaedro se divide en `frequency`² triángulos con una
+    malla baricéntrica que luego se proyecta a la esfera. Los puntos se
+    identifican por sus pesos enteros sobre los 12 vértices, así los de
+    aristas compartidas coinciden exactamente entre caras vecinas.
+    """
+    grid_i, grid_j, local = _triangle_grid(frequency)
+    weights = np.zeros((len(_ICOSAHEDRON_FACES), len(grid_i), 12), dtype=np.int16)
+    face_ids = np.arange(len(_ICOSAHEDRON_FACES))[:, None]
+    a, b, c = _ICOSAHEDRON_FACES.T[:, :, None]
+    weights[face_ids, :, a] = frequency - grid_i - grid_j
+    weights[face_ids, :, b] = grid_i
+    weights[face_ids, :, c] = grid_j
+    # Comparar filas como bloques de bytes es mucho más rápido que np.unique(axis=0)
+    rows = np.ascontiguousarray(weights.reshape(-1, 12)).view(np.dtype((np.void, 24))).ravel()
+    _, first, point_ids = np.unique(rows, return_index=True, return_inverse=True)
+    keys = weights.reshape(-1, 12)[first].astype(np.float64)
+    point_ids = point_ids.reshape(len(_ICOSAHEDRON_FACES), -1)
     
-    @staticmethod
+    vertices = keys @ _ICOSAHEDRON_VERTICES
+    vertices /= np.linalg.norm(vertices, axis=1)[:, None]
+    
+    faces = point_ids[:, local].reshape(-1, 3)
+    return {'vertices': vertices, **_stacked_faces(faces)}
+
+
+def _chord_segments(radius: float, tolerance: float, minimum: int = 3) -> int:
+    """Segmentos mínimos de una circunferencia cuya flecha no supera `tolerance`
+
+    La flecha de una cuerda que abarca 2π/n es r·(1 - cos(π/n)).
+    """
+    if tolerance <= 0:
+        raise ValueError("La tolerancia de cuerda debe ser positiva")
+    if radius <= 0:
+        return minimum
+    half_angle = math.acos(max(1.0 - tolerance / radius, -1.0))
+    return int(min(max(math.ceil(math.pi / half_angle - 1e-9), minimum), _MAX_ADAPTIVE_SEGMENTS))
+
+
+def _icosphere_frequency(radius: float, tolerance: float) -> int:
+    """Menor partición de arista de la icoesfera con error de cuerda <= `tolerance`"""
+    if tolerance <= 0:
+        raise ValueError("La tolerancia de cuerda debe ser positiva")
+    
+    def error(frequency):
+        return radius * _icosphere_chord_error(frequency)
+    
+    # El error cae con 1/f²: estimar desde f = 1, reestimar una vez y ajustar paso a paso
+    frequency = 1
+    for _ in range(2):
+        estimate = math.ceil(frequency * math.sqrt(error(frequency) / tolerance))
+        frequency = min(max(estimate, 1), _MAX_ICOSPHERE_FREQUENCY)
+    while frequency < _MAX_ICOSPHERE_FREQUENCY and error(frequency) > tolerance:
+        frequency += 1
+    while frequency > 1 and error(frequency - 1) <= tolerance:
+        frequency -= 1
+    return frequency
+
+
+def _reference_cylinder_primitive(segments: int) -> Dict[str, np.ndarray]:
+    """Versión escalar de `_cylinder_primitive` (referencia para benchmark_primitives)"""
+    cosines, sines = [], []
+    for i in range(segments):
+        angle = 2 * np.pi * i / segments
+        cosines.append(np.cos(angle))
+        sines.append(np.sin(angle))
+    
+    faces = []
+    # Caras laterales
+    for i in range(segments):
+        next_i = (i + 1) % segments
+        faces.append([i, next_i, next_i + segments, i + segments])
+    # Caras de las bases
+    for i in range(segments):
+        next_i = (i + 1) % segments
+        faces.append([2*segments, i, next_i])  # Base inferior
+        faces.append([2*segments + 1, next_i + segments, i + segments])  # Base superior
+    return {'cos': np.array(cosines, dtype=np.float64), 'sin': np.array(sines, dtype=np.float64),
+            **_face_table(faces)}
+
+
+def _reference_sphere_primitive(u_segments: int, v_segments: int) -> Dict[str, np.ndarray]:
+    """Versión escalar de `_sphere_primitive` (referencia para benchmark_primitives)"""
+    sin_u = [np.sin(i * np.pi / u_segments) for i in range(u_segments + 1)]
+    cos_u = [np.cos(i * np.pi / u_segments) for i in range(u_segments + 1)]
+    cos_v = [np.cos(j * 2 * np.pi / v_segments) for j in range(v_segments)]
+    sin_v = [np.sin(j * 2 * np.pi / v_segments) for j in range(v_segments)]
+    
+    faces = []
+    for i in range(u_segments):
+        for j in range(v_segments):
+            current = i * v_segments + j
+            next_u = (i + 1) * v_segments + j
+            next_v = i * v_segments + (j + 1) % v_segments
+            next_both = (i + 1) * v_segments + (j + 1) % v_segments
+            
+            if i > 0:  # No crear caras en el polo norte
+                faces.append([current, next_v, next_both, next_u])
+    return {'sin_u': np.array(sin_u, dtype=np.float64), 'cos_u': np.array(cos_u, dtype=np.float64),
+            'cos_v': np.array(cos_v, dtype=np.float64), 'sin_v': np.array(sin_v, dtype=np.float64),
+            **_face_table(faces)}
+
+
+def _reference_gear_primitive(teeth: int) -> Dict[str, np.ndarray]:
+    """Versión escalar de `_gear_primitive` (referencia para benchmark_primitives)"""
+    points = teeth * 2
+    cosines, sines = [], []
+    for i in range(points):
+        angle = 2 * np.pi * i / points
+        cosines.append(np.cos(angle))
+        sines.append(np.sin(angle))
+    
+    faces = []
+    # Caras laterales
+    for i in range(points):
+        next_i = (i + 1) % points
+        faces.append([i * 2, next_i * 2, next_i * 2 + 1, i * 2 + 1])
+    # Caras superior e inferior
+    center_bottom, center_top = 2 * points, 2 * points + 1
+    for i in range(points):
+        next_i = (i + 1) % points
+        faces.append([center_bottom, i * 2, next_i * 2])
+        faces.append([center_top, next_i * 2 + 1, i * 2 + 1])
+    return {'cos': np.array(cosines, dtype=np.float64), 'sin': np.array(sines, dtype=np.float64),
+            **_face_table(faces)}
+
+
+def _primitive_geometry(name: str, vertices: np.ndarray, position: Vector3D,
+                        primitive: Dict[str, np.ndarray], materials: Dict) -> Geometry3D:
+    """Geometría con los vértices trasladados a `position` y las caras de la caché"""
+    geometry = Geometry3D(name)
+    geometry.vertex_array = vertices + np.array([position.x, position.y, position.z])
+    geometry.set_face_arrays(primitive['face_indices'], primitive['face_offsets'])
+    geometry.materials = materials
+    return geometry
+
+
+class ArchitecturalElements:
+    """Clase para crear elementos arquitectónicos básicos"""
+    
+    @staticmethod
+    def create_wall(length: float, height: float, thickness: float, 
+                   position: Vector3D = Vector3D()) -> Geometry3D:
+        """Crear una pared"""
+        # Definir vértices de la pared
+        vertices = np.array([
+            [0, 0, 0],
+            [length, 0, 0],
+            [length, thickness, 0],
+            [0, thickness, 0],
+            [0, 0, height],
+            [length, 0, height],
+            [length, thickness, height],
+            [0, thickness, height]
+        ], dtype=np.float64)
+        
+        # Trasladar a la posición deseada; las caras son las del prisma compartido
+        return _primitive_geometry("Wall", vertices, position,
+                                   primitive_cache.get(('box',), _box_primitive), {
+            'color': '#8B4513',
+            'texture': 'brick',
+            'opacity': 1.0
+        })
+    
+    @staticmethod
     def create_door(width: float, height: float, thickness: float,
                    position: Vector3D = Vector3D()) -> Geometry3D:
         """Crear una puerta"""
-        door = Geometry3D("Door")
-        
-        vertices = [
-            Vector3D(0, 0, 0),
-            Vector3D(width, 0, 0),
-            Vector3D(width, thickness, 0),
-            Vector3D(0, thickness, 0),
-            Vector3D(0, 0, height),
-            Vector3D(width, 0, height),
-            Vector3D(width, thickness, height),
-            Vector3D(0, thickness, height)
-        ]
+        vertices = np.array([
+            [0, 0, 0],
+            [width, 0, 0],
+            [width, thickness, 0],
+            [0, thickness, 0],
+            [0, 0, height],
+            [width, 0, height],
+            [width, thickness, height],
+            [0, thickness, height]
+        ], dtype=np.float64)
         
-        door.vertices = [v + position for v in vertices]
-        door.faces = [
-            [0, 1, 2, 3], [4, 7, 6, 5], [0, 4, 5, 1],
-            [2, 6, 7, 3], [0, 3, 7, 4], [1, 5, 6, 2]
-        ]
-        
-        door.materials = {
+        return _primitive_geometry("Door", vertices, position,
+                                   primitive_cache.get(('box',), _box_primitive), {
             'color': '#8B4513',
             'texture': 'wood',
             'opacity': 0.9
-        }
-        
-        return door
+        })
     
     @staticmethod
     def create_window(width: float, height: float, thickness: float,
                      position: Vector3D = Vector3D()) -> Geometry3D:
         """Crear una ventana"""
-        window = Geometry3D("Window")
-        
         # Marco de la ventana
         frame_thickness = 0.05
         
-        vertices = []
-        faces = []
-        
-        # Marco exterior
-        outer_vertices = [
-            Vector3D(0, 0, 0),
-            Vector3D(width, 0, 0),
-            Vector3D(width, thickness, 0),
-            Vector3D(0, thickness, 0),
-            Vector3D(0, 0, height),
-            Vector3D(width, 0, height),
-            Vector3D(width, thickness, height),
-            Vector3D(0, thickness, height)
-        ]
-        
-        # Marco interior (cristal)
-        inner_vertices = [
-            Vector3D(frame_thickness, frame_thickness, frame_thickness),
-            Vector3D(width-frame_thickness, frame_thickness, frame_thickness),
-            Vector3D(width-frame_thickness, thickness-frame_thickness, frame_thickness),
-            Vector3D(frame_thickness, thickness-frame_thickness, frame_thickness),
-            Vector3D(frame_thickness, frame_thickness, height-frame_thickness),
-            Vector3D(width-frame_thickness, frame_thickness, height-frame_thickness),
-            Vector3D(width-frame_thickness, thickness-frame_thickness, height-frame_thickness),
-            Vector3D(frame_thickness, thickness-frame_thickness, height-frame_thickness)
-        ]
-        
-        window.vertices = [v + position for v in outer_vertices + inner_vertices]
+        vertices = np.array([
+            # Marco exterior
+            [0, 0, 0],
+            [width, 0, 0],
+            [width, thickness, 0],
+            [0, thickness, 0],
+            [0, 0, height],
+            [width, 0, height],
+            [width, thickness, height],
+            [0, thickness, height],
+            # Marco interior (cristal)
+            [frame_thickness, frame_thickness, frame_thickness],
+            [width-frame_thickness, frame_thickness, frame_thickness],
+            [width-frame_thickness, thickness-frame_thickness, frame_thickness],
+            [frame_thickness, thickness-frame_thickness, frame_thickness],
+            [frame_thickness, frame_thickness, height-frame_thickness],
+            [width-frame_thickness, frame_thickness, height-frame_thickness],
+            [width-frame_thickness, thickness-frame_thickness, height-frame_thickness],
+            [frame_thickness, thickness-frame_thickness, height-frame_thickness]
+        ], dtype=np.float64)
         
-        # Caras del marco y cristal
-        window.faces = [
-            [0, 1, 2, 3], [4, 7, 6, 5],  # Marco exterior
-            [8, 11, 10, 9], [12, 13, 14, 15]  # Cristal
-        ]
-        
-        window.materials = {
+        return _primitive_geometry("Window", vertices, position,
+                                   primitive_cache.get(('window',), _window_primitive), {
             'color': '#87CEEB',
             'texture': 'glass',
             'opacity': 0.3
-        }
-        
-        return window
+        })
     
     @staticmethod
     def create_roof(length: float, width: float, height: float,
                    position: Vector3D = Vector3D()) -> Geometry3D:
         """Crear un techo a dos aguas"""
-        roof = Geometry3D("Roof")
-        
-        vertices = [
-            Vector3D(0, 0, 0),  # Base esquina 1
-            Vector3D(length, 0, 0),  # Base esquina 2
-            Vector3D(length, width, 0),  # Base esquina 3
-            Vector3D(0, width, 0),  # Base esquina 4
-            Vector3D(length/2, 0, height),  # Pico frente
-            Vector3D(length/2, width, height)  # Pico atrás
-        ]
+        vertices = np.array([
+            [0, 0, 0],  # Base esquina 1
+            [length, 0, 0],  # Base esquina 2
+            [length, width, 0],  # Base esquina 3
+            [0, width, 0],  # Base esquina 4
+            [length/2, 0, height],  # Pico frente
+            [length/2, width, height]  # Pico atrás
+        ], dtype=np.float64)
         
-        roof.vertices = [v + position for v in vertices]
-        
-        roof.faces = [
-            [0, 1, 2, 3],  # Base
-            [0, 4, 5, 3],  # Lado izquierdo
-            [1, 2, 5, 4],  # Lado derecho
-            [0, 1, 4],     # Frente
-            [2, 3, 5]      # Atrás
-        ]
-        
-        roof.materials = {
+        return _primitive_geometry("Roof", vertices, position,
+                                   primitive_cache.get(('roof',), _roof_primitive), {
             'color': '#8B0000',
             'texture': 'tile',
             'opacity': 1.0
-        }
-        
-        return roof
+        })
 
 class MechanicalElements:
-    """Elementos para modelado mecánico e industrial"""
+    """Elementos para modelado mecánico e industrial
+
+    Las tablas trigonométricas y las caras se toman de `primitive_cache`;
+    cada pieza sólo escala y traslada la primitiva unitaria.
+    """
     
     @staticmethod
     def create_cylinder(radius: float, height: float, segments: int = 32,
-                       position: Vector3D = Vector3D()) -> Geometry3D:
-        """Crear un cilindro"""
-        cylinder = Geometry3D("Cylinder")
-        
-        vertices = []
-        faces = []
-        
-        # Vértices de la base inferior
-        for i in range(segments):
-            angle = 2 * np.pi * i / segments
-            x = radius * np.cos(angle)
-            y = radius * np.sin(angle)
-            vertices.append(Vector3D(x, y, 0))
-        
-        # Vértices de la base superior
-        for i in range(segments):
-            angle = 2 * np.pi * i / segments
-            x = radius * np.cos(angle)
-            y = radius * np.sin(angle)
-            vertices.append(Vector3D(x, y, height))
-        
-        # Centro de las bases
-        vertices.append(Vector3D(0, 0, 0))  # Centro base inferior
-        vertices.append(Vector3D(0, 0, height))  # Centro base superior
-        
-        cylinder.vertices = [v + position for v in vertices]
-        
-        # Caras laterales
-        for i in range(segments):
-            next_i = (i + 1) % segments
-            faces.append([i, next_i, next_i + segments, i + segments])
-        
-        # Caras de las bases
-        for i in range(segments):
-            next_i = (i + 1) % segments
-            faces.append([2*segments, i, next_i])  # Base inferior
-            faces.append([2*segments + 1, next_i + segments, i + segments])  # Base superior
-        
-        cylinder.faces = faces
-        cylinder.materials = {
+                       position: Vector3D = Vector3D(),
+                       chord_tolerance: Optional[float] = None) -> Geometry3D:
+        """Crear un cilindro
+
+        Con `chord_tolerance` se ignora `segments` y se usan los mínimos que
+        mantienen la flecha de cada cuerda por debajo de la tolerancia.
+        """
+        if chord_tolerance is not None:
+            segments = _chord_segments(radius, chord_tolerance)
+        primitive = primitive_cache.get(('cylinder', segments),
+                                        lambda: _cylinder_primitive(segments))
+        
+        vertices = np.zeros((2 * segments + 2, 3))
+        # Bases inferior y superior; los dos últimos vértices son sus centros
+        vertices[:segments, 0] = vertices[segments:2*segments, 0] = radius * primitive['cos']
+        vertices[:segments, 1] = vertices[segments:2*segments, 1] = radius * primitive['sin']
+        vertices[segments:2*segments, 2] = height
+        vertices[-1, 2] = height
+        
+        return _primitive_geometry("Cylinder", vertices, position, primitive, {
             'color': '#C0C0C0',
             'texture': 'metal',
             'opacity': 1.0
-        }
-        
-        return cylinder
+        })
     
     @staticmethod
     def create_sphere(radius: float, u_segments: int = 16, v_segments: int = 16,
-                     position: Vector3D = Vector3D()) -> Geometry3D:
-        """Crear una esfera"""
-        sphere = Geometry3D("Sphere")
-        
-        vertices = []
-        faces = []
-        
-        # Generar vértices
-        for i in range(u_segments + 1):
-            u = i * np.pi / u_segments
-            for j in range(v_segments):
-                v = j * 2 * np.pi / v_segments
-                
-                x = radius * np.sin(u) * np.cos(v)
-                y = radius * np.sin(u) * np.sin(v)
-                z = radius * np.cos(u)
-                
-                vertices.append(Vector3D(x, y, z))
+                     position: Vector3D = Vector3D(),
+                     chord_tolerance: Optional[float] = None) -> Geometry3D:
+        """Crear una esfera UV
+
+        Con `chord_tolerance` los segmentos se eligen para que ningún
+        cuadrilátero se separe de la esfera más que la tolerancia; los de
+        latitud son la mitad de los de longitud (mismo paso angular).
+        """
+        if chord_tolerance is not None:
+            # En el ecuador la separación es r·(1 - cos²(π/v)): se reparte entre las dos direcciones
+            ring_tolerance = radius * (1.0 - math.sqrt(max(1.0 - chord_tolerance / radius, 0.0)))
+            v_segments = _chord_segments(radius, ring_tolerance, minimum=4) if radius > 0 else 4
+            u_segments = max((v_segments + 1) // 2, 2)
+        primitive = primitive_cache.get(('sphere', u_segments, v_segments),
+                                        lambda: _sphere_primitive(u_segments, v_segments))
         
-        sphere.vertices = [v + position for v in vertices]
+        # Anillos de latitud (u) por filas y longitudes (v) por columnas
+        ring = radius * primitive['sin_u'][:, None]
+        vertices = np.empty((u_segments + 1, v_segments, 3))
+        vertices[..., 0] = ring * primitive['cos_v']
+        vertices[..., 1] = ring * primitive['sin_v']
+        vertices[..., 2] = (radius * primitive['cos_u'])[:, None]
         
-        # Generar caras
-        for i in range(u_segments):
-            for j in range(v_segments):
-                current = i * v_segments + j
-                next_u = (i + 1) * v_segments + j
-                next_v = i * v_segments + (j + 1) % v_segments
-                next_both = (i + 1) * v_segments + (j + 1) % v_segments
-                
-                if i > 0:  # No crear caras en el polo norte
-                    faces.append([current, next_v, next_both, next_u])
-        
-        sphere.faces = faces
-        sphere.materials = {
+        return _primitive_geometry("Sphere", vertices.reshape(-1, 3), position, primitive, {
             'color': '#FFD700',
             'texture': 'smooth',
             'opacity': 1.0
-        }
+        })
+    
+    @staticmethod
+    def create_icosphere(radius: float, subdivisions: int = 2,
+                         position: Vector3D = Vector3D(),
+                         chord_tolerance: Optional[float] = None) -> Geometry3D:
+        """Crear una esfera a partir de un icosaedro subdividido
+
+        Triángulos casi equiláteros y sin polos degenerados: para el mismo
+        error de cuerda necesita muchos menos triángulos que la esfera UV.
+        `subdivisions` equivale a partir cada arista en 2**subdivisions; con
+        `chord_tolerance` se elige la menor partición que cumple la tolerancia.
+        """
+        frequency = 2 ** subdivisions
+        if chord_tolerance is not None:
+            frequency = _icosphere_frequency(radius, chord_tolerance)
+        primitive = primitive_cache.get(('icosphere', frequency),
+                                        lambda: _icosphere_primitive(frequency))
         
-        return sphere
+        return _primitive_geometry("Sphere", radius * primitive['vertices'], position, primitive, {
+            'color': '#FFD700',
+            'texture': 'smooth',
+            'opacity': 1.0
+        })
     
     @staticmethod
     def create_gear(outer_radius: float, inner_radius: float, height: float,
                    teeth: int = 20, position: Vector3D = Vector3D()) -> Geometry3D:
         """Crear un engranaje"""
-        gear = Geometry3D("Gear")
-        
-        vertices = []
-        faces = []
+        primitive = primitive_cache.get(('gear', teeth), lambda: _gear_primitive(teeth))
         
-        # Parámetros del diente
+        # Parámetros del diente: base en los puntos pares, punta en los impares
         tooth_height = (outer_radius - inner_radius) * 0.3
+        radii = np.empty(teeth * 2)
+        radii[0::2] = inner_radius + tooth_height * 0.3
+        radii[1::2] = outer_radius
         
-        # Generar puntos del perfil del engranaje
-        profile_points = []
+        # Extruir el perfil intercalando base inferior y superior; luego los centros
+        vertices = np.zeros((4 * teeth + 2, 3))
+        vertices[:-2:2, 0] = vertices[1:-2:2, 0] = radii * primitive['cos']
+        vertices[:-2:2, 1] = vertices[1:-2:2, 1] = radii * primitive['sin']
+        vertices[1:-2:2, 2] = height
+        vertices[-1, 2] = height
         
-        for i in range(teeth * 2):  # 2 puntos por diente
-            angle = 2 * np.pi * i / (teeth * 2)
-            
-            if i % 2 == 0:  # Base del diente
-                r = inner_radius + tooth_height * 0.3
-            else:  # Punta del diente
-                r = outer_radius
-            
-            x = r * np.cos(angle)
-            y = r * np.sin(angle)
-            profile_points.append(Vector3D(x, y, 0))
-        
-        # Extruir el perfil
-        for point in profile_points:
-            vertices.append(point)  # Base inferior
-            vertices.append(Vector3D(point.x, point.y, height))  # Base superior
-        
-        # Centro del engranaje
-        vertices.append(Vector3D(0, 0, 0))
-        vertices.append(Vector3D(0, 0, height))
-        
-        gear.vertices = [v + position for v in vertices]
-        
-        # Generar caras
-        num_profile_points = len(profile_points)
-        
-        # Caras laterales
-        for i in range(num_profile_points):
-            next_i = (i + 1) % num_profile_points
-            v1, v2 = i * 2, next_i * 2
-            v3, v4 = i * 2 + 1, next_i * 2 + 1
-            faces.append([v1, v2, v4, v3])
-        
-        # Caras superior e inferior
-        center_bottom = len(vertices) - 2
-        center_top = len(vertices) - 1
-        
-        for i in range(num_profile_points):
-            next_i = (i + 1) % num_profile_points
-            # Cara inferior
-            faces.append([center_bottom, i * 2, next_i * 2])
-            # Cara superior
-            faces.append([center_top, next_i * 2 + 1, i * 2 + 1])
-        
-        gear.faces = faces
-        gear.materials = {
+        return _primitive_geometry("Gear", vertices, position, primitive, {
             'color': '#4169E1',
             'texture': 'metal',
             'opacity': 1.0
+        })
+
+def _spread_bits(values: np.ndarray) -> np.ndarray:
+    """Intercalar 21 bits con dos ceros entre cada uno (para códigos de Morton)"""
+    x = values.astype(np.uint64) & np.uint64(0x1fffff)
+    x = (x | x << np.uint64(32)) & np.uint64(0x1f00000000ffff)
+    x = (x | x << np.uint64(16)) & np.uint64(0x1f0000ff0000ff)
+    x = (x | x << np.uint64(8)) & np.uint64(0x100f00f00f00f00f)
+    x = (x | x << np.uint64(4)) & np.uint64(0x10c30c30c30c30c3)
+    x = (x | x << np.uint64(2)) & np.uint64(0x1249249249249249)
+    return x
+
+def morton_codes(points: np.ndarray) -> np.ndarray:
+    """Códigos de Morton de 63 bits de puntos normalizados a su caja envolvente"""
+    if len(points) == 0:
+        return np.empty(0, dtype=np.uint64)
+    low, high = points.min(axis=0), points.max(axis=0)
+    extent = np.where(high > low, high - low, 1.0)
+    grid = np.clip((points - low) / extent * 2097151.0, 0, 2097151).astype(np.uint64)
+    return (_spread_bits(grid[:, 0])
+            | _spread_bits(grid[:, 1]) << np.uint64(1)
+            | _spread_bits(grid[:, 2]) << np.uint64(2))
+
+def _highest_bit(values: np.ndarray) -> np.ndarray:
+    """Posición del bit más significativo de cada entero (sin pasar por float)"""
+    values = values.copy()
+    bit = np.zeros(len(values), dtype=np.uint64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        shift = np.uint64(shift)
+        upper = (values >> shift) != 0
+        bit[upper] += shift
+        values[upper] >>= shift
+    return bit
+
+def _ray_box_interval(origins, inv_directions, box_min, box_max):
+    """Intervalo [t_entrada, t_salida] de cada rayo contra cada caja (método de slabs)"""
+    with np.errstate(invalid='ignore'):
+        t1 = (box_min - origins) * inv_directions
+        t2 = (box_max - origins) * inv_directions
+    # fmin/fmax ignoran los NaN de rayos paralelos que parten sobre un plano de la caja
+    near, far = np.fmin(t1, t2), np.fmax(t1, t2)
+    t_near = np.fmax(np.fmax(near[:, 0], near[:, 1]), near[:, 2])
+    t_far = np.fmin(np.fmin(far[:, 0], far[:, 1]), far[:, 2])
+    return t_near, t_far
+
+def _ray_triangle(origins, directions, corners, epsilon=1e-12):
+    """Intersección rayo-triángulo de Möller–Trumbore para pares (rayo, triángulo)
+
+    Devuelve distancia t (inf si no hay impacto) y coordenadas baricéntricas u, v.
+    """
+    edge1 = corners[:, 1] - corners[:, 0]
+    edge2 = corners[:, 2] - corners[:, 0]
+    p = np.cross(directions, edge2)
+    det = np.einsum('ij,ij->i', edge1, p)
+    valid = np.abs(det) > epsilon
+    inv_det = 1.0 / np.where(valid, det, 1.0)
+    s = origins - corners[:, 0]
+    u = np.einsum('ij,ij->i', s, p) * inv_det
+    q = np.cross(s, edge1)
+    v = np.einsum('ij,ij->i', directions, q) * inv_det
+    t = np.einsum('ij,ij->i', edge2, q) * inv_det
+    hit = valid & (u >= 0) & (v >= 0) & (u + v <= 1) & (t >= 0)
+    return np.where(hit, t, np.inf), u, v
+
+def _closest_points_on_segments(points, starts, ends):
+    """Punto más cercano de cada segmento a cada punto (pares)"""
+    direction = ends - starts
+    length_sq = np.einsum('ij,ij->i', direction, direction)
+    t = np.einsum('ij,ij->i', points - starts, direction) / np.where(length_sq > 0, length_sq, 1.0)
+    return starts + direction * np.clip(t, 0.0, 1.0)[:, None]
+
+def _closest_points_on_triangles(points, corners):
+    """Punto más cercano de cada triángulo a cada punto (pares)
+
+    Se toma la proyección al plano si cae dentro del triángulo y, si no, el
+    mejor punto de sus tres aristas; así los triángulos degenerados (aristas
+    colapsadas) también dan un resultado válido.
+    """
+    a, b, c = corners[:, 0], corners[:, 1], corners[:, 2]
+    candidates = [_closest_points_on_segments(points, a, b),
+                  _closest_points_on_segments(points, b, c),
+                  _closest_points_on_segments(points, c, a)]
+    distances = np.stack([np.einsum('ij,ij->i', q - points, q - points) for q in candidates])
+    closest = np.choose(distances.argmin(axis=0)[:, None], candidates)
+
+    # Proyección interior por coordenadas baricéntricas
+    normal = np.cross(b - a, c - a)
+    area_sq = np.einsum('ij,ij->i', normal, normal)
+    solid = area_sq > 1e-24
+    safe_area = np.where(solid, area_sq, 1.0)
+    offset = np.einsum('ij,ij->i', points - a, normal) / safe_area
+    projected = points - normal * offset[:, None]
+    w_c = np.einsum('ij,ij->i', np.cross(b - a, projected - a), normal) / safe_area
+    w_b = np.einsum('ij,ij->i', np.cross(projected - a, c - a), normal) / safe_area
+    inside = solid & (w_b >= 0) & (w_c >= 0) & (w_b + w_c <= 1)
+    closest[inside] = projected[inside]
+    return closest
+
+def _triangles_overlap_box(corners, center, half_size):
+    """Prueba exacta triángulo-caja por ejes separadores (Akenine-Möller)"""
+    v = corners - center
+    edges = [v[:, 1] - v[:, 0], v[:, 2] - v[:, 1], v[:, 0] - v[:, 2]]
+    axes = [np.broadcast_to(np.eye(3)[k], v[:, 0].shape) for k in range(3)]
+    axes.append(np.cross(edges[0], edges[1]))
+    axes.extend(np.cross(np.eye(3)[k], edge) for k in range(3) for edge in edges)
+
+    overlap = np.ones(len(corners), dtype=bool)
+    for axis in axes:
+        projections = np.einsum('tij,tj->ti', v, axis)
+        radius = np.abs(axis) @ half_size
+        overlap &= (projections.min(axis=1) <= radius) & (projections.max(axis=1) >= -radius)
+    return overlap
+
+class SceneBVH:
+    """Jerarquía de volúmenes envolventes (AABB) sobre todos los triángulos de una escena
+
+    Se construye como LBVH: los triángulos se ordenan por el código de
+    Morton de su centroide y cada nodo se divide en el bit más
+    significativo en que difieren sus códigos, procesando un nivel completo
+    del árbol por operación vectorizada. Las consultas recorren el árbol en
+    anchura para todas las consultas a la vez, descartando nodos por caja.
+    """
+
+    def __init__(self, geometries: List[Geometry3D], leaf_size: int = 4):
+        self.leaf_size = max(1, int(leaf_size))
+        self._snapshots = {}
+        corners, owners, faces, local, ranges = [], [], [], [], {}
+        start = 0
+        for geometry in geometries:
+            triangles = geometry.get_triangles()
+            corners.append(geometry.vertex_array[triangles])
+            owners.append(np.full(len(triangles), geometry.id, dtype=np.int64))
+            faces.append(geometry.get_triangle_faces())
+            local.append(triangles)
+            ranges[geometry.id] = (start, start + len(triangles))
+            start += len(triangles)
+            self._snapshots[geometry.id] = self._snapshot(geometry)
+
+        corners = np.concatenate(corners) if corners else np.empty((0, 3, 3))
+        codes = morton_codes(corners.mean(axis=1))
+        self.order = np.argsort(codes, kind='stable')
+        self._codes = codes[self.order]
+        self._inverse_order = np.empty_like(self.order)
+        self._inverse_order[self.order] = np.arange(len(self.order))
+        self._geometry_ranges = ranges
+
+        # Triángulos en el orden del árbol
+        self.corners = corners[self.order]
+        self.triangle_geometry = (np.concatenate(owners) if owners else np.empty(0, dtype=np.int64))[self.order]
+        self.triangle_face = (np.concatenate(faces) if faces else np.empty(0, dtype=np.int64))[self.order]
+        self.triangle_vertices = (np.concatenate(local) if local else np.empty((0, 3), dtype=np.int64))[self.order]
+        self.triangle_min = self.corners.min(axis=1) if len(corners) else np.empty((0, 3))
+        self.triangle_max = self.corners.max(axis=1) if len(corners) else np.empty((0, 3))
+        self._build()
+
+    @staticmethod
+    def _snapshot(geometry: Geometry3D):
+        # Los arrays de Geometry3D son inmutables: su identidad sirve de versión
+        return (geometry._vertex_version(), geometry.face_indices, geometry.face_offsets)
+
+    def __len__(self):
+        return len(self.corners)
+
+    def _build(self):
+        """Construcción LBVH nivel por nivel"""
+        count = len(self.corners)
+        capacity = max(1, 2 * count - 1)
+        self.node_start = np.zeros(capacity, dtype=np.int64)
+        self.node_count = np.zeros(capacity, dtype=np.int64)
+        self.left = np.full(capacity, -1, dtype=np.int64)
+        self.right = np.full(capacity, -1, dtype=np.int64)
+        self.parent = np.full(capacity, -1, dtype=np.int64)
+        self.depth = np.zeros(capacity, dtype=np.int64)
+
+        nodes = np.array([0])
+        starts, ends = np.array([0]), np.array([count])
+        next_node, level = 1, 0
+        while len(nodes):
+            self.node_start[nodes] = starts
+            self.node_count[nodes] = ends - starts
+            self.depth[nodes] = level
+            split_mask = ends - starts > self.leaf_size
+            nodes, starts, ends = nodes[split_mask], starts[split_mask], ends[split_mask]
+            if not len(nodes):
+                break
+
+            # Dividir en el bit más alto en que difieren el primer y último código
+            first, last = self._codes[starts], self._codes[ends - 1]
+            differ = first != last
+            split = (starts + ends) // 2
+            if differ.any():
+                bit = _highest_bit(first[differ] ^ last[differ])
+                target = ((first[differ] >> bit) | np.uint64(1)) << bit
+                split[differ] = np.searchsorted(self._codes, target, side='left')
+
+            children = next_node + 2 * np.arange(len(nodes))
+            next_node += 2 * len(nodes)
+            self.left[nodes], self.right[nodes] = children, children + 1
+            self.parent[children] = self.parent[children + 1] = nodes
+            nodes = np.stack([children, children + 1], axis=1).ravel()
+            starts = np.stack([starts, split], axis=1).ravel()
+            ends = np.stack([split, ends], axis=1).ravel()
+            level += 1
+
+        for name in ('node_start', 'node_count', 'left', 'right', 'parent', 'depth'):
+            setattr(self, name, getattr(self, name)[:next_node])
+
+        self.leaves = np.flatnonzero(self.left < 0)
+        ordered_leaves = self.leaves[np.argsort(self.node_start[self.leaves], kind='stable')]
+        self.leaf_of_triangle = np.repeat(ordered_leaves, self.node_count[ordered_leaves])
+
+        self.box_min = np.full((next_node, 3), np.inf)
+        self.box_max = np.full((next_node, 3), -np.inf)
+        if count:
+            self._refit_nodes(self.leaves, np.flatnonzero(self.left >= 0))
+
+    def _refit_nodes(self, leaves: np.ndarray, ancestors: Optional[np.ndarray] = None):
+        """Recalcular las cajas de unas hojas y de todos sus ancestros"""
+        leaves = leaves[np.argsort(self.node_start[leaves], kind='stable')]
+        counts = self.node_count[leaves]
+        offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        members = (np.repeat(self.node_start[leaves] - offsets, counts)
+                   + np.arange(counts.sum()))
+        self.box_min[leaves] = np.minimum.reduceat(self.triangle_min[members], offsets, axis=0)
+        self.box_max[leaves] = np.maximum.reduceat(self.triangle_max[members], offsets, axis=0)
+
+        # Ancestros afectados, procesados del nivel más profundo a la raíz
+        if ancestors is None:
+            ancestors = []
+            nodes = np.unique(self.parent[leaves])
+            nodes = nodes[nodes >= 0]
+            while len(nodes):
+                ancestors.append(nodes)
+                nodes = np.unique(self.parent[nodes])
+                nodes = nodes[nodes >= 0]
+            ancestors = np.concatenate(ancestors) if ancestors else np.empty(0, dtype=np.int64)
+        if not len(ancestors):
+            return
+        ancestors = ancestors[np.argsort(-self.depth[ancestors], kind='stable')]
+        depths = self.depth[ancestors]
+        bounds = np.flatnonzero(np.diff(depths)) + 1
+        for nodes in np.split(ancestors, bounds):
+            self.box_min[nodes] = np.minimum(self.box_min[self.left[nodes]], self.box_min[self.right[nodes]])
+            self.box_max[nodes] = np.maximum(self.box_max[self.left[nodes]], self.box_max[self.right[nodes]])
+
+    def refit(self, geometry: Geometry3D) -> bool:
+        """Reajustar las cajas tras mover o deformar una geometría
+
+        Sólo se actualizan sus triángulos, las hojas que los contienen y los
+        ancestros de éstas. Devuelve False si la topología cambió y hace falta
+        reconstruir.
+        """
+        start, end = self._geometry_ranges.get(geometry.id, (0, -1))
+        triangles = geometry.get_triangles()
+        if end - start != len(triangles):
+            return False
+        positions = self._inverse_order[start:end]
+        corners = geometry.vertex_array[triangles]
+        self.corners[positions] = corners
+        self.triangle_min[positions] = corners.min(axis=1)
+        self.triangle_max[positions] = corners.max(axis=1)
+        if len(positions):
+            self._refit_nodes(np.unique(self.leaf_of_triangle[positions]))
+        self._snapshots[geometry.id] = self._snapshot(geometry)
+        return True
+
+    def update(self, geometries: List[Geometry3D]) -> bool:
+        """Sincronizar con las geometrías: reajusta las que se movieron
+
+        Devuelve False si cambió el conjunto de geometrías o sus caras.
+        """
+        if [g.id for g in geometries] != list(self._snapshots):
+            return False
+        for geometry in geometries:
+            version, indices, offsets = self._snapshots[geometry.id]
+            if geometry.face_indices is not indices or geometry.face_offsets is not offsets:
+                return False
+            current = geometry._vertex_version()
+            moved = len(current) != len(version) or any(a is not b for a, b in zip(current, version))
+            if moved and not self.refit(geometry):
+                return False
+        return True
+
+    def _traverse(self, query_count: int, node_filter):
+        """Recorrido en anchura de todas las consultas a la vez
+
+        `node_filter(consultas, nodos)` devuelve la máscara de pares que
+        siguen; en cada nivel se entregan los pares (consulta, hoja) para que
+        quien llama pueda actualizar su estado y afinar el filtro.
+        """
+        if not len(self.corners):
+            return
+        queries = np.arange(query_count)
+        nodes = np.zeros(query_count, dtype=np.int64)
+        while len(queries):
+            keep = node_filter(queries, nodes)
+            queries, nodes = queries[keep], nodes[keep]
+            leaf = self.left[nodes] < 0
+            if leaf.any():
+                yield self._expand_leaves(queries[leaf], nodes[leaf])
+            inner = nodes[~leaf]
+            queries = np.repeat(queries[~leaf], 2)
+            nodes = np.stack([self.left[inner], self.right[inner]], axis=1).ravel()
+
+    def _expand_leaves(self, queries: np.ndarray, leaves: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Convertir pares (consulta, hoja) en pares (consulta, triángulo)"""
+        counts = self.node_count[leaves]
+        first = np.repeat(np.cumsum(counts) - counts, counts)
+        triangles = np.repeat(self.node_start[leaves], counts) + np.arange(counts.sum()) - first
+        return np.repeat(queries, counts), triangles
+
+    def intersect_rays(self, origins: np.ndarray, directions: np.ndarray,
+                       max_distance: float = np.inf) -> Tuple[np.ndarray, ...]:
+        """Impacto más cercano de cada rayo
+
+        Devuelve (t, triángulo, u, v); triángulo es -1 y t es inf si el rayo
+        no impacta. Los índices de triángulo son posiciones del árbol
+        (ver `triangle_geometry` y `triangle_face`).
+        """
+        origins = np.asarray(origins, dtype=np.float64).reshape(-1, 3)
+        directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+        count = len(origins)
+        best_t = np.full(count, float(max_distance))
+        best_triangle = np.full(count, -1, dtype=np.int64)
+        best_u, best_v = np.zeros(count), np.zeros(count)
+        with np.errstate(divide='ignore'):
+            inv_directions = 1.0 / directions
+
+        def node_filter(queries, nodes):
+            t_near, t_far = _ray_box_interval(origins[queries], inv_directions[queries],
+                                              self.box_min[nodes], self.box_max[nodes])
+            return (t_near <= t_far) & (t_far >= 0) & (t_near <= best_t[queries])
+
+        for queries, triangles in self._traverse(count, node_filter):
+            t, u, v = _ray_triangle(origins[queries], directions[queries], self.corners[triangles])
+            better = t < best_t[queries]
+            queries, triangles, t, u, v = queries[better], triangles[better], t[better], u[better], v[better]
+            np.minimum.at(best_t, queries, t)
+            winner = t == best_t[queries]
+            best_triangle[queries[winner]] = triangles[winner]
+            best_u[queries[winner]] = u[winner]
+            best_v[queries[winner]] = v[winner]
+
+        best_t[best_triangle < 0] = np.inf
+        return best_t, best_triangle, best_u, best_v
+
+    def query_box(self, box_min, box_max) -> np.ndarray:
+        """Triángulos (posiciones del árbol) que intersecan una caja alineada a los ejes"""
+        box_min = np.asarray(box_min, dtype=np.float64)
+        box_max = np.asarray(box_max, dtype=np.float64)
+
+        def node_filter(queries, nodes):
+            return np.all((self.box_min[nodes] <= box_max) & (self.box_max[nodes] >= box_min), axis=1)
+
+        found = []
+        for _, triangles in self._traverse(1, node_filter):
+            candidates = triangles[np.all((self.triangle_min[triangles] <= box_max)
+                                          & (self.triangle_max[triangles] >= box_min), axis=1)]
+            exact = _triangles_overlap_box(self.corners[candidates], (box_min + box_max) / 2,
+                                           (box_max - box_min) / 2)
+            found.append(candidates[exact])
+        return np.sort(np.concatenate(found)) if found else np.empty(0, dtype=np.int64)
+
+    def query_sphere(self, center, radius: float) -> np.ndarray:
+        """Triángulos (posiciones del árbol) que intersecan una esfera"""
+        center = np.asarray(center, dtype=np.float64)
+        radius_sq = float(radius) ** 2
+
+        def node_filter(queries, nodes):
+            nearest = np.clip(center, self.box_min[nodes], self.box_max[nodes])
+            return np.einsum('ij,ij->i', nearest - center, nearest - center) <= radius_sq
+
+        found = []
+        for _, triangles in self._traverse(1, node_filter):
+            closest = _closest_points_on_triangles(np.broadcast_to(center, (len(triangles), 3)),
+                                                   self.corners[triangles])
+            found.append(triangles[np.einsum('ij,ij->i', closest - center, closest - center) <= radius_sq])
+        return np.sort(np.concatenate(found)) if found else np.empty(0, dtype=np.int64)
+
+    def nearest_points(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Punto de superficie más cercano a cada consulta
+
+        Devuelve (puntos más cercanos, distancias, triángulo). Primero se baja
+        por el hijo más cercano hasta una hoja para tener una cota inicial y
+        luego se descartan los nodos cuya caja está más lejos que esa cota.
+        La cota se afina en cada nivel con la esquina más lejana de cada caja
+        visitada, que siempre contiene al menos un triángulo.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        count = len(points)
+        best_sq = np.full(count, np.inf)
+        best_triangle = np.full(count, -1, dtype=np.int64)
+        best_point = np.full((count, 3), np.nan)
+        bound_sq = np.full(count, np.inf)
+        if not len(self.corners):
+            return best_point, np.sqrt(best_sq), best_triangle
+
+        def box_distance_sq(queries, nodes):
+            nearest = np.clip(points[queries], self.box_min[nodes], self.box_max[nodes])
+            offset = nearest - points[queries]
+            return np.einsum('ij,ij->i', offset, offset)
+
+        def node_filter(queries, nodes):
+            query_points = points[queries]
+            far = np.maximum(np.abs(query_points - self.box_min[nodes]),
+                             np.abs(query_points - self.box_max[nodes]))
+            np.minimum.at(bound_sq, queries, np.einsum('ij,ij->i', far, far))
+            limit = np.minimum(best_sq, bound_sq)[queries]
+            return box_distance_sq(queries, nodes) <= limit
+
+        def consider(queries, triangles):
+            # Descartar primero por la caja de cada triángulo
+            nearest = np.clip(points[queries], self.triangle_min[triangles], self.triangle_max[triangles])
+            offset = nearest - points[queries]
+            near = np.einsum('ij,ij->i', offset, offset) <= np.minimum(best_sq, bound_sq)[queries]
+            queries, triangles = queries[near], triangles[near]
+            closest = _closest_points_on_triangles(points[queries], self.corners[triangles])
+            offset = closest - points[queries]
+            distance_sq = np.einsum('ij,ij->i', offset, offset)
+            better = distance_sq < best_sq[queries]
+            queries, triangles = queries[better], triangles[better]
+            closest, distance_sq = closest[better], distance_sq[better]
+            np.minimum.at(best_sq, queries, distance_sq)
+            winner = distance_sq == best_sq[queries]
+            best_triangle[queries[winner]] = triangles[winner]
+            best_point[queries[winner]] = closest[winner]
+
+        # Descenso voraz para obtener una cota superior
+        queries = np.arange(count)
+        nodes = np.zeros(count, dtype=np.int64)
+        inner = self.left[nodes] >= 0
+        while inner.any():
+            q, n = queries[inner], nodes[inner]
+            go_left = box_distance_sq(q, self.left[n]) <= box_distance_sq(q, self.right[n])
+            nodes[inner] = np.where(go_left, self.left[n], self.right[n])
+            inner = self.left[nodes] >= 0
+        consider(*self._expand_leaves(queries, nodes))
+
+        for queries, triangles in self._traverse(count, node_filter):
+            consider(queries, triangles)
+
+        return best_point, np.sqrt(best_sq), best_triangle
+
+def _plane_quadrics(normals: np.ndarray, offsets: np.ndarray,
+                    weights: Optional[np.ndarray] = None) -> np.ndarray:
+    """Cuádricas de error de planos n·p + d = 0 en forma simétrica (N, 10)
+
+    Orden de componentes: aa, ab, ac, ad, bb, bc, bd, cc, cd, dd.
+    """
+    a, b, c = normals[:, 0], normals[:, 1], normals[:, 2]
+    d = offsets
+    quadrics = np.stack([a * a, a * b, a * c, a * d, b * b,
+                         b * c, b * d, c * c, c * d, d * d], axis=1)
+    if weights is not None:
+        quadrics *= weights[:, None]
+    return quadrics
+
+
+def _accumulate_quadrics(vertex_count: int, vertex_ids: np.ndarray,
+                         quadrics: np.ndarray) -> np.ndarray:
+    """Sumar cuádricas por vértice"""
+    return np.stack([np.bincount(vertex_ids, weights=quadrics[:, k], minlength=vertex_count)
+                     for k in range(10)], axis=1)
+
+
+def _quadric_error(quadrics: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """Evaluar vᵀQv para cada punto"""
+    q = quadrics.T
+    x, y, z = points.T
+    return (q[0] * x * x + 2 * q[1] * x * y + 2 * q[2] * x * z + 2 * q[3] * x
+            + q[4] * y * y + 2 * q[5] * y * z + 2 * q[6] * y
+            + q[7] * z * z + 2 * q[8] * z + q[9])
+
+
+def _optimal_points(quadrics: np.ndarray, first: np.ndarray,
+                    second: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Posición de mínimo error para colapsar cada arista y su coste
+
+    Si el sistema 3x3 está mal condicionado (zonas planas o aristas rectas)
+    se elige el mejor entre los dos extremos y el punto medio.
+    """
+    a, b, c, p, d, e, r, f, t = quadrics.T[:9]
+    # Adjunta de la matriz simétrica [[a, b, c], [b, d, e], [c, e, f]]
+    m11, m12, m13 = d * f - e * e, c * e - b * f, b * e - c * d
+    m22, m23, m33 = a * f - c * c, b * c - a * e, a * d - b * b
+    determinant = a * m11 + b * m12 + c * m13
+    solvable = np.abs(determinant) > 1e-9 * (np.abs(a) + np.abs(d) + np.abs(f)) ** 3
+
+    scale = -1.0 / np.where(solvable, determinant, 1.0)
+    points = np.stack([m11 * p + m12 * r + m13 * t,
+                       m12 * p + m22 * r + m23 * t,
+                       m13 * p + m23 * r + m33 * t], axis=1) * scale[:, None]
+    costs = _quadric_error(quadrics, points)
+    # Un óptimo muy alejado de la arista indica un sistema casi singular
+    midpoint = 0.5 * (first + second)
+    reach = np.einsum('ij,ij->i', second - first, second - first)
+    solvable &= np.einsum('ij,ij->i', points - midpoint, points - midpoint) <= 4.0 * reach
+
+    singular = np.flatnonzero(~solvable)
+    if len(singular):
+        q, ends = quadrics[singular], (first[singular], second[singular])
+        candidates = np.stack([ends[0], ends[1], 0.5 * (ends[0] + ends[1])])
+        errors = np.stack([_quadric_error(q, candidate) for candidate in candidates])
+        best = np.argmin(errors, axis=0)
+        points[singular] = candidates[best, np.arange(len(singular))]
+        costs[singular] = errors[best, np.arange(len(singular))]
+    return points, np.maximum(costs, 0.0)
+
+
+def _unique_edges(triangles: np.ndarray, vertex_count: int,
+                  return_sides: bool = False) -> Tuple[np.ndarray, ...]:
+    """Aristas no dirigidas de una malla triangular
+
+    Devuelve las claves ordenadas (menor * V + mayor) y cuántos triángulos
+    comparten cada arista; con `return_sides` también la arista de cada lado
+    de triángulo (T*3).
+    """
+    sides = triangles[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2)
+    keys = np.minimum(sides[:, 0], sides[:, 1]) * vertex_count + np.maximum(sides[:, 0], sides[:, 1])
+    if not return_sides:
+        return np.unique(keys, return_counts=True)
+    keys, side_edge, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    return keys, counts, side_edge.ravel()
+
+
+def decimate_triangles(vertices: np.ndarray, triangles: np.ndarray,
+                       target_faces: Optional[int] = None,
+                       target_vertices: Optional[int] = None,
+                       max_error: Optional[float] = None,
+                       triangle_labels: Optional[np.ndarray] = None,
+                       preserve_boundary: bool = True) -> Dict:
+    """Simplificar una malla triangular por colapso de aristas con cuádricas
+
+    En cada pasada se ordenan las aristas por error (Garland-Heckbert) y se
+    colapsa a la vez un conjunto de aristas cuyos anillos de vecinos no se
+    tocan, rechazando colapsos que rompan la variedad (condición de enlace)
+    o inviertan triángulos. Los vértices de bordes abiertos, aristas no
+    variedad y fronteras entre etiquetas (materiales) quedan fijos.
+
+    Se detiene al alcanzar `target_faces`/`target_vertices` o cuando ninguna
+    arista restante tiene error menor que `max_error`.
+
+    Devuelve un diccionario con 'vertices', 'triangles', 'source_triangles'
+    (triángulo original de cada triángulo final) y 'max_error'.
+    """
+    if target_faces is None and target_vertices is None and max_error is None:
+        raise ValueError("Se necesita target_faces, target_vertices o max_error")
+
+    vertices = np.array(vertices, dtype=np.float64)
+    triangles = np.array(triangles, dtype=np.int64).reshape(-1, 3)
+    source = np.arange(len(triangles))
+    vertex_count = len(vertices)
+    if not len(triangles):
+        return {'vertices': vertices, 'triangles': triangles,
+                'source_triangles': source, 'max_error': 0.0}
+
+    # Cuádricas de los planos de cada triángulo
+    corners = vertices[triangles]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    lengths = np.linalg.norm(normals, axis=1)
+    normals = np.divide(normals, lengths[:, None], out=np.zeros_like(normals),
+                        where=lengths[:, None] > 0)
+    plane_offsets = -np.einsum('ij,ij->i', normals, corners[:, 0])
+    quadrics = _accumulate_quadrics(vertex_count, triangles.ravel(),
+                                    np.repeat(_plane_quadrics(normals, plane_offsets), 3, axis=0))
+
+    keys, counts, side_edge = _unique_edges(triangles, vertex_count, return_sides=True)
+    first, second = keys // vertex_count, keys % vertex_count
+    locked = np.zeros(vertex_count, dtype=bool)
+    locked[first[counts > 2]] = locked[second[counts > 2]] = True
+    boundary = np.zeros(vertex_count, dtype=bool)
+    boundary[first[counts == 1]] = boundary[second[counts == 1]] = True
+
+    if preserve_boundary:
+        locked |= boundary
+    elif (counts == 1).any():
+        # Planos perpendiculares al borde para que no se encoja
+        border_sides = np.flatnonzero(counts[side_edge] == 1)
+        border_triangles = border_sides // 3
+        start = triangles.ravel()[border_sides]
+        end = triangles[border_triangles, (border_sides % 3 + 1) % 3]
+        direction = vertices[end] - vertices[start]
+        border_normals = np.cross(direction, normals[border_triangles])
+        border_lengths = np.linalg.norm(border_normals, axis=1)
+        border_normals = np.divide(border_normals, border_lengths[:, None],
+                                   out=np.zeros_like(border_normals),
+                                   where=border_lengths[:, None] > 0)
+        border_offsets = -np.einsum('ij,ij->i', border_normals, vertices[start])
+        border_quadrics = _plane_quadrics(border_normals, border_offsets,
+                                          np.full(len(border_sides), 100.0))
+        quadrics += _accumulate_quadrics(vertex_count, np.concatenate([start, end]),
+                                         np.concatenate([border_quadrics, border_quadrics]))
+
+    if triangle_labels is not None:
+        # Fijar vértices en la frontera entre etiquetas distintas
+        labels = np.repeat(np.asarray(triangle_labels), 3)
+        low = np.full(len(keys), np.iinfo(np.int64).max)
+        high = np.full(len(keys), np.iinfo(np.int64).min)
+        _, label_codes = np.unique(labels, return_inverse=True)
+        np.minimum.at(low, side_edge, label_codes.ravel())
+        np.maximum.at(high, side_edge, label_codes.ravel())
+        seam = low != high
+        locked[first[seam]] = locked[second[seam]] = True
+
+    rejected = np.empty(0, dtype=np.int64)
+    changed = np.ones(vertex_count, dtype=bool)
+    cached_keys = np.empty(0, dtype=np.int64)
+    cached_costs, cached_targets = np.empty(0), np.empty((0, 3))
+    worst = 0.0
+
+    while True:
+        face_budget = len(triangles) - target_faces if target_faces is not None else None
+        live_vertices = np.count_nonzero(np.bincount(triangles.ravel(), minlength=vertex_count))
+        vertex_budget = live_vertices - target_vertices if target_vertices is not None else None
+        if (face_budget is not None and face_budget <= 0) or (vertex_budget is not None and vertex_budget <= 0):
+            break
+
+        keys, counts = _unique_edges(triangles, vertex_count)
+        first, second = keys // vertex_count, keys % vertex_count
+        # El vértice fijo (si lo hay) es el que se conserva
+        swap = locked[second] & ~locked[first]
+        first, second = np.where(swap, second, first), np.where(swap, first, second)
+
+        # Sólo se recalculan las aristas que tocan vértices modificados
+        all_costs = np.full(len(keys), np.inf)
+        all_targets = np.empty((len(keys), 3))
+        dirty = changed[first] | changed[second]
+        clean = np.flatnonzero(~dirty)
+        position = np.searchsorted(cached_keys, keys[clean])
+        all_costs[clean], all_targets[clean] = cached_costs[position], cached_targets[position]
+        # Las aristas no variedad ya tienen ambos extremos fijos
+        update = np.flatnonzero(dirty & ~locked[second])
+        if len(update):
+            merged = quadrics[first[update]] + quadrics[second[update]]
+            targets, costs = _optimal_points(merged, vertices[first[update]], vertices[second[update]])
+            fixed = locked[first[update]]
+            targets[fixed] = vertices[first[update[fixed]]]
+            costs[fixed] = np.maximum(_quadric_error(merged[fixed], targets[fixed]), 0.0)
+            all_costs[update], all_targets[update] = costs, targets
+        cached_keys, cached_costs, cached_targets = keys, all_costs, all_targets
+        changed[:] = False
+
+        candidate = np.isfinite(all_costs)
+        # Una arista interior entre dos vértices de borde estrangularía la malla
+        candidate &= ~(boundary[first] & boundary[second] & (counts != 1))
+        if len(rejected):
+            candidate &= ~np.isin(keys, rejected, assume_unique=True)
+        if max_error is not None:
+            candidate &= all_costs <= max_error
+        edges = np.flatnonzero(candidate)
+        if not len(edges):
+            break
+        targets, costs = all_targets[edges], all_costs[edges]
+
+        # Conjunto independiente: la arista de menor coste en el anillo de
+        # ambos extremos gana, así los colapsos de una pasada no interfieren.
+        # Varias rondas acercan el resultado al orden voraz secuencial.
+        order = np.argsort(costs)
+        rank = np.empty(len(edges), dtype=np.int64)
+        rank[order] = np.arange(len(edges))
+        edge_first, edge_second = first[edges], second[edges]
+        available = np.ones(len(edges), dtype=bool)
+        blocked = np.zeros(vertex_count, dtype=bool)
+        chosen = []
+        for _ in range(4):
+            pending = np.flatnonzero(available)
+            if not len(pending):
+                break
+            vertex_rank = np.full(vertex_count, len(edges))
+            np.minimum.at(vertex_rank, edge_first[pending], rank[pending])
+            np.minimum.at(vertex_rank, edge_second[pending], rank[pending])
+            triangle_rank = vertex_rank[triangles].min(axis=1)
+            active = np.flatnonzero(triangle_rank < len(edges))
+            ring_rank = np.full(vertex_count, len(edges))
+            np.minimum.at(ring_rank, triangles[active].ravel(), np.repeat(triangle_rank[active], 3))
+            winners = pending[(ring_rank[edge_first[pending]] == rank[pending])
+                              & (ring_rank[edge_second[pending]] == rank[pending])]
+            chosen.append(winners)
+            # Bloquear el anillo de los extremos elegidos
+            blocked[edge_first[winners]] = blocked[edge_second[winners]] = True
+            blocked[triangles[blocked[triangles].any(axis=1)]] = True
+            available &= ~(blocked[edge_first] | blocked[edge_second])
+        chosen = np.concatenate(chosen)
+        chosen = chosen[np.argsort(rank[chosen])]
+
+        # Recortar para no pasarse del objetivo
+        if face_budget is not None:
+            removed = np.cumsum(counts[edges[chosen]])
+            chosen = chosen[removed - counts[edges[chosen]] < face_budget]
+        if vertex_budget is not None:
+            chosen = chosen[:vertex_budget]
+
+        keep_vertex, drop_vertex = first[edges[chosen]], second[edges[chosen]]
+        collapse_of = np.full(vertex_count, -1)
+        collapse_of[keep_vertex] = np.arange(len(chosen))
+        collapse_of[drop_vertex] = np.arange(len(chosen))
+
+        # Triángulos alrededor de cada colapso
+        flat = triangles.ravel()
+        touched = np.flatnonzero(collapse_of[flat] >= 0)
+        touched_triangle = touched // 3
+        touched_collapse = collapse_of[flat[touched]]
+        ring = triangles[touched_triangle]
+        inside = ((ring == keep_vertex[touched_collapse, None]).any(axis=1)
+                  & (ring == drop_vertex[touched_collapse, None]).any(axis=1))
+
+        # Condición de enlace: vecinos comunes == triángulos de la arista
+        valid = np.ones(len(chosen), dtype=bool)
+        from_keep = np.flatnonzero(flat[touched] == keep_vertex[touched_collapse])
+        corner = touched[from_keep] % 3
+        neighbor_collapse = np.repeat(touched_collapse[from_keep], 2)
+        neighbors = np.stack([ring[from_keep, (corner + 1) % 3],
+                              ring[from_keep, (corner + 2) % 3]], axis=1).ravel()
+        other = neighbors != drop_vertex[neighbor_collapse]
+        neighbors, neighbor_collapse = neighbors[other], neighbor_collapse[other]
+        lookup = (np.minimum(neighbors, drop_vertex[neighbor_collapse]) * vertex_count
+                  + np.maximum(neighbors, drop_vertex[neighbor_collapse]))
+        position = np.minimum(np.searchsorted(keys, lookup), len(keys) - 1)
+        shared = keys[position] == lookup
+        pairs = np.unique(neighbor_collapse[shared] * vertex_count + neighbors[shared])
+        common = np.bincount(pairs // vertex_count, minlength=len(chosen))
+        valid &= common == counts[edges[chosen]]
+
+        # Rechazar colapsos que invierten o degeneran triángulos vecinos
+        outer = ~inside
+        outer_collapse = touched_collapse[outer]
+        old_corners = vertices[ring[outer]]
+        moving = (flat[touched[outer], None] == ring[outer])
+        new_corners = np.where(moving[:, :, None], targets[chosen][outer_collapse][:, None, :], old_corners)
+        old_normals = np.cross(old_corners[:, 1] - old_corners[:, 0], old_corners[:, 2] - old_corners[:, 0])
+        new_normals = np.cross(new_corners[:, 1] - new_corners[:, 0], new_corners[:, 2] - new_corners[:, 0])
+        flipped = np.einsum('ij,ij->i', old_normals, new_normals) <= 1e-12 * np.einsum('ij,ij->i', old_normals, old_normals)
+        valid[outer_collapse[flipped]] = False
+
+        if not valid.any():
+            rejected = np.union1d(rejected, keys[edges[chosen]])
+            continue
+        rejected = np.union1d(rejected, keys[edges[chosen[~valid]]])
+
+        # Aplicar colapsos válidos
+        keep_vertex, drop_vertex = keep_vertex[valid], drop_vertex[valid]
+        vertices[keep_vertex] = targets[chosen[valid]]
+        quadrics[keep_vertex] += quadrics[drop_vertex]
+        locked[keep_vertex] |= locked[drop_vertex]
+        boundary[keep_vertex] |= boundary[drop_vertex]
+        changed[keep_vertex] = True
+        worst = max(worst, float(costs[chosen[valid]].max()))
+
+        mapping = np.arange(vertex_count)
+        mapping[drop_vertex] = keep_vertex
+        triangles = mapping[triangles]
+        alive = ((triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2])
+                 & (triangles[:, 2] != triangles[:, 0]))
+        triangles, source = triangles[alive], source[alive]
+
+    # Compactar vértices conservando su orden
+    used = np.unique(triangles)
+    compact = np.full(vertex_count, -1)
+    compact[used] = np.arange(len(used))
+    return {'vertices': vertices[used], 'triangles': compact[triangles],
+            'source_triangles': source, 'max_error': worst}
+
+
+def _trace_polylines(node_a: np.ndarray, node_b: np.ndarray,
+                     node_count: int) -> List[Tuple[List[int], bool]]:
+    """Encadenar segmentos (pares de nodos) en polilíneas ordenadas
+
+    Cada nodo suele tocar dos segmentos; las cadenas abiertas se recorren
+    desde sus extremos. Devuelve (lista de nodos, cerrada) por polilínea.
+    """
+    segment_count = len(node_a)
+    ends = np.concatenate([node_a, node_b])
+    order = np.argsort(ends, kind='stable')
+    incident = np.tile(np.arange(segment_count), 2)[order].tolist()
+    incident_offsets = np.searchsorted(ends[order], np.arange(node_count + 1)).tolist()
+    degree = np.bincount(ends, minlength=node_count)
+
+    # Empezar por los extremos de cadenas abiertas
+    open_ends = degree[node_a] != 2
+    starts = np.concatenate([np.flatnonzero(open_ends | (degree[node_b] != 2)),
+                             np.arange(segment_count)]).tolist()
+    first, second = node_a.tolist(), node_b.tolist()
+    degree = degree.tolist()
+    visited = [False] * segment_count
+    polylines = []
+
+    for segment in starts:
+        if visited[segment]:
+            continue
+        node = second[segment] if degree[second[segment]] != 2 and degree[first[segment]] == 2 else first[segment]
+        path = [node]
+        while segment is not None:
+            visited[segment] = True
+            node = second[segment] if first[segment] == node else first[segment]
+            path.append(node)
+            segment = None
+            for candidate in incident[incident_offsets[node]:incident_offsets[node + 1]]:
+                if not visited[candidate]:
+                    segment = candidate
+                    break
+        closed = len(path) > 2 and path[0] == path[-1]
+        polylines.append((path[:-1] if closed else path, closed))
+    return polylines
+
+# Registro de triángulo de STL binario: normal, 3 vértices y atributo de 2 bytes
+_STL_DTYPE = np.dtype([('normal', '<f4', (3,)), ('vertices', '<f4', (3, 3)), ('attribute', '<u2')])
+
+# Rugosidad PBR por defecto según la textura nominal de los materiales
+_GLTF_ROUGHNESS = {'metal': 0.35, 'smooth': 0.2, 'glass': 0.05, 'wood': 0.8, 'brick': 0.9, 'tile': 0.6}
+_GLTF_METALLIC = {'metal'}
+
+# Contenedor binario de escenas: firma, versión y alineación de los bloques de datos
+_SCENE_MAGIC = b'M3DSCENE'
+_SCENE_VERSION = 1
+_SCENE_ALIGNMENT = 64
+
+# Tipos escalares de PLY (nombres clásicos y con tamaño)
+_PLY_TYPES = {
+    'char': 'i1', 'int8': 'i1', 'uchar': 'u1', 'uint8': 'u1',
+    'short': 'i2', 'int16': 'i2', 'ushort': 'u2', 'uint16': 'u2',
+    'int': 'i4', 'int32': 'i4', 'uint': 'u4', 'uint32': 'u4',
+    'float': 'f4', 'float32': 'f4', 'double': 'f8', 'float64': 'f8'
+}
+
+def _obj_rows(tag: str, values: np.ndarray, precision: Optional[int] = None) -> str:
+    """Formatear un bloque de filas OBJ (`v`, `vt`, `vn`) en una sola operación"""
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return ""
+    columns = values.shape[1]
+    if precision is None:
+        # repr de float: la misma salida que formatear cada número con f-string
+        row = tag + " %s" * columns + "\n"
+        return (row * len(values)) % tuple(map(repr, values.ravel().tolist()))
+    row = tag + f" %.{int(precision)}f" * columns + "\n"
+    return (row * len(values)) % tuple(values.ravel().tolist())
+
+
+def _obj_faces(sizes: np.ndarray, columns: np.ndarray, separator: str = '/') -> str:
+    """Formatear todas las caras OBJ de una geometría en una sola operación
+
+    `columns` tiene una fila por índice de cara y una columna por
+    referencia (v, vt, vn), ya con base 1.
+    """
+    if not len(sizes):
+        return ""
+    corner = separator.join(["%d"] * columns.shape[1])
+    templates = {}
+    for size in np.unique(sizes).tolist():
+        templates[size] = "f" + (" " + corner) * size + "\n"
+    if len(templates) == 1:
+        template = templates[int(sizes[0])] * len(sizes)
+    else:
+        template = "".join([templates[size] for size in sizes.tolist()])
+    return template % tuple(columns.ravel().tolist())
+
+
+def _hex_to_rgb(color, default: Tuple[float, float, float] = (0.8, 0.8, 0.8)) -> Tuple[float, float, float]:
+    """Color '#RRGGBB' a componentes (r, g, b) en [0, 1]"""
+    color = str(color).lstrip('#')
+    try:
+        return tuple(int(color[k:k + 2], 16) / 255.0 for k in (0, 2, 4))
+    except ValueError:
+        return default
+
+
+def _srgb_to_linear(rgb) -> List[float]:
+    """Componentes sRGB a RGB lineal (glTF usa colores lineales)"""
+    rgb = np.asarray(rgb, dtype=np.float64)
+    return np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4).tolist()
+
+
+def _rotation_to_direction(direction) -> List[float]:
+    """Cuaternión (x, y, z, w) que gira el eje -Z hacia `direction`"""
+    direction = np.asarray(direction, dtype=np.float64)
+    length = np.linalg.norm(direction)
+    if length == 0:
+        return [0.0, 0.0, 0.0, 1.0]
+    direction = direction / length
+    axis = np.cross([0.0, 0.0, -1.0], direction)
+    cosine = -direction[2]
+    if np.linalg.norm(axis) < 1e-12:
+        return [0.0, 0.0, 0.0, 1.0] if cosine > 0 else [1.0, 0.0, 0.0, 0.0]
+    quaternion = np.append(axis, 1.0 + cosine)
+    return (quaternion / np.linalg.norm(quaternion)).tolist()
+
+
+def _obj_numbers(text: str, dtype=np.float64) -> Optional[np.ndarray]:
+    """Leer todos los números de un bloque de texto; None si hay algo que no es número"""
+    if not text or text.isspace():
+        return np.empty(0, dtype=dtype)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        try:
+            return np.fromstring(text, dtype=dtype, sep=' ')
+        except (ValueError, DeprecationWarning):
+            return None
+
+
+def _obj_vectors(lines: List[str], tag: str, width: int) -> np.ndarray:
+    """Leer un bloque de líneas `v`, `vt` o `vn` como array (N, width)
+
+    Caso habitual: exactamente `width` números por línea, leídos de una
+    vez. Si no (componente w, colores, comentarios), se lee línea a línea
+    y se toman los primeros `width` valores.
+    """
+    values = _obj_numbers(" ".join(lines).replace(tag, " "))
+    if values is not None and len(values) == width * len(lines):
+        return values.reshape(-1, width)
+    rows = np.zeros((len(lines), width))
+    for row, line in enumerate(lines):
+        numbers = [float(word) for word in line.split('#')[0].split()[1:width + 1]]
+        rows[row, :len(numbers)] = numbers
+    return rows
+
+
+def _obj_corners(lines: List[str], counts: Tuple[int, int, int]) -> Tuple[np.ndarray, np.ndarray]:
+    """Leer un bloque de líneas `f` como (tamaños, referencias)
+
+    Las referencias son (esquinas, 3) con los índices v, vt, vn ya en base
+    0; los negativos se resuelven con `counts` (elementos definidos hasta
+    ahora) y las referencias ausentes quedan en -1.
+    """
+    # Los comentarios al final de la línea no son esquinas
+    lines = [line.split('#')[0] for line in lines]
+    sizes = np.array([len(line.split()) - 1 for line in lines], dtype=np.int64)
+    references = None
+    first = lines[0].split()[1] if sizes[0] > 0 else ""
+    width = min(first.count('/') + 1, 3)
+    slashes = np.array([line.count('/') for line in lines], dtype=np.int64)
+    if np.all(slashes == sizes * (width - 1)):
+        # Todas las esquinas con la misma forma: se leen todas de una vez
+        text = " ".join(lines).replace('f', ' ').replace('//', '/0/').replace('/', ' ')
+        values = _obj_numbers(text, np.int64)
+        if values is not None and len(values) == width * int(sizes.sum()):
+            references = np.zeros((int(sizes.sum()), 3), dtype=np.int64)
+            references[:, :width] = values.reshape(-1, width)
+    if references is None:
+        corners = [corner.split('/') for line in lines for corner in line.split()[1:]]
+        references = np.zeros((len(corners), 3), dtype=np.int64)
+        for row, parts in enumerate(corners):
+            for column, part in enumerate(parts[:3]):
+                if part:
+                    references[row, column] = int(part)
+
+    resolved = np.full(references.shape, -1, dtype=np.int64)
+    for column, count in enumerate(counts):
+        values = references[:, column]
+        resolved[:, column] = np.where(values > 0, values - 1, np.where(values < 0, count + values, -1))
+    return sizes, resolved
+
+
+def _read_mtl(filename: str) -> Dict[str, dict]:
+    """Leer color (Kd) y opacidad (d) de los materiales de un .mtl"""
+    materials, current = {}, None
+    with open(filename, 'r', encoding='latin-1') as f:
+        for line in f:
+            words = line.split()
+            if not words:
+                continue
+            if words[0] == 'newmtl' and len(words) > 1:
+                current = materials.setdefault(" ".join(words[1:]), {})
+            elif current is None:
+                continue
+            elif words[0] == 'Kd' and len(words) >= 4:
+                red, green, blue = (min(max(float(value), 0.0), 1.0) for value in words[1:4])
+                current['color'] = '#%02X%02X%02X' % (round(red * 255), round(green * 255), round(blue * 255))
+            elif words[0] == 'd' and len(words) > 1:
+                current['opacity'] = float(words[1])
+    return materials
+
+
+def _obj_name(text: str) -> str:
+    """Nombre leído en latin-1, reinterpretado como UTF-8 si es válido"""
+    try:
+        return text.encode('latin-1').decode('utf-8')
+    except UnicodeDecodeError:
+        return text
+
+
+def _json_rows(values: np.ndarray, prefix: Optional[str] = None) -> str:
+    """Array (N, k) como lista JSON de filas, formateada de una vez
+
+    Sin `prefix` sale compacta (`[[a,b],...]`); con él, igual que
+    `json.dumps(indent=2)` para una lista que empieza en una línea
+    sangrada con `prefix`.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return "[]"
+    numbers = values.ravel().tolist()
+    tokens = tuple(map(repr, numbers) if np.all(np.isfinite(values)) else map(json.dumps, numbers))
+    if prefix is None:
+        row = "[" + ",".join(["%s"] * values.shape[1]) + "]"
+        return "[" + ",".join([row] * len(values)) % tokens + "]"
+    row = f"\n{prefix}  [" + ",".join([f"\n{prefix}    %s"] * values.shape[1]) + f"\n{prefix}  ]"
+    return "[" + ",".join([row] * len(values)) % tokens + f"\n{prefix}]"
+
+
+def _json_faces(indices: np.ndarray, offsets: np.ndarray, prefix: Optional[str] = None) -> str:
+    """Caras CSR como lista JSON de listas de índices (compacta o con sangría)"""
+    sizes = np.diff(offsets)
+    if not len(sizes):
+        return "[]"
+    templates = {}
+    for size in np.unique(sizes).tolist():
+        if prefix is None:
+            templates[size] = "[" + ",".join(["%d"] * size) + "]"
+        else:
+            templates[size] = (f"\n{prefix}  [" + ",".join([f"\n{prefix}    %d"] * size) + f"\n{prefix}  ]"
+                               if size else f"\n{prefix}  []")
+    body = ",".join([templates[size] for size in sizes.tolist()])
+    return "[" + body % tuple(indices.tolist()) + ("]" if prefix is None else f"\n{prefix}]")
+
+
+def _json_value(value, prefix: Optional[str] = None) -> str:
+    """Codificar con `json` un valor que empieza en una línea sangrada con `prefix`"""
+    if prefix is None:
+        return json.dumps(value, separators=(',', ':'))
+    # Las cadenas JSON nunca contienen saltos de línea literales
+    return json.dumps(value, indent=2).replace("\n", "\n" + prefix)
+
+
+def _json_object(fields: List[Tuple[str, str]], prefix: Optional[str] = None) -> str:
+    """Objeto JSON a partir de pares (clave, valor ya codificado)"""
+    if not fields:
+        return "{}"
+    if prefix is None:
+        return "{" + ",".join(f"{json.dumps(key)}:{text}" for key, text in fields) + "}"
+    return ("{" + ",".join(f"\n{prefix}  {json.dumps(key)}: {text}" for key, text in fields)
+            + f"\n{prefix}}}")
+
+
+def _json_list(items: List[str], prefix: Optional[str] = None) -> str:
+    """Lista JSON a partir de elementos ya codificados"""
+    if not items:
+        return "[]"
+    if prefix is None:
+        return "[" + ",".join(items) + "]"
+    return "[" + ",".join(f"\n{prefix}  {text}" for text in items) + f"\n{prefix}]"
+
+
+# Listas numéricas anidadas que se decodifican directamente a arrays; se
+# ignoran las claves escapadas dentro de cadenas
+_JSON_ARRAY_KEY = re.compile(r'(?<!\\)"(vertices|faces|normals|uvs)"\s*:\s*(?=\[)')
+_JSON_ARRAY_EMPTY = re.compile(r'\[\s*\]')
+_JSON_ARRAY_END = re.compile(r'\]\s*\]')
+
+
+def _extract_json_arrays(text: str) -> Tuple[str, List[object], List[str], str]:
+    """Sacar del texto las listas de vértices, caras, normales y UV ya como arrays
+
+    Cada lista se sustituye por un marcador "<tag><k>__" y se devuelve en
+    la posición k: un array (N, 3), (N, 2) para UV o, para caras,
+    (índices, offsets), junto con el texto original de la lista. La
+    etiqueta se elige para que no aparezca en el texto original, así que
+    ninguna cadena del archivo se confunde con un marcador. Las listas que
+    no se pueden leer como números se dejan para el decodificador JSON.
+    """
+    tag = "__ndarray_"
+    while tag in text:
+        tag = "_" + tag
+    pieces, arrays, sources = [], [], []
+    position = 0
+    for match in _JSON_ARRAY_KEY.finditer(text):
+        start = match.end()
+        if start < position:
+            continue
+        end_match = _JSON_ARRAY_EMPTY.match(text, start) or _JSON_ARRAY_END.search(text, start)
+        if end_match is None:
+            break
+        end = end_match.end()
+        span = text[start:end]
+        flat = span.translate(str.maketrans('[],', '   '))
+        if match.group(1) == 'faces':
+            raw = np.frombuffer(span.encode('latin-1', errors='replace'), dtype=np.uint8)
+            opens = np.flatnonzero(raw == ord('['))[1:]
+            closes = np.flatnonzero(raw == ord(']'))[:-1]
+            commas = np.flatnonzero(raw == ord(','))
+            indices = _obj_numbers(flat, np.int64)
+            if indices is None or len(opens) != len(closes):
+                continue
+            sizes = (np.searchsorted(commas, closes) - np.searchsorted(commas, opens)
+                     + (closes - opens > 1))
+            if len(indices) != sizes.sum():
+                continue
+            offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+            np.cumsum(sizes, out=offsets[1:])
+            value = (indices, offsets)
+        else:
+            numbers = _obj_numbers(flat)
+            rows = span.count('[') - 1
+            width = 2 if match.group(1) == 'uvs' else 3
+            if numbers is None or len(numbers) != width * rows:
+                continue
+            value = numbers.reshape(-1, width)
+        pieces.append(text[position:start])
+        pieces.append(f'"{tag}{len(arrays)}__"')
+        arrays.append(value)
+        sources.append(span)
+        position = end
+    pieces.append(text[position:])
+    return "".join(pieces), arrays, sources, tag
+
+
+def _restore_json_arrays(value, sources: List[str], marker: re.Pattern):
+    """Devolver a su lista original los marcadores que quedan fuera de las geometrías"""
+    if isinstance(value, dict):
+        return {key: _restore_json_arrays(item, sources, marker) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_restore_json_arrays(item, sources, marker) for item in value]
+    match = marker.fullmatch(value) if isinstance(value, str) else None
+    return json.loads(sources[int(match.group(1))]) if match else value
+
+
+class SceneNode:
+    """Grupo del grafo de escena (ensamble, planta, edificio...)
+
+    Guarda su transformación local respecto al padre y los IDs de las
+    geometrías que cuelgan de él. La matriz de mundo se calcula al pedirla
+    y se guarda hasta que cambie la local del nodo o de un antecesor: al
+    modificarla se marca como sucio el subárbol afectado y el modelador
+    pasa el cambio a sus geometrías como transformación diferida.
+    """
+
+    def __init__(self, name: str, matrix: Optional[np.ndarray] = None):
+        self.name = name
+        self.parent: Optional['SceneNode'] = None
+        self.children: List['SceneNode'] = []
+        self.geometry_ids: Dict[int, None] = {}
+        self._local_matrix = _frozen(np.identity(4))
+        self._world_matrix = self._local_matrix
+        self._dirty = True
+        # Aviso al modelador cuando el nodo (y con él su subárbol) se mueve
+        self._on_change: Optional[Callable[['SceneNode'], None]] = None
+        if matrix is not None:
+            self.local_matrix = matrix
+
+    def __repr__(self):
+        return f"SceneNode({self.name!r}, {len(self.children)} hijos, {len(self.geometry_ids)} geometrías)"
+
+    @property
+    def local_matrix(self) -> np.ndarray:
+        """Transformación 4x4 respecto al nodo padre"""
+        return self._local_matrix
+
+    @local_matrix.setter
+    def local_matrix(self, matrix: np.ndarray):
+        matrix = np.array(matrix, dtype=np.float64).reshape(4, 4)
+        if abs(np.linalg.det(matrix)) < 1e-12:
+            raise ValueError(f"La transformación del nodo '{self.name}' debe ser invertible")
+        self._local_matrix = _frozen(matrix)
+        self._mark_dirty()
+
+    @property
+    def world_matrix(self) -> np.ndarray:
+        """Transformación acumulada desde la raíz (se recalcula sólo si está sucia)"""
+        if self._dirty:
+            parent_world = self.parent.world_matrix if self.parent is not None else np.identity(4)
+            self._world_matrix = _frozen(parent_world @ self._local_matrix)
+            self._dirty = False
+        return self._world_matrix
+
+    def _mark_dirty(self):
+        # Si ya estaba sucio, su subárbol también lo está y ya hay un nodo pendiente que lo cubre
+        if self._dirty:
+            return
+        self._dirty = True
+        stack = list(self.children)
+        while stack:
+            node = stack.pop()
+            if not node._dirty:
+                node._dirty = True
+                stack.extend(node.children)
+        if self._on_change is not None:
+            self._on_change(self)
+
+    def transform(self, matrix: np.ndarray):
+        """Componer una transformación en el espacio del padre"""
+        self.local_matrix = np.asarray(matrix, dtype=np.float64) @ self._local_matrix
+
+    def translate(self, dx: float, dy: float, dz: float):
+        """Trasladar el nodo (y todo su subárbol)"""
+        self.transform(Transformations3D.translation_matrix(dx, dy, dz))
+
+    def walk(self):
+        """Recorrer el subárbol en profundidad, empezando por este nodo"""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def path(self) -> str:
+        """Ruta del nodo desde la raíz (nombres separados por '/')"""
+        names = []
+        node = self
+        while node.parent is not None:
+            names.append(node.name)
+            node = node.parent
+        return "/".join(reversed(names))
+
+
+class Professional3DModeler:
+    """Clase principal del sistema de modelado 3D profesional"""
+    
+    def __init__(self):
+        # Registro de geometrías por ID estable e índice nombre -> IDs
+        self._geometries: Dict[int, Geometry3D] = {}
+        self._name_index: Dict[str, Dict[int, None]] = {}
+        self._next_geometry_id = 1
+        # Grafo de escena: cada geometría cuelga de un nodo (la raíz por defecto)
+        self._pending_nodes: Dict[SceneNode, None] = {}
+        self.scene_root = self._new_root()
+        self._geometry_nodes: Dict[int, SceneNode] = {}
+        # Matriz de mundo ya aplicada a los vértices de cada geometría (identidad si falta)
+        self._baked_matrices: Dict[int, np.ndarray] = {}
+        # Copias fuera de la escena que sirven de prototipo a las instancias de
+        # una geometría de la escena: {ID: (copia, estado de la geometría)}
+        self._scene_prototypes: Dict[int, Tuple[Geometry3D, tuple]] = {}
+        self.lights = []
+        self.cameras = []
+        self.materials = {}
+        self.scene_name = "Professional_3D_Model"
+        self.deferred_transforms = False
+        self._bvh: Optional[SceneBVH] = None
+        self.metadata = {
+            'created': datetime.now().isoformat(),
+            'version': '2.0',
+            'author': 'Professional 3D Modeler'
         }
+    
+    @property
+    def geometries(self) -> Tuple[Geometry3D, ...]:
+        """Geometrías del modelo en orden de inserción (con el grafo de escena aplicado)
+        
+        Es una tupla: para añadir o quitar geometrías se usan `add_geometry`
+        y `remove_geometry` (o se asigna una lista completa), de modo que
+        `modeler.geometries.append(g)` falla en lugar de perderse en silencio.
+        """
+        self._sync_scene_graph()
+        return tuple(self._geometries.values())
+    
+    @geometries.setter
+    def geometries(self, geometries: List[Geometry3D]):
+        self._geometries = {}
+        self._name_index = {}
+        self._pending_nodes = {}
+        self.scene_root = self._new_root()
+        self._geometry_nodes = {}
+        self._baked_matrices = {}
+        self._scene_prototypes = {}
+        for geometry in geometries:
+            self.add_geometry(geometry)
+    
+    def add_geometry(self, geometry: Geometry3D, group: Optional[Union[SceneNode, str]] = None) -> int:
+        """Agregar geometría al modelo y devolver su ID
+        
+        Se conserva el ID que ya traiga la geometría (por ejemplo, una copia)
+        mientras no esté en uso en este modelo. Con `group` sus vértices se
+        interpretan en el espacio de ese nodo del grafo de escena.
+        """
+        if geometry.id is None or geometry.id in self._geometries:
+            geometry.id = self._next_geometry_id
+        self._next_geometry_id = max(self._next_geometry_id, geometry.id) + 1
+        
+        self._geometries[geometry.id] = geometry
+        self._name_index.setdefault(geometry.name, {})[geometry.id] = None
+        self._attach_geometry(geometry.id, self._resolve_group(group), keep_world=False)
+        return geometry.id
+    
+    def get_geometry(self, geometry_id: int) -> Optional[Geometry3D]:
+        """Obtener geometría por ID"""
+        self._sync_scene_graph()
+        return self._geometries.get(geometry_id)
+    
+    def find_geometries(self, name: str) -> List[Geometry3D]:
+        """Obtener todas las geometrías con un nombre"""
+        self._sync_scene_graph()
+        return [self._geometries[geometry_id] for geometry_id in self._name_index.get(name, ())]
+    
+    def find_geometry(self, key: Union[int, str]) -> Optional[Geometry3D]:
+        """Obtener una geometría por ID o la primera con ese nombre"""
+        self._sync_scene_graph()
+        if isinstance(key, (int, np.integer)):
+            return self._geometries.get(int(key))
+        ids = self._name_index.get(key)
+        if not ids:
+            return None
+        return self._geometries[next(iter(ids))]
+    
+    def remove_geometry(self, name: str):
+        """Remover geometría por nombre"""
+        for geometry_id in self._name_index.pop(name, ()):
+            self._detach_geometry(geometry_id)
+            del self._geometries[geometry_id]
+    
+    def remove_geometry_by_id(self, geometry_id: int) -> Optional[Geometry3D]:
+        """Remover una geometría por ID"""
+        self._sync_scene_graph()
+        geometry = self._geometries.pop(geometry_id, None)
+        if geometry is not None:
+            self._detach_geometry(geometry_id)
+            ids = self._name_index[geometry.name]
+            del ids[geometry_id]
+            if not ids:
+                del self._name_index[geometry.name]
+        return geometry
+    
+    def rename_geometry(self, geometry_id: int, new_name: str):
+        """Renombrar geometría manteniendo el índice de nombres al día"""
+        geometry = self._geometries.get(geometry_id)
+        if geometry is None:
+            return
+        ids = self._name_index[geometry.name]
+        del ids[geometry_id]
+        if not ids:
+            del self._name_index[geometry.name]
+        geometry.name = new_name
+        self._name_index.setdefault(new_name, {})[geometry_id] = None
+    
+    def _new_root(self) -> SceneNode:
+        root = SceneNode("root")
+        root._on_change = self._node_changed
+        root.world_matrix  # limpia: mover la raíz debe avisar al modelador
+        return root
+    
+    def _resolve_group(self, group: Optional[Union[SceneNode, str]]) -> SceneNode:
+        if group is None:
+            return self.scene_root
+        if isinstance(group, SceneNode):
+            return group
+        node = self.find_group(group)
+        if node is None:
+            raise KeyError(f"Grupo no encontrado: {group}")
+        return node
+    
+    def _bake_geometry(self, geometry_id: int, world: np.ndarray):
+        """Llevar los vértices de una geometría a la matriz de mundo de su nodo
+        
+        Sólo se acumula el cambio respecto a la última matriz aplicada como
+        transformación diferida: los vértices se recalculan al leerlos.
+        """
+        baked = self._baked_matrices.get(geometry_id)
+        if baked is None:
+            if np.array_equal(world, np.identity(4)):
+                return
+            delta = world
+        elif baked is world or np.array_equal(baked, world):
+            return
+        else:
+            delta = world @ np.linalg.inv(baked)
+        self._geometries[geometry_id].transform_vertices(delta, deferred=True)
+        self._baked_matrices[geometry_id] = world
+    
+    def _attach_geometry(self, geometry_id: int, node: SceneNode, keep_world: bool):
+        baked = self._baked_matrices.get(geometry_id)
+        self._detach_geometry(geometry_id)
+        node.geometry_ids[geometry_id] = None
+        self._geometry_nodes[geometry_id] = node
+        if keep_world:
+            # Los vértices no se mueven: pasan a estar expresados respecto al nuevo nodo
+            self._baked_matrices[geometry_id] = node.world_matrix
+            return
+        # Mismas coordenadas locales: se aplica el cambio entre la matriz anterior y la nueva
+        if baked is not None:
+            self._baked_matrices[geometry_id] = baked
+        self._bake_geometry(geometry_id, node.world_matrix)
+    
+    def _detach_geometry(self, geometry_id: int):
+        node = self._geometry_nodes.pop(geometry_id, None)
+        if node is not None:
+            del node.geometry_ids[geometry_id]
+        self._baked_matrices.pop(geometry_id, None)
+    
+    def _node_changed(self, node: SceneNode):
+        # Se propaga en el momento: quien ya tenga una geometría del subárbol
+        # la ve movida (el cambio se acumula como transformación diferida)
+        self._pending_nodes[node] = None
+        self._sync_scene_graph()
+    
+    def _sync_scene_graph(self):
+        """Propagar a las geometrías los nodos movidos (sólo sus subárboles)"""
+        while self._pending_nodes:
+            node = next(iter(self._pending_nodes))
+            del self._pending_nodes[node]
+            for child in node.walk():
+                world = child.world_matrix
+                for geometry_id in child.geometry_ids:
+                    self._bake_geometry(geometry_id, world)
+    
+    def add_group(self, name: str, parent: Optional[Union[SceneNode, str]] = None,
+                  matrix: Optional[np.ndarray] = None) -> SceneNode:
+        """Crear un grupo en el grafo de escena (bajo la raíz o bajo `parent`)"""
+        node = SceneNode(name, matrix)
+        self._link_group(node, self._resolve_group(parent))
+        return node
+    
+    def _link_group(self, node: SceneNode, parent: SceneNode):
+        node.parent = parent
+        parent.children.append(node)
+        for member in node.walk():
+            member._on_change = self._node_changed
+            member._dirty = True
+        self._pending_nodes[node] = None
+        self._sync_scene_graph()
+    
+    def find_group(self, name: str) -> Optional[SceneNode]:
+        """Primer grupo con ese nombre o ruta ('casa/planta_1')"""
+        for node in self.scene_root.walk():
+            if node is not self.scene_root and (node.name == name or node.path() == name):
+                return node
+        return None
+    
+    def group_of(self, key: Union[int, str]) -> Optional[SceneNode]:
+        """Nodo del que cuelga una geometría (por ID o nombre)"""
+        geometry = self.find_geometry(key)
+        return None if geometry is None else self._geometry_nodes.get(geometry.id)
+    
+    def move_to_group(self, key: Union[int, str], group: Optional[Union[SceneNode, str]],
+                      keep_world: bool = True):
+        """Colgar una geometría de otro grupo
+        
+        Con `keep_world=True` la geometría no se mueve en la escena; si no,
+        sus coordenadas actuales respecto a su grupo pasan a serlo respecto
+        al nuevo.
+        """
+        geometry = self.find_geometry(key)
+        if geometry is None:
+            raise KeyError(f"Geometría no encontrada: {key}")
+        self._attach_geometry(geometry.id, self._resolve_group(group), keep_world)
+    
+    def reparent_group(self, group: Union[SceneNode, str], parent: Optional[Union[SceneNode, str]] = None,
+                       keep_world: bool = True):
+        """Mover un grupo (con su subárbol) bajo otro padre"""
+        self._sync_scene_graph()
+        node = self._resolve_group(group)
+        new_parent = self._resolve_group(parent)
+        ancestor = new_parent
+        while ancestor is not None and ancestor is not node:
+            ancestor = ancestor.parent
+        if node is self.scene_root or ancestor is node:
+            raise ValueError(f"No se puede colgar '{node.name}' de sí mismo o de un descendiente")
+        world = node.world_matrix
+        node.parent.children.remove(node)
+        self._link_group(node, new_parent)
+        if keep_world:
+            node.local_matrix = np.linalg.inv(new_parent.world_matrix) @ world
+    
+    def remove_group(self, group: Union[SceneNode, str]):
+        """Quitar un grupo; sus hijos y geometrías pasan a su padre sin moverse"""
+        # Las geometrías se recuelgan con su posición actual: antes hay que aplicar lo pendiente
+        self._sync_scene_graph()
+        node = self._resolve_group(group)
+        if node is self.scene_root:
+            raise ValueError("No se puede quitar la raíz del grafo de escena")
+        parent = node.parent
+        for child in list(node.children):
+            child.parent = parent
+            parent.children.append(child)
+            child.local_matrix = node.local_matrix @ child.local_matrix
+        node.children = []
+        for geometry_id in list(node.geometry_ids):
+            self._attach_geometry(geometry_id, parent, keep_world=True)
+        parent.children.remove(node)
+        node.parent = None
+        node._on_change = None
+        self._pending_nodes.pop(node, None)
+    
+    def transform_group(self, group: Union[SceneNode, str], transformation_matrix: np.ndarray):
+        """Transformar un grupo entero
         
-        return gear
-
-class Professional3DModeler:
-    """Clase principal del sistema de modelado 3D profesional"""
+        Cada geometría del subárbol recibe el cambio como transformación
+        diferida (O(1) por geometría); sus vértices se recalculan al leerlos.
+        """
+        self._resolve_group(group).transform(transformation_matrix)
     
-    def __init__(self):
-        self.geometries: List[Geometry3D] = []
-        self.lights = []
-        self.cameras = []
-        self.materials = {}
-        self.scene_name = "Professional_3D_Model"
-        self.metadata = {
-            'created': datetime.now().isoformat(),
-            'version': '2.0',
-            'author': 'Professional 3D Modeler'
-        }
+    def add_instance(self, prototype: Union[int, str, Geometry3D], matrix: Optional[np.ndarray] = None,
+                     materials: Optional[Dict] = None, name: Optional[str] = None) -> int:
+        """Agregar una instancia de una geometría y devolver su ID
+        
+        `prototype` puede ser una geometría (de la escena o no) o el ID o
+        nombre de una de la escena. La instancia comparte sus arrays y sólo
+        guarda `matrix` (4x4) y las claves de material que cambian.
+        
+        Una geometría de la escena no se usa directamente como prototipo (sus
+        vértices ya llevan la transformación de su grupo y se moverían con
+        él): se instancia una copia fuera de la escena de su estado actual,
+        la misma para todas sus instancias mientras no se edite.
+        """
+        if not isinstance(prototype, Geometry3D):
+            key = prototype
+            prototype = self.find_geometry(key)
+            if prototype is None:
+                raise KeyError(f"Geometría no encontrada: {key}")
+        matrix = np.identity(4) if matrix is None else np.asarray(matrix, dtype=np.float64)
+        if isinstance(prototype, GeometryInstance) and prototype.is_attached:
+            # Instancia de una instancia: se apunta directamente al prototipo común
+            materials = {**prototype.material_override, **(materials or {})}
+            matrix = matrix @ prototype.instance_matrix
+            prototype = prototype.prototype
+        elif self._geometries.get(prototype.id) is prototype:
+            prototype = self._scene_prototype(prototype)
+        return self.add_geometry(GeometryInstance(prototype, matrix, materials, name))
     
-    def add_geometry(self, geometry: Geometry3D):
-        """Agregar geometría al modelo"""
-        self.geometries.append(geometry)
+    def _scene_prototype(self, geometry: Geometry3D) -> Geometry3D:
+        """Copia fuera de la escena de una geometría, reutilizada mientras no cambie"""
+        self._sync_scene_graph()
+        state = geometry._vertex_version() + (geometry.face_indices, geometry.face_offsets,
+                                              geometry.uv_array)
+        cached = self._scene_prototypes.get(geometry.id)
+        if cached is not None and len(cached[1]) == len(state) and all(
+                current is stored for current, stored in zip(state, cached[1])):
+            return cached[0]
+        prototype = geometry.copy()
+        prototype.id = None
+        self._scene_prototypes[geometry.id] = (prototype, state)
+        return prototype
     
-    def remove_geometry(self, name: str):
-        """Remover geometría por nombre"""
-        self.geometries = [g for g in self.geometries if g.name != name]
+    def instance_duplicates(self, tolerance: float = 1e-9) -> Dict[int, int]:
+        """Convertir en instancias las geometrías que repiten una misma malla
+        
+        Se agrupan las geometrías con las mismas caras, UV y claves de
+        material; dentro de cada grupo se busca, por mínimos cuadrados, la
+        afín invertible que lleva los vértices de la primera a los de cada
+        otra (error máximo `tolerance` relativo al tamaño). Las que encajan
+        pasan a ser instancias de un prototipo común (una copia de la
+        primera, fuera de la escena), conservando ID, nombre y material.
+        Devuelve {ID: ID de la primera geometría de su grupo}.
+        """
+        groups = {}
+        for geometry in self.geometries:
+            if isinstance(geometry, GeometryInstance) and geometry.is_attached:
+                continue
+            uvs = geometry.uv_array
+            key = (geometry.face_indices.tobytes(), geometry.face_offsets.tobytes(),
+                   None if uvs is None else np.asarray(uvs).tobytes(), tuple(sorted(map(str, geometry.materials))))
+            groups.setdefault(key, []).append(geometry)
+        
+        shared = {}
+        prototype_count = 0
+        for members in groups.values():
+            if len(members) < 2 or not len(members[0].vertex_array):
+                continue
+            first = members[0]
+            source = np.hstack([first.vertex_array, np.ones((len(first.vertex_array), 1))])
+            pseudo_inverse = np.linalg.pinv(source)
+            matches = []
+            for geometry in members:
+                target = geometry.vertex_array
+                fit = pseudo_inverse @ target
+                scale = max(float(np.ptp(target, axis=0).max()), 1.0)
+                if np.abs(source @ fit - target).max() > tolerance * scale:
+                    continue
+                matrix = np.identity(4)
+                matrix[:3, :3] = fit[:3].T
+                matrix[:3, 3] = fit[3]
+                if abs(np.linalg.det(matrix[:3, :3])) > 1e-12:
+                    matches.append((geometry, matrix))
+            if len(matches) < 2:
+                continue
+            
+            prototype = first.copy()
+            prototype.id = None
+            prototype_count += 1
+            for geometry, matrix in matches:
+                override = {} if geometry.materials == prototype.materials else geometry.materials
+                instance = GeometryInstance(prototype, matrix, override, geometry.name)
+                instance.id = geometry.id
+                instance.transform_matrix = geometry.transform_matrix.copy()
+                self._geometries[geometry.id] = instance
+                shared[geometry.id] = first.id
+        
+        print(f"Instancias: {len(shared)} geometrías comparten {prototype_count} prototipos")
+        return shared
     
     def add_light(self, light_type: str, position: Vector3D, 
                   intensity: float = 1.0, color: str = '#FFFFFF'):
@@ -512,8 +3414,20 @@ class Professional3DModeler:
         }
         self.lights.append(light)
     
-    def create_architectural_plan(self, plan_data: Dict) -> 'Professional3DModeler':
-        """Crear un plano arquitectónico completo"""
+    def _plan_group(self, group: Optional[Union[SceneNode, str]]) -> Optional[SceneNode]:
+        """Grupo destino de un plano o ensamble (creándolo por nombre si hace falta)"""
+        if group is None or isinstance(group, SceneNode):
+            return group
+        return self.find_group(group) or self.add_group(group)
+    
+    def create_architectural_plan(self, plan_data: Dict,
+                                  group: Optional[Union[SceneNode, str]] = None) -> 'Professional3DModeler':
+        """Crear un plano arquitectónico completo
+        
+        Con `group` (nodo o nombre; se crea si no existe) todas las piezas
+        cuelgan de ese grupo y se mueven juntas con `transform_group`.
+        """
+        group = self._plan_group(group)
         
         # Crear paredes
         for wall_data in plan_data.get('walls', []):
@@ -523,7 +3437,7 @@ class Professional3DModeler:
                 wall_data['thickness'],
                 Vector3D(wall_data['x'], wall_data['y'], wall_data['z'])
             )
-            self.add_geometry(wall)
+            self.add_geometry(wall, group)
         
         # Crear puertas
         for door_data in plan_data.get('doors', []):
@@ -533,7 +3447,7 @@ class Professional3DModeler:
                 door_data['thickness'],
                 Vector3D(door_data['x'], door_data['y'], door_data['z'])
             )
-            self.add_geometry(door)
+            self.add_geometry(door, group)
         
         # Crear ventanas
         for window_data in plan_data.get('windows', []):
@@ -543,7 +3457,7 @@ class Professional3DModeler:
                 window_data['thickness'],
                 Vector3D(window_data['x'], window_data['y'], window_data['z'])
             )
-            self.add_geometry(window)
+            self.add_geometry(window, group)
         
         # Crear techo
         if 'roof' in plan_data:
@@ -554,12 +3468,21 @@ class Professional3DModeler:
                 roof_data['height'],
                 Vector3D(roof_data['x'], roof_data['y'], roof_data['z'])
             )
-            self.add_geometry(roof)
+            self.add_geometry(roof, group)
         
         return self
     
-    def create_mechanical_assembly(self, assembly_data: Dict) -> 'Professional3DModeler':
-        """Crear un ensamble mecánico"""
+    def create_mechanical_assembly(self, assembly_data: Dict,
+                                   group: Optional[Union[SceneNode, str]] = None) -> 'Professional3DModeler':
+        """Crear un ensamble mecánico
+        
+        Con 'chord_tolerance' en el ensamble (o en cada pieza) los cilindros y
+        esferas sin segmentos explícitos eligen su resolución según su tamaño;
+        'icospheres': True (o 'icosphere' por esfera) usa icoesferas. Con
+        `group` las piezas cuelgan de ese grupo del grafo de escena.
+        """
+        group = self._plan_group(group)
+        tolerance = assembly_data.get('chord_tolerance')
         
         # Crear cilindros
         for cylinder_data in assembly_data.get('cylinders', []):
@@ -567,19 +3490,33 @@ class Professional3DModeler:
                 cylinder_data['radius'],
                 cylinder_data['height'],
                 cylinder_data.get('segments', 32),
-                Vector3D(cylinder_data['x'], cylinder_data['y'], cylinder_data['z'])
+                Vector3D(cylinder_data['x'], cylinder_data['y'], cylinder_data['z']),
+                chord_tolerance=cylinder_data.get(
+                    'chord_tolerance', None if 'segments' in cylinder_data else tolerance)
             )
-            self.add_geometry(cylinder)
+            self.add_geometry(cylinder, group)
         
         # Crear esferas
         for sphere_data in assembly_data.get('spheres', []):
-            sphere = MechanicalElements.create_sphere(
-                sphere_data['radius'],
-                sphere_data.get('u_segments', 16),
-                sphere_data.get('v_segments', 16),
-                Vector3D(sphere_data['x'], sphere_data['y'], sphere_data['z'])
-            )
-            self.add_geometry(sphere)
+            position = Vector3D(sphere_data['x'], sphere_data['y'], sphere_data['z'])
+            if sphere_data.get('icosphere', assembly_data.get('icospheres', False)):
+                sphere = MechanicalElements.create_icosphere(
+                    sphere_data['radius'],
+                    sphere_data.get('subdivisions', 2),
+                    position,
+                    chord_tolerance=sphere_data.get(
+                        'chord_tolerance', None if 'subdivisions' in sphere_data else tolerance)
+                )
+            else:
+                explicit = 'u_segments' in sphere_data or 'v_segments' in sphere_data
+                sphere = MechanicalElements.create_sphere(
+                    sphere_data['radius'],
+                    sphere_data.get('u_segments', 16),
+                    sphere_data.get('v_segments', 16),
+                    position,
+                    chord_tolerance=sphere_data.get('chord_tolerance', None if explicit else tolerance)
+                )
+            self.add_geometry(sphere, group)
         
         # Crear engranajes
         for gear_data in assembly_data.get('gears', []):
@@ -590,7 +3527,7 @@ class Professional3DModeler:
                 gear_data.get('teeth', 20),
                 Vector3D(gear_data['x'], gear_data['y'], gear_data['z'])
             )
-            self.add_geometry(gear)
+            self.add_geometry(gear, group)
         
         return self
     
@@ -606,18 +3543,12 @@ class Professional3DModeler:
             color = colors[i % len(colors)]
             
             # Extraer coordenadas
-            x = [v.x for v in geometry.vertices]
-            y = [v.y for v in geometry.vertices]
-            z = [v.z for v in geometry.vertices]
+            x, y, z = geometry.vertex_array.T
             
             if show_wireframe:
-                # Dibujar wireframe
-                for face in geometry.faces:
-                    if len(face) >= 3:
-                        face_x = [geometry.vertices[idx].x for idx in face] + [geometry.vertices[face[0]].x]
-                        face_y = [geometry.vertices[idx].y for idx in face] + [geometry.vertices[face[0]].y]
-                        face_z = [geometry.vertices[idx].z for idx in face] + [geometry.vertices[face[0]].z]
-                        ax.plot(face_x, face_y, face_z, color=color, alpha=0.6)
+                # Dibujar wireframe (todas las caras en una sola línea separada por NaN)
+                face_x, face_y, face_z = geometry.outline_coords((0, 1, 2))
+                ax.plot(face_x, face_y, face_z, color=color, alpha=0.6)
             else:
                 # Scatter plot de vértices
                 ax.scatter(x, y, z, c=color, s=20, alpha=0.8, label=geometry.name)
@@ -644,9 +3575,7 @@ class Professional3DModeler:
             color = colors[i % len(colors)]
             
             # Extraer coordenadas
-            x = [v.x for v in geometry.vertices]
-            y = [v.y for v in geometry.vertices]
-            z = [v.z for v in geometry.vertices]
+            x, y, z = geometry.vertex_array.T
             
             # Agregar vértices como scatter3d
             fig.add_trace(go.Scatter3d(
@@ -661,17 +3590,10 @@ class Professional3DModeler:
             if len(geometry.faces) > 0 and len(geometry.vertices) > 3:
                 try:
                     # Convertir caras a formato de triángulos
-                    triangles = []
-                    for face in geometry.faces:
-                        if len(face) >= 3:
-                            # Triangular caras con más de 3 vértices
-                            for j in range(1, len(face) - 1):
-                                triangles.append([face[0], face[j], face[j+1]])
+                    triangles = geometry.get_triangles()
                     
-                    if triangles:
-                        i_indices = [t[0] for t in triangles]
-                        j_indices = [t[1] for t in triangles]
-                        k_indices = [t[2] for t in triangles]
+                    if len(triangles):
+                        i_indices, j_indices, k_indices = triangles.T
                         
                         fig.add_trace(go.Mesh3d(
                             x=x, y=y, z=z,
@@ -701,43 +3623,206 @@ class Professional3DModeler:
         
         return fig
     
-    def export_to_obj(self, filename: str):
-        """Exportar modelo a formato OBJ"""
+    def export_to_obj(self, filename: str, include_normals: bool = False,
+                      include_uvs: bool = False, precision: Optional[int] = None,
+                      write_materials: bool = False):
+        """Exportar modelo a formato OBJ
+        
+        Cada bloque de vértices y de caras de una geometría se formatea de
+        una vez y se escribe con una sola llamada. Con `precision=None` los
+        números salen con su representación más corta (igual que antes);
+        con un entero, con ese número de decimales. Opcionalmente se
+        escriben normales por vértice (`vn`), coordenadas de textura (`vt`,
+        de `Geometry3D.uv_array`) y un archivo .mtl con los materiales.
+        """
+        material_names = {}
+        if write_materials:
+            material_file = os.path.splitext(filename)[0] + '.mtl'
+            material_names = self._export_mtl(material_file)
+        
         with open(filename, 'w') as f:
             f.write(f"# Modelo 3D Profesional: {self.scene_name}\n")
             f.write(f"# Creado: {self.metadata['created']}\n\n")
+            if write_materials:
+                f.write(f"mtllib {os.path.basename(material_file)}\n\n")
             
             vertex_offset = 1  # OBJ usa índices basados en 1
+            uv_offset = 1
             
             for geometry in self.geometries:
                 f.write(f"# Geometría: {geometry.name}\n")
                 f.write(f"o {geometry.name}\n")
                 
-                # Escribir vértices
-                for vertex in geometry.vertices:
-                    f.write(f"v {vertex.x} {vertex.y} {vertex.z}\n")
+                vertices = geometry.vertex_array
+                uvs = geometry.uv_array if include_uvs else None
+                if uvs is not None and len(uvs) != len(vertices):
+                    uvs = None
+                
+                # Escribir vértices, coordenadas de textura y normales
+                f.write(_obj_rows('v', vertices, precision))
+                if uvs is not None:
+                    f.write(_obj_rows('vt', uvs, precision))
+                if include_normals:
+                    f.write(_obj_rows('vn', geometry.vertex_normals(), precision))
+                if write_materials:
+                    f.write(f"usemtl {material_names[geometry.id]}\n")
                 
-                # Escribir caras
-                for face in geometry.faces:
-                    if len(face) >= 3:
-                        face_str = "f " + " ".join([str(idx + vertex_offset) for idx in face])
-                        f.write(face_str + "\n")
+                # Escribir caras (v, v/vt, v//vn o v/vt/vn con el mismo índice por vértice)
+                indices, offsets = geometry.polygon_arrays()
+                columns = [indices + vertex_offset]
+                if uvs is not None:
+                    columns.append(indices + uv_offset)
+                    uv_offset += len(uvs)
+                if include_normals:
+                    columns.append(indices + vertex_offset)
+                separator = '//' if include_normals and uvs is None else '/'
+                f.write(_obj_faces(np.diff(offsets), np.stack(columns, axis=1), separator))
                 
-                vertex_offset += len(geometry.vertices)
+                vertex_offset += len(vertices)
                 f.write("\n")
         
         print(f"Modelo exportado a: {filename}")
     
-    def export_to_json(self, filename: str):
-        """Exportar modelo a formato JSON"""
-        model_data = {
-            'metadata': self.metadata,
-            'scene_name': self.scene_name,
-            'geometries': [],
-            'lights': []
-        }
+    def _export_mtl(self, filename: str) -> Dict[int, str]:
+        """Escribir los materiales de las geometrías en un .mtl
+        
+        Geometrías con el mismo diccionario de material comparten entrada.
+        Devuelve el nombre de material de cada geometría (por id).
+        """
+        names, by_content, blocks = {}, {}, []
+        for geometry in self.geometries:
+            key = json.dumps(geometry.materials, sort_keys=True, default=str)
+            if key not in by_content:
+                name = f"{geometry.name}_{len(by_content) + 1}".replace(' ', '_')
+                by_content[key] = name
+                material = geometry.materials
+                lines = [f"newmtl {name}"]
+                red, green, blue = _hex_to_rgb(material.get('color', '#CCCCCC'))
+                lines.append(f"Kd {red:.6f} {green:.6f} {blue:.6f}")
+                lines.append(f"d {float(material.get('opacity', 1.0)):.6f}")
+                lines.append("illum 2")
+                if 'texture' in material:
+                    lines.append(f"# textura: {material['texture']}")
+                blocks.append("\n".join(lines) + "\n")
+            names[geometry.id] = by_content[key]
+        
+        with open(filename, 'w') as f:
+            f.write(f"# Materiales: {self.scene_name}\n\n")
+            f.write("\n".join(blocks))
+        return names
+
+    def import_from_obj(self, filename: str, chunk_size: int = 1 << 22) -> List[int]:
+        """Importar un archivo OBJ, una geometría por grupo `o`/`g`
+
+        El archivo se lee por bloques de líneas (unos `chunk_size`
+        caracteres); las líneas consecutivas del mismo tipo (`v`, `vt`,
+        `vn`, `f`) se convierten de una vez en arrays, sin crear objetos
+        por vértice. Se admiten índices negativos y esquinas v, v/vt, v//vn
+        y v/vt/vn. Cada geometría se queda con los vértices declarados en
+        su grupo si sus caras sólo usan ésos (como en los OBJ exportados
+        aquí); si no, con los vértices que referencian sus caras. Las
+        coordenadas de textura y normales pasan a `uv_array` y `normals`
+        por vértice (si un vértice tiene varias, queda la última). Los
+        materiales se toman del `mtllib` si existe. Devuelve los IDs.
+        """
+        vertex_chunks, uv_chunks, normal_chunks = [], [], []
+        counts = [0, 0, 0]  # v, vt, vn leídos hasta ahora
+        groups = []
+        library = {}
+
+        def new_group(name):
+            groups.append({'name': name, 'start': counts[0], 'faces': [], 'material': None})
+
+        def flush(head, run):
+            if head == 'v ':
+                vertex_chunks.append(_obj_vectors(run, 'v', 3))
+                counts[0] += len(run)
+            elif head == 'vt':
+                uv_chunks.append(_obj_vectors(run, 'vt', 2))
+                counts[1] += len(run)
+            elif head == 'vn':
+                normal_chunks.append(_obj_vectors(run, 'vn', 3))
+                counts[2] += len(run)
+            elif head == 'f ':
+                groups[-1]['faces'].append(_obj_corners(run, tuple(counts)))
+
+        new_group(os.path.splitext(os.path.basename(filename))[0])
+        with open(filename, 'r', encoding='latin-1') as f:
+            for lines in iter(lambda: f.readlines(chunk_size), []):
+                head, run = None, []
+                for line in lines:
+                    line_head = line[:2]
+                    if line_head != head:
+                        if run:
+                            flush(head, run)
+                            run = []
+                        head = line_head
+                    if line_head in ('v ', 'vt', 'vn', 'f '):
+                        run.append(line)
+                    elif line_head in ('o ', 'g '):
+                        # Un grupo sin caras sólo cambia de nombre y conserva sus vértices
+                        name = _obj_name(line[2:].strip()) or groups[-1]['name']
+                        if groups[-1]['faces']:
+                            new_group(name)
+                        else:
+                            groups[-1]['name'] = name
+                    elif line.startswith('usemtl') and groups[-1]['material'] is None:
+                        groups[-1]['material'] = _obj_name(line[6:].strip())
+                    elif line.startswith('mtllib'):
+                        path = os.path.join(os.path.dirname(filename), _obj_name(line[6:].strip()))
+                        if os.path.exists(path):
+                            library.update(_read_mtl(path))
+                if run:
+                    flush(head, run)
+
+        vertices = np.concatenate(vertex_chunks) if vertex_chunks else np.empty((0, 3))
+        uvs = np.concatenate(uv_chunks) if uv_chunks else np.empty((0, 2))
+        normals = np.concatenate(normal_chunks) if normal_chunks else np.empty((0, 3))
+
+        ids = []
+        for number, group in enumerate(groups):
+            end = groups[number + 1]['start'] if number + 1 < len(groups) else len(vertices)
+            if not group['faces'] and end == group['start']:
+                continue
+            sizes = np.concatenate([chunk[0] for chunk in group['faces']]) if group['faces'] else np.empty(0, dtype=np.int64)
+            references = (np.concatenate([chunk[1] for chunk in group['faces']])
+                          if group['faces'] else np.empty((0, 3), dtype=np.int64))
+            corners = references[:, 0]
+            if len(corners) and (corners.min() < 0 or corners.max() >= len(vertices)):
+                raise ValueError(f"Índice de vértice fuera de rango en el grupo {group['name']}: {filename}")
+
+            if not len(corners) or (corners.min() >= group['start'] and corners.max() < end):
+                used = np.arange(group['start'], end)
+                local = corners - group['start']
+            else:
+                used, local = np.unique(corners, return_inverse=True)
+
+            geometry = Geometry3D(group['name'])
+            geometry.vertex_array = vertices[used]
+            offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+            np.cumsum(sizes, out=offsets[1:])
+            geometry.set_face_arrays(local, offsets)
 
-        # Serializar luces (si hay Vector3D)
+            for column, values, width in ((1, uvs, 2), (2, normals, 3)):
+                present = (references[:, column] >= 0) & (references[:, column] < len(values))
+                if not present.any():
+                    continue
+                attribute = np.zeros((len(used), width))
+                attribute[local[present]] = values[references[present, column]]
+                if column == 1:
+                    geometry.uv_array = attribute
+                else:
+                    geometry.normals = attribute
+            if group['material'] is not None:
+                geometry.materials = dict(library.get(group['material'], {}))
+            ids.append(self.add_geometry(geometry))
+
+        print(f"Modelo importado desde OBJ: {filename}")
+        return ids
+
+    def _serialized_lights(self) -> List[dict]:
+        """Luces listas para JSON (las posiciones Vector3D pasan a listas)"""
+        lights = []
         for light in self.lights:
             light_serializable = light.copy()
             if isinstance(light_serializable.get('position'), Vector3D):
@@ -746,45 +3831,770 @@ class Professional3DModeler:
                     light_serializable['position'].y,
                     light_serializable['position'].z
                 ]
-            model_data['lights'].append(light_serializable)
+            lights.append(light_serializable)
+        return lights
+    
+    def _serialized_scene_graph(self) -> Optional[List[dict]]:
+        """Nodos del grafo de escena en profundidad (None si sólo hay una raíz sin mover)"""
+        root = self.scene_root
+        if not root.children and np.array_equal(root.local_matrix, np.identity(4)):
+            return None
+        nodes, index = [], {}
+        for node in root.walk():
+            index[node] = len(nodes)
+            nodes.append({
+                'name': node.name,
+                'parent': None if node.parent is None else index[node.parent],
+                'matrix': node.local_matrix.tolist(),
+                'geometries': list(node.geometry_ids)
+            })
+        return nodes
+    
+    def _restore_scene_graph(self, nodes: List[dict], id_map: Dict[int, int]):
+        """Reconstruir los grupos guardados bajo la raíz actual
+        
+        Las geometrías ya vienen en coordenadas de mundo, así que se cuelgan
+        de su grupo sin moverlas; `id_map` traduce los IDs del archivo.
+        """
+        self._sync_scene_graph()
+        created = []
+        for entry in nodes:
+            if entry.get('parent') is None:
+                node = self.scene_root
+            else:
+                node = self.add_group(entry['name'], created[entry['parent']], entry.get('matrix'))
+            created.append(node)
+            for geometry_id in entry.get('geometries', []):
+                if geometry_id in id_map:
+                    self._attach_geometry(id_map[geometry_id], node, keep_world=True)
+    
+    def export_to_json(self, filename: str, include_normals: bool = False,
+                       compact: bool = False, precision: Optional[int] = None,
+                       compress: Optional[bool] = None):
+        """Exportar modelo a formato JSON (opcionalmente con normales por vértice)
+        
+        Con `compact=True` se escribe sin sangría y los arrays de vértices,
+        caras y normales se formatean de una vez en lugar de pasar por el
+        codificador JSON elemento a elemento (el esquema es el mismo).
+        `precision` redondea las coordenadas a ese número de decimales y
+        `compress` escribe con gzip (por defecto, si el nombre acaba en .gz).
+        
+        Las coordenadas de textura van en 'uvs' y las instancias, como en el
+        contenedor binario, sólo con 'prototype' (posición en la lista
+        'prototypes'), 'instance_matrix' y 'material_override'; ambas claves
+        son opcionales, así que sin UV ni instancias el archivo no cambia.
+        """
+        def coordinates(values):
+            return np.round(values, precision) if precision is not None else values
+
+        # Cada geometría se escribe por piezas: los arrays con los
+        # formateadores en bloque y el resto con `json`, sin marcadores que
+        # puedan confundirse con cadenas del modelo
+        def indent(width):
+            return None if compact else " " * width
 
+        def mesh_fields(geometry):
+            fields = [
+                ('name', _json_value(geometry.name, indent(6))),
+                ('vertices', _json_rows(coordinates(geometry.vertex_array), indent(6))),
+                ('faces', _json_faces(geometry.face_indices, geometry.face_offsets, indent(6))),
+                ('materials', _json_value(geometry.materials, indent(6))),
+                ('transform_matrix', _json_value(geometry.transform_matrix.tolist(), indent(6)))
+            ]
+            if geometry.uv_array is not None:
+                fields.append(('uvs', _json_rows(geometry.uv_array, indent(6))))
+            if include_normals:
+                fields.append(('normals', _json_rows(coordinates(geometry.vertex_normals()), indent(6))))
+            return fields
+
+        # Igual que en el contenedor binario: los prototipos de las instancias
+        # se guardan una vez y cada instancia sólo con su matriz y su material
+        geometries, prototypes, prototype_index = [], [], {}
         for geometry in self.geometries:
-            geo_data = {
-                'name': geometry.name,
-                'vertices': [[v.x, v.y, v.z] for v in geometry.vertices],
-                'faces': geometry.faces,
-                'materials': geometry.materials,
-                'transform_matrix': geometry.transform_matrix.tolist()
-            }
-            model_data['geometries'].append(geo_data)
+            if isinstance(geometry, GeometryInstance) and geometry.is_attached:
+                if id(geometry.prototype) not in prototype_index:
+                    prototype_index[id(geometry.prototype)] = len(prototypes)
+                    prototypes.append(_json_object(mesh_fields(geometry.prototype), indent(4)))
+                fields = [
+                    ('name', _json_value(geometry.name, indent(6))),
+                    ('prototype', _json_value(prototype_index[id(geometry.prototype)], indent(6))),
+                    ('instance_matrix', _json_value(geometry.instance_matrix.tolist(), indent(6))),
+                    ('material_override', _json_value(geometry.material_override, indent(6))),
+                    ('transform_matrix', _json_value(geometry.transform_matrix.tolist(), indent(6)))
+                ]
+                if geometry._uv_array is not None:
+                    fields.append(('uvs', _json_rows(geometry._uv_array, indent(6))))
+            else:
+                fields = mesh_fields(geometry)
+            geometries.append(_json_object([('id', _json_value(geometry.id, indent(6)))] + fields, indent(4)))
 
-        with open(filename, 'w') as f:
-            json.dump(model_data, f, indent=2)
+        fields = [
+            ('metadata', _json_value(self.metadata, indent(2))),
+            ('scene_name', _json_value(self.scene_name, indent(2))),
+            ('geometries', _json_list(geometries, indent(2))),
+            ('lights', _json_value(self._serialized_lights(), indent(2)))
+        ]
+        if prototypes:
+            fields.append(('prototypes', _json_list(prototypes, indent(2))))
+        scene_graph = self._serialized_scene_graph()
+        if scene_graph is not None:
+            fields.append(('scene_graph', _json_value(scene_graph, indent(2))))
+        text = _json_object(fields, indent(0))
+
+        if compress is None:
+            compress = filename.endswith('.gz')
+        with (gzip.open(filename, 'wt', encoding='utf-8', compresslevel=6) if compress
+              else open(filename, 'w')) as f:
+            f.write(text)
 
         print(f"Modelo exportado a JSON: {filename}")
     
     def import_from_json(self, filename: str):
-        """Importar modelo desde formato JSON"""
-        with open(filename, 'r') as f:
-            model_data = json.load(f)
+        """Importar modelo desde formato JSON
+        
+        Acepta archivos con o sin gzip. Las listas de vértices, caras,
+        normales y UV se leen directamente como arrays sin pasar por listas
+        de Python; el resto se decodifica con `json`. Las instancias vuelven
+        a compartir su prototipo.
+        """
+        with open(filename, 'rb') as f:
+            compressed = f.read(2) == b'\x1f\x8b'
+        with (gzip.open(filename, 'rt', encoding='utf-8') if compressed else open(filename, 'r')) as f:
+            text, arrays, sources, tag = _extract_json_arrays(f.read())
+        model_data = json.loads(text)
+        marker = re.compile(re.escape(tag) + r'(\d+)__')
+        
+        # Los marcadores sólo se decodifican a arrays en los campos de cada
+        # geometría; en cualquier otro sitio se devuelven a listas
+        geometries = model_data.pop('geometries', [])
+        prototype_entries = model_data.pop('prototypes', [])
+        model_data = _restore_json_arrays(model_data, sources, marker)
+        
+        def decoded(value):
+            match = marker.fullmatch(value) if isinstance(value, str) else None
+            return arrays[int(match.group(1))] if match else value
         
         self.metadata = model_data.get('metadata', {})
         self.scene_name = model_data.get('scene_name', 'Imported_Model')
         self.lights = model_data.get('lights', [])
         
-        for geo_data in model_data.get('geometries', []):
+        def entry_data(geo_data):
+            # Los campos de arrays se decodifican; el resto vuelve a su forma original
+            arrays_data = {key: geo_data.pop(key) for key in ('vertices', 'faces', 'normals', 'uvs')
+                           if key in geo_data}
+            return {**_restore_json_arrays(geo_data, sources, marker), **arrays_data}
+        
+        def mesh_geometry(geo_data):
             geometry = Geometry3D(geo_data['name'])
-            
-            # Reconstruir vértices
-            geometry.vertices = [Vector3D(v[0], v[1], v[2]) for v in geo_data['vertices']]
-            geometry.faces = geo_data['faces']
+            # Reconstruir vértices directamente como array
+            geometry.vertex_array = np.array(decoded(geo_data['vertices']), dtype=np.float64).reshape(-1, 3)
+            faces = decoded(geo_data['faces'])
+            if isinstance(faces, tuple):
+                geometry.set_face_arrays(*faces)
+            else:
+                geometry.faces = faces
             geometry.materials = geo_data.get('materials', {})
             geometry.transform_matrix = np.array(geo_data.get('transform_matrix', np.identity(4).tolist()))
-            
-            self.add_geometry(geometry)
+            if 'uvs' in geo_data:
+                geometry.uv_array = np.array(decoded(geo_data['uvs']), dtype=np.float64)
+            normals = decoded(geo_data.get('normals'))
+            if normals is not None and len(normals):
+                geometry.normals = normals
+            return geometry
+        
+        prototypes = [mesh_geometry(entry_data(entry)) for entry in prototype_entries]
+        id_map = {}
+        for geo_data in geometries:
+            geo_data = entry_data(geo_data)
+            if 'prototype' in geo_data:
+                geometry = GeometryInstance(prototypes[geo_data['prototype']], np.array(geo_data['instance_matrix']),
+                                            geo_data.get('material_override', {}), geo_data['name'])
+                geometry.transform_matrix = np.array(geo_data.get('transform_matrix', np.identity(4).tolist()))
+                if 'uvs' in geo_data:
+                    geometry.uv_array = np.array(decoded(geo_data['uvs']), dtype=np.float64)
+            else:
+                geometry = mesh_geometry(geo_data)
+            geometry.id = geo_data.get('id')
+            id_map[geo_data.get('id')] = self.add_geometry(geometry)
+        
+        if model_data.get('scene_graph'):
+            self._restore_scene_graph(model_data['scene_graph'], id_map)
         
         print(f"Modelo importado desde: {filename}")
     
+    def export_to_binary(self, filename: str, include_normals: bool = False):
+        """Exportar la escena al contenedor binario nativo
+        
+        Estructura: firma `M3DSCENE`, versión (uint32), reservado (uint32),
+        longitud de la cabecera (uint64) y una cabecera JSON con metadatos,
+        luces, materiales (sin repetir) y la descripción de cada geometría.
+        Después, alineados a 64 bytes, los bloques contiguos de vértices
+        (float64), índices y offsets de caras (int64) y, si existen,
+        coordenadas de textura y normales; la cabecera guarda el offset,
+        tipo y forma de cada bloque. Los prototipos de las instancias se
+        guardan una vez y cada instancia sólo con su matriz y su material.
+        """
+        materials, material_index = [], {}
+        geometries, blocks = [], []
+        position = 0
+        
+        def add_block(array, dtype):
+            nonlocal position
+            array = np.ascontiguousarray(array, dtype=dtype)
+            position = -(-position // _SCENE_ALIGNMENT) * _SCENE_ALIGNMENT
+            descriptor = {'offset': position, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+            blocks.append((position, array))
+            position += array.nbytes
+            return descriptor
+        
+        def mesh_entry(geometry):
+            key = json.dumps(geometry.materials, sort_keys=True, default=str)
+            if key not in material_index:
+                material_index[key] = len(materials)
+                materials.append(geometry.materials)
+            entry = {
+                'name': geometry.name,
+                'material': material_index[key],
+                'transform_matrix': geometry.transform_matrix.tolist(),
+                'vertices': add_block(geometry.vertex_array, '<f8'),
+                'face_indices': add_block(geometry.face_indices, '<i8'),
+                'face_offsets': add_block(geometry.face_offsets, '<i8')
+            }
+            if geometry.uv_array is not None:
+                entry['uvs'] = add_block(geometry.uv_array, '<f8')
+            if include_normals:
+                entry['normals'] = add_block(geometry.vertex_normals(), '<f8')
+            return entry
+        
+        # Los prototipos de las instancias se guardan una vez; cada instancia sólo su matriz
+        prototypes, prototype_index = [], {}
+        for geometry in self.geometries:
+            if isinstance(geometry, GeometryInstance) and geometry.is_attached:
+                if id(geometry.prototype) not in prototype_index:
+                    prototype_index[id(geometry.prototype)] = len(prototypes)
+                    prototypes.append(mesh_entry(geometry.prototype))
+                entry = {
+                    'name': geometry.name,
+                    'prototype': prototype_index[id(geometry.prototype)],
+                    'instance_matrix': geometry.instance_matrix.tolist(),
+                    'material_override': geometry.material_override,
+                    'transform_matrix': geometry.transform_matrix.tolist()
+                }
+                if geometry._uv_array is not None:
+                    entry['uvs'] = add_block(geometry._uv_array, '<f8')
+            else:
+                entry = mesh_entry(geometry)
+            geometries.append({'id': geometry.id, **entry})
+        
+        header = {
+            'metadata': self.metadata,
+            'scene_name': self.scene_name,
+            'lights': self._serialized_lights(),
+            'materials': materials,
+            'prototypes': prototypes,
+            'geometries': geometries
+        }
+        scene_graph = self._serialized_scene_graph()
+        if scene_graph is not None:
+            header['scene_graph'] = scene_graph
+        header = json.dumps(header, default=str).encode('utf-8')
+        data_start = -(-(24 + len(header)) // _SCENE_ALIGNMENT) * _SCENE_ALIGNMENT
+        
+        # Escribir aparte y renombrar: los bloques pueden ser vistas
+        # memory-mapped del propio archivo de destino
+        temporary = f"{filename}.{os.getpid()}.tmp"
+        try:
+            with open(temporary, 'wb') as f:
+                f.write(_SCENE_MAGIC)
+                f.write(np.array([_SCENE_VERSION, 0], dtype='<u4').tobytes())
+                f.write(np.uint64(len(header)).astype('<u8').tobytes())
+                f.write(header)
+                for offset, array in blocks:
+                    f.write(b'\0' * (data_start + offset - f.tell()))
+                    array.tofile(f)
+            os.replace(temporary, filename)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+
+        print(f"Modelo exportado a binario: {filename}")
+    
+    def import_from_binary(self, filename: str, memory_map: bool = True) -> List[int]:
+        """Importar una escena del contenedor binario nativo
+        
+        Con `memory_map=True` el archivo se abre con `np.memmap` y los
+        arrays de cada geometría son vistas de sólo lectura sobre él: abrir
+        la escena es inmediato y el sistema operativo carga cada bloque la
+        primera vez que se usa. Con `False` se copian a memoria. Devuelve
+        los IDs de las geometrías.
+        """
+        with open(filename, 'rb') as f:
+            prefix = f.read(24)
+            if len(prefix) < 24 or prefix[:8] != _SCENE_MAGIC:
+                raise ValueError(f"Archivo de escena no válido: {filename}")
+            version = int(np.frombuffer(prefix, dtype='<u4', count=1, offset=8)[0])
+            if version > _SCENE_VERSION:
+                raise ValueError(f"Versión de escena no soportada: {version}")
+            header_length = int(np.frombuffer(prefix, dtype='<u8', count=1, offset=16)[0])
+            header = json.loads(f.read(header_length).decode('utf-8'))
+        data_start = -(-(24 + header_length) // _SCENE_ALIGNMENT) * _SCENE_ALIGNMENT
+        
+        data = np.memmap(filename, dtype=np.uint8, mode='r')
+        
+        def block(descriptor):
+            dtype = np.dtype(descriptor['dtype'])
+            shape = tuple(descriptor['shape'])
+            count = int(np.prod(shape))
+            start = data_start + descriptor['offset']
+            array = data[start:start + count * dtype.itemsize].view(dtype).reshape(shape)
+            return array if memory_map else np.array(array)
+        
+        self.metadata = header.get('metadata', {})
+        self.scene_name = header.get('scene_name', 'Imported_Model')
+        self.lights = header.get('lights', [])
+        materials = header.get('materials', [])
+        
+        def mesh_geometry(entry):
+            geometry = Geometry3D(entry['name'])
+            geometry.vertex_array = block(entry['vertices'])
+            geometry.set_face_arrays(block(entry['face_indices']), block(entry['face_offsets']))
+            geometry.materials = dict(materials[entry['material']]) if materials else {}
+            geometry.transform_matrix = np.array(entry.get('transform_matrix', np.identity(4).tolist()))
+            if 'uvs' in entry:
+                geometry.uv_array = block(entry['uvs'])
+            if 'normals' in entry:
+                geometry.normals = block(entry['normals'])
+            return geometry
+        
+        prototypes = [mesh_geometry(entry) for entry in header.get('prototypes', [])]
+        ids, id_map = [], {}
+        for entry in header.get('geometries', []):
+            if 'prototype' in entry:
+                geometry = GeometryInstance(prototypes[entry['prototype']], np.array(entry['instance_matrix']),
+                                            entry.get('material_override', {}), entry['name'])
+                geometry.transform_matrix = np.array(entry.get('transform_matrix', np.identity(4).tolist()))
+                if 'uvs' in entry:
+                    geometry.uv_array = block(entry['uvs'])
+            else:
+                geometry = mesh_geometry(entry)
+            geometry.id = entry.get('id')
+            ids.append(self.add_geometry(geometry))
+            id_map[entry.get('id')] = ids[-1]
+        
+        if header.get('scene_graph'):
+            self._restore_scene_graph(header['scene_graph'], id_map)
+        
+        print(f"Modelo importado desde binario: {filename}")
+        return ids
+    
+    def export_to_stl(self, filename: str):
+        """Exportar todas las geometrías a STL binario
+        
+        Los triángulos de la escena se empaquetan en un único array
+        estructurado (normal, 3 vértices, atributo) y se escriben de una vez.
+        """
+        _, corners, _ = self._scene_triangles()
+        normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+        lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+        normals = np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+        
+        records = np.zeros(len(corners), dtype=_STL_DTYPE)
+        records['normal'] = normals
+        records['vertices'] = corners
+        header = f"Modelo 3D Profesional: {self.scene_name}".encode('utf-8')[:80].ljust(80, b' ')
+        
+        with open(filename, 'wb') as f:
+            f.write(header)
+            f.write(np.uint32(len(records)).tobytes())
+            records.tofile(f)
+        
+        print(f"Modelo exportado a STL: {filename}")
+    
+    def import_from_stl(self, filename: str, name: Optional[str] = None) -> int:
+        """Importar un STL binario como una geometría
+        
+        STL es una sopa de triángulos: cada triángulo trae sus propios tres
+        vértices (usar `weld_vertices` para compartirlos). Devuelve el id.
+        """
+        with open(filename, 'rb') as f:
+            data = f.read()
+        if len(data) < 84:
+            raise ValueError(f"Archivo STL demasiado corto: {filename}")
+        count = int(np.frombuffer(data, dtype='<u4', count=1, offset=80)[0])
+        # Algunos exportadores CAD dejan relleno al final: se leen sólo los `count` registros
+        if 84 + count * _STL_DTYPE.itemsize > len(data):
+            raise ValueError(f"Sólo se admite STL binario: {filename}")
+        records = np.frombuffer(data, dtype=_STL_DTYPE, count=count, offset=84)
+        
+        geometry = Geometry3D(name or os.path.splitext(os.path.basename(filename))[0])
+        geometry.vertex_array = records['vertices'].reshape(-1, 3).astype(np.float64)
+        geometry.set_face_arrays(np.arange(3 * count), np.arange(0, 3 * count + 1, 3))
+        geometry_id = self.add_geometry(geometry)
+        
+        print(f"Modelo importado desde STL: {filename}")
+        return geometry_id
+    
+    def export_to_ply(self, filename: str):
+        """Exportar todas las geometrías a PLY binario (little endian)
+        
+        Vértices en float32 y caras poligonales como listas (uchar, int32);
+        los bloques de vértices y caras se construyen como arrays y se
+        escriben cada uno con una sola escritura.
+        """
+        geometries = self.geometries
+        vertex_counts = [len(geometry.vertex_array) for geometry in geometries]
+        vertex_offsets = np.concatenate([[0], np.cumsum(vertex_counts)]).astype(np.int64)
+        vertices = (np.concatenate([geometry.vertex_array for geometry in geometries])
+                    if geometries else np.empty((0, 3)))
+        indices, sizes = [], []
+        for k, geometry in enumerate(geometries):
+            # PLY no admite caras de menos de 3 vértices útiles
+            polygon_indices, polygon_offsets = geometry.polygon_arrays()
+            indices.append(polygon_indices + vertex_offsets[k])
+            sizes.append(np.diff(polygon_offsets))
+        indices = np.concatenate(indices) if indices else np.empty(0, dtype=np.int64)
+        sizes = np.concatenate(sizes) if sizes else np.empty(0, dtype=np.int64)
+        if len(sizes) and sizes.max() > 255:
+            raise ValueError("PLY con lista uchar admite caras de hasta 255 vértices")
+        
+        # Cada cara ocupa 1 byte de cuenta + 4 bytes por índice
+        face_count = len(sizes)
+        element_face = np.repeat(np.arange(face_count), sizes)
+        face_start = np.arange(face_count) + 4 * np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+        face_bytes = np.empty(face_count + 4 * len(indices), dtype=np.uint8)
+        face_bytes[face_start] = sizes
+        index_start = element_face + 1 + 4 * np.arange(len(indices))
+        face_bytes[index_start[:, None] + np.arange(4)] = indices.astype('<i4').view(np.uint8).reshape(-1, 4)
+        
+        header = (
+            "ply\n"
+            "format binary_little_endian 1.0\n"
+            f"comment Modelo 3D Profesional: {self.scene_name}\n"
+            f"element vertex {len(vertices)}\n"
+            "property float x\n"
+            "property float y\n"
+            "property float z\n"
+            f"element face {face_count}\n"
+            "property list uchar int vertex_indices\n"
+            "end_header\n"
+        )
+        with open(filename, 'wb') as f:
+            f.write(header.encode('ascii', errors='replace'))
+            vertices.astype('<f4').tofile(f)
+            face_bytes.tofile(f)
+        
+        print(f"Modelo exportado a PLY: {filename}")
+    
+    def import_from_ply(self, filename: str, name: Optional[str] = None) -> int:
+        """Importar un PLY binario como una geometría
+        
+        Se leen las propiedades x, y, z de los vértices y la lista de índices
+        de las caras; las demás propiedades y elementos se saltan. Las caras
+        de tamaño uniforme se leen con una sola vista del buffer. Devuelve el id.
+        """
+        with open(filename, 'rb') as f:
+            data = f.read()
+        end = data.find(b'end_header')
+        if not data.startswith(b'ply') or end < 0:
+            raise ValueError(f"Archivo PLY no válido: {filename}")
+        body = data.index(b'\n', end) + 1
+        
+        byte_order = None
+        elements = []
+        for line in data[:end].decode('ascii', errors='replace').splitlines():
+            words = line.split()
+            if not words:
+                continue
+            if words[0] == 'format':
+                if words[1] == 'ascii':
+                    raise ValueError(f"Sólo se admite PLY binario: {filename}")
+                byte_order = '<' if words[1] == 'binary_little_endian' else '>'
+            elif words[0] == 'element':
+                elements.append((words[1], int(words[2]), []))
+            elif words[0] == 'property' and elements:
+                elements[-1][2].append(words[1:])
+        
+        vertices = np.empty((0, 3))
+        indices = np.empty(0, dtype=np.int64)
+        offsets = np.zeros(1, dtype=np.int64)
+        position = body
+        for element, count, properties in elements:
+            if any(prop[0] == 'list' for prop in properties):
+                if len(properties) != 1:
+                    raise ValueError("Sólo se admiten elementos lista con una única propiedad")
+                count_type = np.dtype(_PLY_TYPES[properties[0][1]]).newbyteorder(byte_order)
+                index_type = np.dtype(_PLY_TYPES[properties[0][2]]).newbyteorder(byte_order)
+                if element != 'face':
+                    raise ValueError(f"Elemento lista no admitido: {element}")
+                sizes = None
+                if count:
+                    # Caso habitual: todas las caras con el mismo número de vértices
+                    first = int(np.frombuffer(data, dtype=count_type, count=1, offset=position)[0])
+                    uniform = np.dtype([('n', count_type), ('i', index_type, (first,))])
+                    if position + count * uniform.itemsize <= len(data):
+                        records = np.frombuffer(data, dtype=uniform, count=count, offset=position)
+                        if np.all(records['n'] == first):
+                            sizes = np.full(count, first, dtype=np.int64)
+                            indices = records['i'].astype(np.int64).ravel()
+                            position += count * uniform.itemsize
+                if sizes is None:
+                    sizes = np.empty(count, dtype=np.int64)
+                    chunks = []
+                    for face in range(count):
+                        size = int(np.frombuffer(data, dtype=count_type, count=1, offset=position)[0])
+                        position += count_type.itemsize
+                        chunks.append(np.frombuffer(data, dtype=index_type, count=size, offset=position))
+                        position += size * index_type.itemsize
+                        sizes[face] = size
+                    indices = np.concatenate(chunks).astype(np.int64) if chunks else indices
+                offsets = np.zeros(count + 1, dtype=np.int64)
+                np.cumsum(sizes, out=offsets[1:])
+            else:
+                record = np.dtype([(prop[1], np.dtype(_PLY_TYPES[prop[0]]).newbyteorder(byte_order))
+                                   for prop in properties])
+                if element == 'vertex':
+                    rows = np.frombuffer(data, dtype=record, count=count, offset=position)
+                    vertices = np.stack([rows['x'], rows['y'], rows['z']], axis=1).astype(np.float64)
+                position += count * record.itemsize
+        
+        geometry = Geometry3D(name or os.path.splitext(os.path.basename(filename))[0])
+        geometry.vertex_array = vertices
+        geometry.set_face_arrays(indices, offsets)
+        geometry_id = self.add_geometry(geometry)
+        
+        print(f"Modelo importado desde PLY: {filename}")
+        return geometry_id
+    
+    def export_to_glb(self, filename: str, quantize: bool = False):
+        """Exportar la escena a glTF 2.0 binario (GLB)
+        
+        Todas las geometrías van en un único buffer binario, con una vista
+        por bloque (posiciones, normales, UV, índices). Las instancias
+        (`GeometryInstance`) y las geometrías idénticas salvo por su
+        `transform_matrix` (si es rígida), una traslación y una escala
+        uniforme comparten los datos de la malla y sólo añaden un nodo con
+        su matriz. Los materiales pasan a PBR (color base, opacidad,
+        metalicidad y rugosidad según la textura o las claves 'metallic' y
+        'roughness'; las mallas abiertas se marcan de doble cara) y las
+        luces puntuales, focales y direccionales a KHR_lights_punctual (las
+        ambientales no tienen equivalente y se omiten).
+        
+        Con `quantize=True` (KHR_mesh_quantization) las posiciones se
+        guardan como uint16 sobre la caja de la malla, con la escala en el
+        nodo, las normales como int8 normalizado y las UV en [0, 1] como
+        uint16 normalizado.
+        """
+        chunks, views, accessors = [], [], []
+        size = 0
+        
+        def add_accessor(array, component_type, kind, target, normalized=False, stride=None, bounds=False):
+            nonlocal size
+            data = np.ascontiguousarray(array)
+            size = -(-size // 4) * 4
+            view = {'buffer': 0, 'byteOffset': size, 'byteLength': data.nbytes, 'target': target}
+            if stride:
+                view['byteStride'] = stride
+            chunks.append((size, data))
+            size += data.nbytes
+            views.append(view)
+            accessor = {'bufferView': len(views) - 1, 'componentType': component_type,
+                        'count': len(data), 'type': kind}
+            if normalized:
+                accessor['normalized'] = True
+            if bounds:
+                values = data[:, :3] if data.ndim > 1 else data
+                accessor['min'] = values.min(axis=0).tolist() if len(values) else [0] * 3
+                accessor['max'] = values.max(axis=0).tolist() if len(values) else [0] * 3
+            accessors.append(accessor)
+            return len(accessors) - 1
+        
+        materials, material_index = [], {}
+        meshes, mesh_index, nodes = [], {}, []
+        shapes, geometry_nodes = {}, {}
+        for geometry in self.geometries:
+            source, instance_matrix = _instance_source(geometry)
+            triangles = source.get_triangles()
+            if not len(triangles):
+                continue
+            
+            # Las mallas abiertas se ven por las dos caras: un material por cada caso
+            double_sided = not geometry.adjacency().is_closed
+            material_key = (json.dumps(geometry.materials, sort_keys=True, default=str), double_sided)
+            if material_key not in material_index:
+                material = geometry.materials
+                texture = str(material.get('texture', '')).lower()
+                opacity = float(material.get('opacity', 1.0))
+                pbr = {
+                    'baseColorFactor': _srgb_to_linear(_hex_to_rgb(material.get('color', '#CCCCCC'))) + [opacity],
+                    'metallicFactor': float(material.get('metallic', 1.0 if texture in _GLTF_METALLIC else 0.0)),
+                    'roughnessFactor': float(material.get('roughness', _GLTF_ROUGHNESS.get(texture, 0.7)))
+                }
+                entry = {'name': texture or f"material_{len(materials)}", 'pbrMetallicRoughness': pbr,
+                         'doubleSided': double_sided}
+                if opacity < 1.0:
+                    entry['alphaMode'] = 'BLEND'
+                material_index[material_key] = len(materials)
+                materials.append(entry)
+            
+            uv_source = geometry.uv_array
+            if instance_matrix is not None:
+                # Instancia: la malla del prototipo en su propio espacio, una sola vez
+                transform = instance_matrix
+                shape_key = ('prototype', id(source), None if uv_source is None else id(uv_source))
+                if shape_key not in shapes:
+                    local = source.vertex_array
+                    local_normals = np.asarray(source.vertex_normals())
+            else:
+                # Geometrías repetidas: misma malla relativa a su caja y mismas UV
+                transform = geometry.transform_matrix
+                if _is_rigid_affine(transform):
+                    local = Transformations3D.apply_to_points(np.linalg.inv(transform), geometry.vertex_array)
+                else:
+                    transform, local = np.identity(4), geometry.vertex_array
+                own_lower = local.min(axis=0)
+                extent = float(np.max(local.max(axis=0) - own_lower)) or 1.0
+                shape_key = (triangles.tobytes(), np.round((local - own_lower) / extent, 9).tobytes(),
+                             None if uv_source is None else np.asarray(uv_source).tobytes())
+                if shape_key not in shapes:
+                    # Las normales (suma ponderada por área) pasan al espacio local con A^T
+                    linear = transform[:3, :3]
+                    local_normals = np.asarray(geometry.vertex_normals()) @ linear * np.sign(np.linalg.det(linear))
+                    lengths = np.linalg.norm(local_normals, axis=1, keepdims=True)
+                    local_normals = np.divide(local_normals, lengths, out=np.zeros_like(local_normals),
+                                              where=lengths > 0)
+            
+            if shape_key not in shapes:
+                lower, upper = local.min(axis=0), local.max(axis=0)
+                attributes = {}
+                if quantize:
+                    # Escala uniforme: con una por eje el nodo deformaría las normales (inversa traspuesta)
+                    scale = np.full(3, float(np.max(upper - lower)) / 65535.0 if np.any(upper > lower) else 1.0)
+                    positions = np.round((local - lower) / scale).astype(np.uint16)
+                    attributes['POSITION'] = add_accessor(
+                        np.pad(positions, ((0, 0), (0, 1))), 5123, 'VEC3', 34962, stride=8, bounds=True)
+                    normals = np.round(local_normals * 127).astype(np.int8)
+                    attributes['NORMAL'] = add_accessor(
+                        np.pad(normals, ((0, 0), (0, 1))), 5120, 'VEC3', 34962, normalized=True, stride=4)
+                else:
+                    scale = np.ones(3)
+                    attributes['POSITION'] = add_accessor(
+                        (local - lower).astype(np.float32), 5126, 'VEC3', 34962, bounds=True)
+                    attributes['NORMAL'] = add_accessor(local_normals.astype(np.float32), 5126, 'VEC3', 34962)
+                if uv_source is not None and len(uv_source) == len(local):
+                    uvs = np.asarray(uv_source, dtype=np.float64)[:, :2]
+                    if quantize and uvs.min() >= 0.0 and uvs.max() <= 1.0:
+                        attributes['TEXCOORD_0'] = add_accessor(
+                            np.round(uvs * 65535).astype(np.uint16), 5123, 'VEC2', 34962, normalized=True)
+                    else:
+                        attributes['TEXCOORD_0'] = add_accessor(uvs.astype(np.float32), 5126, 'VEC2', 34962)
+                index_type = (np.uint16, 5123) if len(local) <= 65535 else (np.uint32, 5125)
+                indices = add_accessor(triangles.astype(index_type[0]).ravel(), index_type[1], 'SCALAR', 34963)
+                shapes[shape_key] = (attributes, indices, lower, scale,
+                                     extent if instance_matrix is None else 1.0)
+            
+            # Una malla por forma y material; los accesores se comparten entre materiales
+            attributes, indices, lower, scale, shape_extent = shapes[shape_key]
+            if instance_matrix is None:
+                # Copias escaladas uniformemente comparten la malla: el nodo corrige el tamaño
+                lower = own_lower
+                scale = scale * (extent / shape_extent)
+            if (shape_key, material_key) not in mesh_index:
+                mesh_index[(shape_key, material_key)] = len(meshes)
+                meshes.append({'name': geometry.name, 'primitives': [{
+                    'attributes': attributes, 'indices': indices,
+                    'material': material_index[material_key], 'mode': 4}]})
+            
+            node = {'name': geometry.name, 'mesh': mesh_index[(shape_key, material_key)]}
+            node_matrix = (transform @ Transformations3D.translation_matrix(*lower)
+                           @ np.diag(np.append(scale, 1.0)))
+            if not np.allclose(node_matrix, np.identity(4)):
+                node['matrix'] = node_matrix.T.ravel().tolist()  # glTF usa orden por columnas
+            geometry_nodes[geometry.id] = len(nodes)
+            nodes.append(node)
+        
+        # Grafo de escena: un nodo por grupo y sus geometrías como hijas, con la matriz relativa al grupo
+        nested = set()
+        group_nodes = {}
+        for group in self.scene_root.walk():
+            if group is self.scene_root:
+                continue
+            top_level = group.parent is self.scene_root
+            relative = group.world_matrix if top_level else group.local_matrix
+            entry = {'name': group.name}
+            if not np.allclose(relative, np.identity(4)):
+                entry['matrix'] = relative.T.ravel().tolist()
+            inverse = np.linalg.inv(group.world_matrix)
+            children = [geometry_nodes[geometry_id] for geometry_id in group.geometry_ids
+                        if geometry_id in geometry_nodes]
+            for child in children:
+                world = np.array(nodes[child].pop('matrix', np.identity(4).ravel())).reshape(4, 4).T
+                local = inverse @ world
+                if not np.allclose(local, np.identity(4)):
+                    nodes[child]['matrix'] = local.T.ravel().tolist()
+            if children:
+                entry['children'] = children
+            nested.update(children)
+            group_nodes[group] = len(nodes)
+            if not top_level:
+                nodes[group_nodes[group.parent]].setdefault('children', []).append(len(nodes))
+                nested.add(len(nodes))
+            nodes.append(entry)
+        scene_nodes = [index for index in range(len(nodes)) if index not in nested]
+        
+        lights = []
+        for light in self._serialized_lights():
+            if light.get('type') not in ('point', 'spot', 'directional'):
+                continue
+            entry = {'type': light['type'], 'color': _srgb_to_linear(_hex_to_rgb(light.get('color', '#FFFFFF'), (1.0, 1.0, 1.0))),
+                     'intensity': float(light.get('intensity', 1.0))}
+            if light['type'] == 'spot':
+                entry['spot'] = {}
+            node = {'name': f"Light_{len(lights)}", 'extensions': {'KHR_lights_punctual': {'light': len(lights)}}}
+            if light.get('position') is not None:
+                node['translation'] = [float(value) for value in light['position']]
+            if light.get('direction') is not None:
+                node['rotation'] = _rotation_to_direction(light['direction'])
+            lights.append(entry)
+            scene_nodes.append(len(nodes))
+            nodes.append(node)
+        
+        document = {
+            'asset': {'version': '2.0', 'generator': 'Professional 3D Modeler'},
+            'scene': 0,
+            'scenes': [{'name': self.scene_name, 'nodes': scene_nodes}],
+            'nodes': nodes,
+            'meshes': meshes,
+            'materials': materials,
+            'accessors': accessors,
+            'bufferViews': views,
+            'buffers': [{'byteLength': -(-size // 4) * 4}]
+        }
+        extensions = []
+        if lights:
+            document['extensions'] = {'KHR_lights_punctual': {'lights': lights}}
+            extensions.append('KHR_lights_punctual')
+        if quantize:
+            extensions.append('KHR_mesh_quantization')
+            document['extensionsRequired'] = ['KHR_mesh_quantization']
+        if extensions:
+            document['extensionsUsed'] = extensions
+        
+        binary = np.zeros(-(-size // 4) * 4, dtype=np.uint8)
+        for offset, data in chunks:
+            binary[offset:offset + data.nbytes] = data.view(np.uint8).ravel()
+        text = json.dumps(document, separators=(',', ':')).encode('utf-8')
+        text += b' ' * (-len(text) % 4)
+        
+        with open(filename, 'wb') as f:
+            f.write(np.array([0x46546C67, 2, 28 + len(text) + len(binary)], dtype='<u4').tobytes())
+            f.write(np.array([len(text), 0x4E4F534A], dtype='<u4').tobytes())
+            f.write(text)
+            f.write(np.array([len(binary), 0x004E4942], dtype='<u4').tobytes())
+            binary.tofile(f)
+        
+        print(f"Modelo exportado a GLB: {filename}")
+    
     def generate_blueprint_2d(self, view: str = 'top', figsize: Tuple[int, int] = (12, 8)):
         """Generar plano 2D (vista superior, frontal o lateral)"""
         fig, ax = plt.subplots(figsize=figsize)
@@ -796,16 +4606,13 @@ class Professional3DModeler:
             
             if view == 'top':
                 # Vista superior (proyección X-Y)
-                x_coords = [v.x for v in geometry.vertices]
-                y_coords = [v.y for v in geometry.vertices]
+                x_coords = geometry.vertex_array[:, 0]
+                y_coords = geometry.vertex_array[:, 1]
                 ax.scatter(x_coords, y_coords, c=color, s=30, alpha=0.7, label=geometry.name)
                 
                 # Dibujar contornos de las caras
-                for face in geometry.faces:
-                    if len(face) >= 3:
-                        face_x = [geometry.vertices[idx].x for idx in face] + [geometry.vertices[face[0]].x]
-                        face_y = [geometry.vertices[idx].y for idx in face] + [geometry.vertices[face[0]].y]
-                        ax.plot(face_x, face_y, color=color, alpha=0.5, linewidth=1)
+                face_x, face_y = geometry.outline_coords((0, 1))
+                ax.plot(face_x, face_y, color=color, alpha=0.5, linewidth=1)
                 
                 ax.set_xlabel('X')
                 ax.set_ylabel('Y')
@@ -813,15 +4620,12 @@ class Professional3DModeler:
             
             elif view == 'front':
                 # Vista frontal (proyección X-Z)
-                x_coords = [v.x for v in geometry.vertices]
-                z_coords = [v.z for v in geometry.vertices]
+                x_coords = geometry.vertex_array[:, 0]
+                z_coords = geometry.vertex_array[:, 2]
                 ax.scatter(x_coords, z_coords, c=color, s=30, alpha=0.7, label=geometry.name)
                 
-                for face in geometry.faces:
-                    if len(face) >= 3:
-                        face_x = [geometry.vertices[idx].x for idx in face] + [geometry.vertices[face[0]].x]
-                        face_z = [geometry.vertices[idx].z for idx in face] + [geometry.vertices[face[0]].z]
-                        ax.plot(face_x, face_z, color=color, alpha=0.5, linewidth=1)
+                face_x, face_z = geometry.outline_coords((0, 2))
+                ax.plot(face_x, face_z, color=color, alpha=0.5, linewidth=1)
                 
                 ax.set_xlabel('X')
                 ax.set_ylabel('Z')
@@ -829,15 +4633,12 @@ class Professional3DModeler:
             
             elif view == 'side':
                 # Vista lateral (proyección Y-Z)
-                y_coords = [v.y for v in geometry.vertices]
-                z_coords = [v.z for v in geometry.vertices]
+                y_coords = geometry.vertex_array[:, 1]
+                z_coords = geometry.vertex_array[:, 2]
                 ax.scatter(y_coords, z_coords, c=color, s=30, alpha=0.7, label=geometry.name)
                 
-                for face in geometry.faces:
-                    if len(face) >= 3:
-                        face_y = [geometry.vertices[idx].y for idx in face] + [geometry.vertices[face[0]].y]
-                        face_z = [geometry.vertices[idx].z for idx in face] + [geometry.vertices[face[0]].z]
-                        ax.plot(face_y, face_z, color=color, alpha=0.5, linewidth=1)
+                face_y, face_z = geometry.outline_coords((1, 2))
+                ax.plot(face_y, face_z, color=color, alpha=0.5, linewidth=1)
                 
                 ax.set_xlabel('Y')
                 ax.set_ylabel('Z')
@@ -851,107 +4652,419 @@ class Professional3DModeler:
         
         return fig
     
-    def calculate_volume(self) -> Dict[str, float]:
-        """Calcular volumen de cada geometría"""
+    def calculate_volume(self, verbose: bool = False) -> Dict[str, float]:
+        """Calcular volumen de cada geometría
+        
+        Sólo las mallas cerradas y con orientación coherente tienen volumen;
+        el resto vale 0.0 (ver `validate_meshes` para el motivo). Con
+        `verbose=True` se listan las geometrías sin volumen cerrado.
+        """
+        report = self.validate_meshes(verbose=False)
         volumes = {}
+        open_meshes = []
         
         for geometry in self.geometries:
-            volume = 0.0
-            
-            # Método simplificado para calcular volumen usando triangulación
-            if len(geometry.vertices) >= 4 and len(geometry.faces) > 0:
-                try:
-                    # Crear malla con trimesh para cálculo preciso
-                    vertices_array = np.array([[v.x, v.y, v.z] for v in geometry.vertices])
-                    
-                    # Triangular todas las caras
-                    triangles = []
-                    for face in geometry.faces:
-                        if len(face) >= 3:
-                            for j in range(1, len(face) - 1):
-                                triangles.append([face[0], face[j], face[j+1]])
-                    
-                    if triangles:
-                        mesh = trimesh.Trimesh(vertices=vertices_array, faces=triangles)
-                        if mesh.is_volume:
-                            volume = mesh.volume
-                        else:
-                            volume = 0.0
-                
-                except Exception as e:
-                    print(f"Error calculando volumen para {geometry.name}: {e}")
-                    volume = 0.0
-            
-            volumes[geometry.name] = volume
+            result = report[geometry.id]
+            volumes[geometry.name] = abs(result['volume']) if result['is_volume'] else 0.0
+            if not result['is_volume']:
+                open_meshes.append(geometry.name)
         
+        if verbose and open_meshes:
+            print(f"Geometrías sin volumen cerrado: {', '.join(open_meshes)}")
         return volumes
     
+    def validate_meshes(self, geometry_name: Optional[Union[int, str]] = None,
+                        repair: bool = False, max_hole_edges: int = 8,
+                        verbose: bool = True) -> Dict[int, Dict]:
+        """Validar las mallas de la escena en una sola pasada
+        
+        Las caras de todas las geometrías se concatenan con desplazamiento
+        de vértices y se construye una única tabla de adyacencia; de ella
+        salen, por geometría, las aristas de borde, las no variedad (más de
+        dos caras), las de orientación incoherente (dos caras que la recorren
+        en el mismo sentido), las caras degeneradas y las componentes
+        conexas. Las instancias se analizan una vez por prototipo y su volumen
+        se escala por el determinante de su matriz. Con `repair=True` antes se
+        llama a `Geometry3D.repair_mesh`.
+        
+        Devuelve un dict {id: informe}.
+        """
+        if geometry_name is not None:
+            geometry = self.find_geometry(geometry_name)
+            geometries = [geometry] if geometry is not None else []
+        else:
+            geometries = self.geometries
+        
+        repairs = {}
+        if repair:
+            repairs = {geometry.id: geometry.repair_mesh(max_hole_edges) for geometry in geometries}
+        
+        report = {}
+        if not geometries:
+            return report
+        
+        # Las instancias se analizan una sola vez, sobre su prototipo
+        sources, source_index, owner_of, determinants = [], {}, [], []
+        for geometry in geometries:
+            source, matrix = _instance_source(geometry)
+            if id(source) not in source_index:
+                source_index[id(source)] = len(sources)
+                sources.append(source)
+            owner_of.append(source_index[id(source)])
+            determinants.append(1.0 if matrix is None else float(np.linalg.det(matrix[:3, :3])))
+        count = len(sources)
+        
+        vertex_counts = np.array([len(geometry.vertex_array) for geometry in sources], dtype=np.int64)
+        face_counts = np.array([len(geometry.face_offsets) - 1 for geometry in sources], dtype=np.int64)
+        vertex_offsets = np.concatenate([[0], np.cumsum(vertex_counts)[:-1]])
+        element_counts = np.array([len(geometry.face_indices) for geometry in sources], dtype=np.int64)
+        element_offsets = np.concatenate([[0], np.cumsum(element_counts)[:-1]])
+        vertices = np.concatenate([geometry.vertex_array for geometry in sources])
+        indices = np.concatenate([geometry.face_indices + vertex_offsets[k]
+                                  for k, geometry in enumerate(sources)])
+        offsets = np.concatenate([[0]] + [geometry.face_offsets[1:] + element_offsets[k]
+                                          for k, geometry in enumerate(sources)])
+        face_owner = np.repeat(np.arange(count), face_counts)
+        
+        adjacency = MeshAdjacency(indices, offsets, len(vertices))
+        starts = adjacency.edge_half_edge_offsets[:-1]
+        valence = adjacency.edge_valence
+        edge_owner = face_owner[adjacency.half_edge_face[adjacency.edge_half_edges[starts]]]
+        manifold = valence == 2
+        same_direction = np.zeros(len(valence), dtype=bool)
+        same_direction[manifold] = (adjacency.half_edge_origin[adjacency.edge_half_edges[starts[manifold]]]
+                                    == adjacency.half_edge_origin[adjacency.edge_half_edges[starts[manifold] + 1]])
+        
+        # Caras degeneradas: menos de 3 vértices, vértices repetidos seguidos o área nula
+        sizes = np.diff(offsets)
+        newell = _polygon_normals(vertices, indices, offsets)
+        extent = np.array([np.ptp(geometry.vertex_array, axis=0).max() if len(geometry.vertex_array) else 0.0
+                           for geometry in sources])
+        repeated = adjacency.half_edge_origin == adjacency.half_edge_target
+        degenerate = ((sizes < 3) | (np.bincount(adjacency.half_edge_face[repeated], minlength=len(sizes)) > 0)
+                      | (np.linalg.norm(newell, axis=1) <= 1e-12 * extent[face_owner] ** 2))
+        
+        components = adjacency.face_components()
+        component_owner = np.zeros(int(components.max()) + 1 if len(components) else 0, dtype=np.int64)
+        component_owner[components] = face_owner
+        
+        # Volumen con signo por el teorema de la divergencia sobre los triángulos
+        triangles = [geometry.get_triangles() + vertex_offsets[k] for k, geometry in enumerate(sources)]
+        triangle_owner = np.repeat(np.arange(count), [len(tri) for tri in triangles])
+        corners = vertices[np.concatenate(triangles)]
+        signed_volume = np.bincount(triangle_owner, minlength=count,
+                                    weights=np.einsum('ij,ij->i', corners[:, 0],
+                                                      np.cross(corners[:, 1], corners[:, 2]))) / 6.0
+        
+        counts = lambda mask, owner: np.bincount(owner[mask], minlength=count)
+        edges = np.bincount(edge_owner, minlength=count)
+        boundary = counts(valence == 1, edge_owner)
+        non_manifold = counts(valence > 2, edge_owner)
+        inconsistent = counts(same_direction, edge_owner)
+        degenerate_faces = counts(degenerate, face_owner)
+        component_counts = np.bincount(component_owner, minlength=count)
+        
+        for geometry, k, determinant in zip(geometries, owner_of, determinants):
+            watertight = bool(edges[k] and boundary[k] == 0 and non_manifold[k] == 0)
+            consistent = bool(inconsistent[k] == 0 and non_manifold[k] == 0)
+            report[geometry.id] = {
+                'name': geometry.name,
+                'faces': int(face_counts[k]),
+                'edges': int(edges[k]),
+                'boundary_edges': int(boundary[k]),
+                'non_manifold_edges': int(non_manifold[k]),
+                'inconsistent_edges': int(inconsistent[k]),
+                'degenerate_faces': int(degenerate_faces[k]),
+                'components': int(component_counts[k]),
+                'watertight': watertight,
+                'consistent_winding': consistent,
+                'is_volume': bool(watertight and consistent and signed_volume[k] != 0.0),
+                'volume': float(signed_volume[k] * determinant)
+            }
+            if repair:
+                report[geometry.id]['repair'] = repairs[geometry.id]
+        
+        if verbose:
+            closed = sum(result['is_volume'] for result in report.values())
+            print(f"Validación de mallas: {closed} de {len(geometries)} geometrías cerradas y orientadas")
+        return report
+    
     def calculate_surface_area(self) -> Dict[str, float]:
-        """Calcular área superficial de cada geometría"""
+        """Calcular área superficial de cada geometría
+        
+        Los productos cruzados de los triángulos se calculan una vez por
+        malla; una instancia los transforma con la matriz de cofactores de su
+        afín (o escala el área del prototipo si la afín es una semejanza).
+        """
         areas = {}
+        crosses, totals = {}, {}
         
         for geometry in self.geometries:
-            total_area = 0.0
-            
-            for face in geometry.faces:
-                if len(face) >= 3:
-                    # Calcular área de cada cara
-                    face_vertices = [geometry.vertices[idx] for idx in face]
-                    
-                    # Triangular la cara y sumar áreas
-                    for j in range(1, len(face_vertices) - 1):
-                        v1 = face_vertices[0]
-                        v2 = face_vertices[j]
-                        v3 = face_vertices[j + 1]
-                        
-                        # Producto cruzado para área del triángulo
-                        edge1 = v2 - v1
-                        edge2 = v3 - v1
-                        cross = edge1.cross(edge2)
-                        triangle_area = cross.magnitude() / 2.0
-                        
-                        total_area += triangle_area
-            
-            areas[geometry.name] = total_area
+            source, matrix = _instance_source(geometry)
+            if id(source) not in crosses:
+                # Triangular las caras y obtener el producto cruzado de todos los triángulos a la vez
+                triangles = source.get_triangles()
+                vertices = source.vector_array()
+                v1 = vertices[triangles[:, 0]]
+                v2 = vertices[triangles[:, 1]]
+                v3 = vertices[triangles[:, 2]]
+                cross = (v2 - v1).cross(v3 - v1)
+                crosses[id(source)] = cross.data
+                totals[id(source)] = float(cross.magnitude().sum() / 2.0)
+            if matrix is None:
+                areas[geometry.name] = totals[id(source)]
+                continue
+            linear = matrix[:3, :3]
+            gram = linear.T @ linear
+            if np.allclose(gram, np.identity(3) * gram[0, 0]):
+                areas[geometry.name] = totals[id(source)] * float(gram[0, 0])
+            else:
+                cofactor = np.linalg.det(linear) * np.linalg.inv(linear).T
+                areas[geometry.name] = float(np.linalg.norm(crosses[id(source)] @ cofactor.T, axis=1).sum() / 2.0)
         
         return areas
     
-    def apply_transformation_to_geometry(self, geometry_name: str, 
-                                       transformation_matrix: np.ndarray):
-        """Aplicar transformación específica a una geometría"""
-        for geometry in self.geometries:
-            if geometry.name == geometry_name:
-                # Aplicar transformación a todos los vértices
-                transformed_vertices = []
-                for vertex in geometry.vertices:
-                    # Convertir a coordenadas homogéneas
-                    homogeneous = np.array([vertex.x, vertex.y, vertex.z, 1.0])
-                    transformed = transformation_matrix @ homogeneous
-                    transformed_vertices.append(Vector3D(transformed[0], transformed[1], transformed[2]))
-                
-                geometry.vertices = transformed_vertices
-                geometry.apply_transformation(transformation_matrix)
-                break
+    def weld_vertices(self, tolerance: float = 1e-9,
+                      geometry_name: Optional[Union[int, str]] = None) -> Dict[int, Tuple[int, int]]:
+        """Soldar vértices coincidentes en una geometría o en toda la escena
+        
+        Cada geometría se suelda por separado. Devuelve, por id, los
+        vértices y caras eliminados.
+        """
+        if geometry_name is not None:
+            geometry = self.find_geometry(geometry_name)
+            targets = [geometry] if geometry is not None else []
+        else:
+            targets = self.geometries
+        
+        results = {geometry.id: geometry.weld_vertices(tolerance) for geometry in targets}
+        removed_vertices = sum(vertices for vertices, _ in results.values())
+        removed_faces = sum(faces for _, faces in results.values())
+        print(f"Vértices soldados: {removed_vertices} vértices y {removed_faces} caras degeneradas eliminadas")
+        return results
+    
+    def get_bvh(self, leaf_size: int = 4) -> 'SceneBVH':
+        """BVH de toda la escena
+        
+        Se reutiliza entre llamadas: si sólo se movieron geometrías se
+        reajustan sus cajas; si cambiaron las geometrías o sus caras se
+        reconstruye.
+        """
+        geometries = self.geometries
+        if (self._bvh is None or self._bvh.leaf_size != leaf_size
+                or not self._bvh.update(geometries)):
+            self._bvh = SceneBVH(geometries, leaf_size)
+        return self._bvh
+    
+    def ray_cast(self, origins: np.ndarray, directions: np.ndarray,
+                 max_distance: float = np.inf, workers: Optional[int] = None,
+                 chunk_size: int = 65536) -> Dict[str, np.ndarray]:
+        """Lanzar un lote de rayos contra la escena
+        
+        Acepta arrays (R, 3) de orígenes y direcciones (se normalizan) y usa
+        el BVH de la escena. Los lotes grandes se dividen en bloques de
+        `chunk_size` rayos repartidos entre `workers` hilos (por defecto uno
+        por núcleo; NumPy libera el GIL en las operaciones pesadas).
+        
+        Devuelve un dict de arrays por rayo: 'hit', 'geometry_id' y
+        'face_index' (-1 sin impacto), 'distance' (inf sin impacto),
+        'vertex_indices' (vértices del triángulo impactado en su geometría),
+        'barycentric' (pesos de esos tres vértices) y 'point'.
+        
+        Rendimiento medido en un núcleo: unos 23 000 rayos/s sobre 330 000
+        triángulos con un 90 % de impactos y unos 150 000 rayos/s cuando casi
+        todos fallan. El recorrido es por niveles y sólo poda por distancia
+        al llegar a las hojas, así que queda lejos del millón de rayos/s de
+        un núcleo compilado.
+        """
+        origins = np.asarray(origins, dtype=np.float64).reshape(-1, 3)
+        directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+        lengths = np.linalg.norm(directions, axis=1)
+        directions = directions / np.where(lengths > 0, lengths, 1.0)[:, None]
+        bvh = self.get_bvh()
+        
+        count = len(origins)
+        bounds = list(range(0, count, chunk_size)) + [count]
+        chunks = list(zip(bounds[:-1], bounds[1:]))
+        cast = lambda chunk: bvh.intersect_rays(origins[chunk[0]:chunk[1]],
+                                                directions[chunk[0]:chunk[1]], max_distance)
+        if len(chunks) > 1 and workers != 1:
+            with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+                results = list(pool.map(cast, chunks))
+        else:
+            results = [cast(chunk) for chunk in chunks]
+        
+        if results:
+            t, triangle, u, v = (np.concatenate(parts) for parts in zip(*results))
+        else:
+            t, triangle, u, v = np.empty(0), np.empty(0, dtype=np.int64), np.empty(0), np.empty(0)
+        hit = triangle >= 0
+        safe_triangle = np.where(hit, triangle, 0)
+        
+        return {
+            'hit': hit,
+            'geometry_id': np.where(hit, bvh.triangle_geometry[safe_triangle] if len(bvh) else -1, -1),
+            'face_index': np.where(hit, bvh.triangle_face[safe_triangle] if len(bvh) else -1, -1),
+            'vertex_indices': (np.where(hit[:, None], bvh.triangle_vertices[safe_triangle], -1) if len(bvh)
+                               else np.full((count, 3), -1, dtype=np.int64)),
+            'distance': t,
+            'barycentric': np.where(hit[:, None], np.stack([1.0 - u - v, u, v], axis=1), 0.0),
+            'point': np.where(hit[:, None], origins + directions * np.where(hit, t, 0.0)[:, None], np.nan)
+        }
+    
+    def pick(self, origin: Vector3D, direction: Vector3D) -> Optional[Dict]:
+        """Primera geometría y cara que impacta un rayo (por ejemplo desde la cámara)"""
+        result = self.ray_cast(origin.to_array(), direction.to_array())
+        if not result['hit'][0]:
+            return None
+        return {
+            'geometry': self.get_geometry(int(result['geometry_id'][0])),
+            'face_index': int(result['face_index'][0]),
+            'distance': float(result['distance'][0]),
+            'barycentric': result['barycentric'][0],
+            'point': Vector3D(*result['point'][0])
+        }
     
-    def create_animation_frames(self, geometry_name: str, transformation_sequence: List[np.ndarray],
+    def _scene_triangles(self) -> Tuple[List[Geometry3D], np.ndarray, np.ndarray]:
+        """Triángulos de todas las geometrías: coordenadas (T, 3, 3) y geometría de cada uno"""
+        geometries = self.geometries
+        corners = [geometry.vertex_array[geometry.get_triangles()] for geometry in geometries]
+        owners = [np.full(len(tri), i, dtype=np.int64) for i, tri in enumerate(corners)]
+        if not corners:
+            return geometries, np.empty((0, 3, 3)), np.empty(0, dtype=np.int64)
+        return geometries, np.concatenate(corners), np.concatenate(owners)
+    
+    def calculate_mass_properties(self, density: float = 1.0,
+                                  as_dataframe: bool = False):
+        """Calcular área, volumen con signo, centroide y tensor de inercia de cada geometría
+        
+        Todas las geometrías se procesan en un solo lote sobre los triángulos
+        cacheados, integrando sobre la superficie con el teorema de la
+        divergencia (algoritmo de Eberly). El volumen es negativo si las caras
+        están orientadas hacia dentro; el tensor de inercia se da respecto al
+        centroide y con el signo corregido en ese caso.
+        
+        Las integrales sólo tienen sentido para mallas cerradas y con
+        orientación coherente ('is_volume' de `validate_meshes`); para el
+        resto el volumen y la masa valen 0.0 y el centroide y la inercia NaN.
+        
+        Devuelve un dict {id: propiedades} o un DataFrame de pandas.
+        """
+        geometries, corners, owner = self._scene_triangles()
+        count = len(geometries)
+        report = self.validate_meshes(verbose=False)
+        is_volume = np.array([report[geometry.id]['is_volume'] for geometry in geometries], dtype=bool)
+        
+        # Trabajar relativo al centro de cada geometría para estabilidad numérica
+        reference = np.zeros((count, 3))
+        extent = np.zeros(count)
+        for i, geometry in enumerate(geometries):
+            if len(geometry.vertex_array):
+                reference[i] = geometry.vertex_array.mean(axis=0)
+                extent[i] = np.ptp(geometry.vertex_array, axis=0).max()
+        corners = corners - reference[owner][:, None, :]
+        
+        p0, p1, p2 = corners[:, 0], corners[:, 1], corners[:, 2]
+        d = np.cross(p1 - p0, p2 - p0)
+        triangle_areas = np.linalg.norm(d, axis=1) / 2.0
+        
+        # Subexpresiones de Eberly para cada eje
+        w0, w1, w2 = p0.T, p1.T, p2.T
+        temp0 = w0 + w1
+        f1 = temp0 + w2
+        temp1 = w0 * w0
+        temp2 = temp1 + w1 * temp0
+        f2 = temp2 + w2 * f1
+        f3 = w0 * temp1 + w1 * temp2 + w2 * f2
+        g0 = f2 + w0 * (f1 + w0)
+        g1 = f2 + w1 * (f1 + w1)
+        g2 = f2 + w2 * (f1 + w2)
+        x, y, z = 0, 1, 2
+        
+        terms = np.stack([
+            d[:, 0] * f1[x],
+            d[:, 0] * f2[x], d[:, 1] * f2[y], d[:, 2] * f2[z],
+            d[:, 0] * f3[x], d[:, 1] * f3[y], d[:, 2] * f3[z],
+            d[:, 0] * (w0[y] * g0[x] + w1[y] * g1[x] + w2[y] * g2[x]),
+            d[:, 1] * (w0[z] * g0[y] + w1[z] * g1[y] + w2[z] * g2[y]),
+            d[:, 2] * (w0[x] * g0[z] + w1[x] * g1[z] + w2[x] * g2[z]),
+        ], axis=1)
+        weights = np.array([1/6, 1/24, 1/24, 1/24, 1/60, 1/60, 1/60, 1/120, 1/120, 1/120])
+        
+        integrals = np.zeros((count, 10))
+        np.add.at(integrals, owner, terms)
+        integrals *= weights
+        surface_area = np.bincount(owner, weights=triangle_areas, minlength=count)
+        
+        volume = integrals[:, 0]
+        # Corregir orientación (caras hacia dentro) antes de derivar inercia
+        orientation = np.where(volume < 0, -1.0, 1.0)
+        integrals = integrals * orientation[:, None]
+        mass = integrals[:, 0]
+        
+        # Umbral relativo al tamaño: una pieza diminuta sigue siendo sólida
+        solid = is_volume & (mass > 1e-12 * extent ** 3)
+        safe_mass = np.where(solid, mass, 1.0)
+        centroid = integrals[:, 1:4] / safe_mass[:, None]
+        
+        cx, cy, cz = centroid.T
+        inertia = np.zeros((count, 3, 3))
+        inertia[:, 0, 0] = integrals[:, 5] + integrals[:, 6] - mass * (cy**2 + cz**2)
+        inertia[:, 1, 1] = integrals[:, 4] + integrals[:, 6] - mass * (cz**2 + cx**2)
+        inertia[:, 2, 2] = integrals[:, 4] + integrals[:, 5] - mass * (cx**2 + cy**2)
+        inertia[:, 0, 1] = inertia[:, 1, 0] = -(integrals[:, 7] - mass * cx * cy)
+        inertia[:, 1, 2] = inertia[:, 2, 1] = -(integrals[:, 8] - mass * cy * cz)
+        inertia[:, 0, 2] = inertia[:, 2, 0] = -(integrals[:, 9] - mass * cz * cx)
+        inertia[~solid] = np.nan
+        inertia *= density
+        centroid = centroid + reference
+        centroid[~solid] = np.nan
+        volume = np.where(solid, volume, 0.0)
+        
+        properties = {}
+        for i, geometry in enumerate(geometries):
+            properties[geometry.id] = {
+                'name': geometry.name,
+                'surface_area': float(surface_area[i]),
+                'volume': float(volume[i]),
+                'mass': float(abs(volume[i]) * density),
+                'centroid': centroid[i],
+                'inertia': inertia[i],
+                'is_volume': bool(solid[i])
+            }
+        
+        if as_dataframe:
+            import pandas as pd
+            return pd.DataFrame.from_dict(properties, orient='index')
+        return properties
+    
+    def apply_transformation_to_geometry(self, geometry_name: Union[int, str], 
+                                       transformation_matrix: np.ndarray,
+                                       deferred: Optional[bool] = None):
+        """Aplicar transformación específica a una geometría
+        
+        Si `deferred` (o `self.deferred_transforms`) es verdadero, la matriz se
+        acumula y los vértices se recalculan una sola vez al leerlos.
+        """
+        if deferred is None:
+            deferred = self.deferred_transforms
+        geometry = self.find_geometry(geometry_name)
+        if geometry is not None:
+            # Aplicar transformación a todos los vértices en un solo producto
+            geometry.transform_vertices(transformation_matrix, deferred=deferred)
+    
+    def create_animation_frames(self, geometry_name: Union[int, str], transformation_sequence: List[np.ndarray],
                               frame_count: int = 30) -> List['Professional3DModeler']:
         """Crear secuencia de frames para animación"""
         frames = []
         
         # Encontrar la geometría objetivo
-        target_geometry = None
-        for geometry in self.geometries:
-            if geometry.name == geometry_name:
-                target_geometry = geometry
-                break
+        target_geometry = self.find_geometry(geometry_name)
         
         if not target_geometry:
             print(f"Geometría '{geometry_name}' no encontrada")
             return frames
         
-        # Guardar vértices originales
-        original_vertices = [Vector3D(v.x, v.y, v.z) for v in target_geometry.vertices]
-        
         # Generar frames interpolados
         for frame in range(frame_count):
             # Crear copia del modelo
@@ -960,12 +5073,7 @@ class Professional3DModeler:
             
             # Copiar todas las geometrías
             for geometry in self.geometries:
-                new_geometry = Geometry3D(geometry.name)
-                new_geometry.vertices = [Vector3D(v.x, v.y, v.z) for v in geometry.vertices]
-                new_geometry.faces = geometry.faces.copy()
-                new_geometry.materials = geometry.materials.copy()
-                new_geometry.transform_matrix = geometry.transform_matrix.copy()
-                frame_model.add_geometry(new_geometry)
+                frame_model.add_geometry(geometry.copy())
             
             # Aplicar interpolación de transformaciones
             t = frame / (frame_count - 1) if frame_count > 1 else 0
@@ -978,78 +5086,232 @@ class Professional3DModeler:
                 # Interpolación lineal de matrices (simplificado)
                 interpolated_transform = start_transform + t * (end_transform - start_transform)
                 
-                frame_model.apply_transformation_to_geometry(geometry_name, interpolated_transform)
+                frame_model.apply_transformation_to_geometry(target_geometry.id, interpolated_transform)
             
             frames.append(frame_model)
         
         return frames
     
-    def generate_cross_sections(self, plane_normal: Vector3D, plane_distances: List[float]) -> List[List[Vector3D]]:
-        """Generar secciones transversales del modelo"""
-        cross_sections = []
+    def _scene_mesh(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Vértices de toda la escena, triángulos con índices globales y geometría de cada uno"""
+        vertices, triangles, owners = [], [], []
+        offset = 0
+        for geometry in self.geometries:
+            local = geometry.get_triangles()
+            vertices.append(geometry.vertex_array)
+            triangles.append(local + offset)
+            owners.append(np.full(len(local), geometry.id, dtype=np.int64))
+            offset += len(geometry.vertex_array)
+        if not vertices:
+            return np.empty((0, 3)), np.empty((0, 3), dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.concatenate(vertices), np.concatenate(triangles), np.concatenate(owners)
+    
+    def slice_model(self, plane_normal: Vector3D,
+                    plane_distances: List[float]) -> List[List[Dict]]:
+        """Cortar el modelo con planos paralelos n·p = distancia
         
-        plane_normal = plane_normal.normalize()
+        Las distancias con signo de todos los vértices se calculan una vez.
+        Cada triángulo se empareja sólo con los planos comprendidos entre su
+        distancia mínima y máxima (búsqueda binaria sobre los planos
+        ordenados), se cortan todos los pares a la vez y los segmentos se
+        encadenan por la arista (o vértice) de la que salen, de modo que cada
+        arista compartida se visita una sola vez.
         
-        for distance in plane_distances:
-            section_points = []
-            
-            for geometry in self.geometries:
-                for face in geometry.faces:
-                    if len(face) >= 3:
-                        # Verificar intersección de cada arista de la cara con el plano
-                        for i in range(len(face)):
-                            v1 = geometry.vertices[face[i]]
-                            v2 = geometry.vertices[face[(i + 1) % len(face)]]
-                            
-                            # Calcular intersección línea-plano
-                            edge_dir = v2 - v1
-                            
-                            # Evitar división por cero
-                            denominator = edge_dir.dot(plane_normal)
-                            if abs(denominator) > 1e-6:
-                                # Punto de referencia en el plano
-                                plane_point = Vector3D(0, 0, distance) if plane_normal.z != 0 else Vector3D(0, distance, 0) if plane_normal.y != 0 else Vector3D(distance, 0, 0)
-                                
-                                t = (plane_point - v1).dot(plane_normal) / denominator
-                                
-                                # Verificar si la intersección está en el segmento
-                                if 0 <= t <= 1:
-                                    intersection = v1 + edge_dir * t
-                                    section_points.append(intersection)
-            
-            cross_sections.append(section_points)
+        Un plano que pasa por la malla sin atravesarla se trata igual desde
+        ambos lados: las caras contenidas en el plano no aportan nada por sí
+        mismas y cada arista de la malla sobre el plano da un segmento si
+        alguna de sus caras vecinas no está en el plano. Así el contorno de
+        una caja sale igual cortada por su base que por su tapa, y una
+        arista de contacto (la cumbrera de un tejado) sale como polilínea
+        abierta.
+        
+        Devuelve, por cada distancia, una lista de contornos con
+        'geometry_id', 'points' (array (K, 3) ordenado), 'closed' y 'area'
+        (área encerrada, sólo para contornos cerrados).
+        """
+        normal = plane_normal.normalize().to_array()
+        distances = np.asarray(plane_distances, dtype=np.float64)
+        sections = [[] for _ in range(len(distances))]
+        vertices, triangles, owners = self._scene_mesh()
+        if not len(triangles) or not len(distances):
+            return sections
+        
+        signed = vertices @ normal
+        plane_order = np.argsort(distances, kind='stable')
+        sorted_planes = distances[plane_order]
+        
+        # Pares (triángulo, plano) para los planos dentro del rango del triángulo
+        tri_signed = signed[triangles]
+        first_plane = np.searchsorted(sorted_planes, tri_signed.min(axis=1), side='left')
+        last_plane = np.searchsorted(sorted_planes, tri_signed.max(axis=1), side='right')
+        counts = np.maximum(last_plane - first_plane, 0)
+        pair_triangle = np.repeat(np.arange(len(triangles)), counts)
+        pair_plane = (np.repeat(first_plane, counts) + np.arange(counts.sum())
+                      - np.repeat(np.cumsum(counts) - counts, counts))
+        level = sorted_planes[pair_plane]
         
+        # Se cortan los triángulos con vértices a ambos lados y los que
+        # apoyan exactamente una arista en el plano (por arriba o por abajo).
+        # Un vértice sobre el plano se pone del lado contrario al vértice
+        # libre, así cada triángulo cortado tiene dos aristas que cambian de lado
+        pair_signed = tri_signed[pair_triangle]
+        strictly_above = pair_signed > level[:, None]
+        strictly_below = pair_signed < level[:, None]
+        on_plane = ~strictly_above & ~strictly_below
+        has_below = strictly_below.any(axis=1)
+        above = strictly_above | (on_plane & has_below[:, None])
+        crossing = ((has_below & strictly_above.any(axis=1))
+                    | (on_plane.sum(axis=1) == 2))
+        pair_triangle, pair_plane, level, above = (pair_triangle[crossing], pair_plane[crossing],
+                                                   level[crossing], above[crossing])
+        corners = triangles[pair_triangle]
+        
+        # Las dos aristas cortadas de cada triángulo
+        edge_points, edge_keys = [], []
+        for start, end in ((0, 1), (1, 2), (2, 0)):
+            cut = above[:, start] != above[:, end]
+            a, b = corners[:, start], corners[:, end]
+            low, high = np.minimum(a, b), np.maximum(a, b)
+            t = (level - signed[low]) / (signed[high] - signed[low])
+            points = vertices[low] + (vertices[high] - vertices[low]) * t[:, None]
+            # Si el corte cae justo en un vértice, el nodo es el propio vértice
+            on_vertex = np.where(signed[low] == level, low, np.where(signed[high] == level, high, -1))
+            key_low = np.where(on_vertex >= 0, on_vertex, low)
+            key_high = np.where(on_vertex >= 0, on_vertex, high)
+            edge_points.append(np.where(cut[:, None], points, np.nan))
+            edge_keys.append(np.stack([np.where(cut, pair_plane, -1), key_low, key_high], axis=1))
+        
+        cut_mask = np.stack([keys[:, 0] >= 0 for keys in edge_keys], axis=1)
+        first_edge = np.argmax(cut_mask, axis=1)
+        second_edge = 2 - np.argmax(cut_mask[:, ::-1], axis=1)
+        rows = np.arange(len(pair_triangle))
+        all_points = np.stack(edge_points, axis=1)
+        all_keys = np.stack(edge_keys, axis=1)
+        
+        # Nodos únicos (plano, arista) compartidos entre triángulos vecinos
+        keys = np.concatenate([all_keys[rows, first_edge], all_keys[rows, second_edge]])
+        node_keys, node_ids = np.unique(keys, axis=0, return_inverse=True)
+        node_ids = node_ids.ravel()
+        node_points = np.empty((len(node_keys), 3))
+        node_points[node_ids] = np.concatenate([all_points[rows, first_edge], all_points[rows, second_edge]])
+        node_a, node_b = node_ids[:len(rows)], node_ids[len(rows):]
+        segment_owner = owners[pair_triangle]
+        valid = node_a != node_b
+        node_a, node_b, segment_owner = node_a[valid], node_b[valid], segment_owner[valid]
+        # Una arista sobre el plano la aportan sus dos triángulos: un solo segmento
+        _, unique_segments = np.unique(np.sort(np.stack([node_a, node_b], axis=1), axis=1),
+                                       axis=0, return_index=True)
+        node_a, node_b, segment_owner = (node_a[unique_segments], node_b[unique_segments],
+                                         segment_owner[unique_segments])
+        owner_of_node = np.empty(len(node_keys), dtype=np.int64)
+        owner_of_node[node_a] = segment_owner
+        owner_of_node[node_b] = segment_owner
+        
+        for path, closed in _trace_polylines(node_a, node_b, len(node_keys)):
+            if closed and len(path) < 3:
+                continue
+            points = node_points[path]
+            area = 0.0
+            if closed:
+                area = 0.5 * float(np.cross(points, np.roll(points, -1, axis=0)).sum(axis=0) @ normal)
+            plane_index = plane_order[node_keys[path[0], 0]]
+            sections[plane_index].append({
+                'geometry_id': int(owner_of_node[path[0]]),
+                'points': points,
+                'closed': closed,
+                'area': abs(area)
+            })
+        
+        return sections
+    
+    def generate_cross_sections(self, plane_normal: Vector3D, plane_distances: List[float]) -> List[List[Vector3D]]:
+        """Generar secciones transversales del modelo
+        
+        Devuelve, por cada distancia, los puntos de corte en orden de
+        contorno (ver `slice_model` para los contornos separados y sus áreas).
+        """
+        cross_sections = []
+        for loops in self.slice_model(plane_normal, plane_distances):
+            points = [loop['points'] for loop in loops]
+            cross_sections.append(VectorArray(np.concatenate(points) if points else None).to_vectors())
         return cross_sections
     
-    def optimize_mesh(self, geometry_name: str, target_vertices: int = 1000):
-        """Optimizar malla reduciendo número de vértices"""
-        for geometry in self.geometries:
-            if geometry.name == geometry_name:
-                if len(geometry.vertices) > target_vertices:
-                    # Simplificación básica: mantener cada n-ésimo vértice
-                    step = len(geometry.vertices) // target_vertices
-                    optimized_vertices = geometry.vertices[::max(1, step)]
-                    
-                    # Reajustar índices de caras
-                    vertex_mapping = {i * step: i for i in range(len(optimized_vertices))}
-                    optimized_faces = []
-                    
-                    for face in geometry.faces:
-                        new_face = []
-                        for vertex_idx in face:
-                            closest_idx = min(vertex_mapping.keys(), 
-                                             key=lambda x: abs(x - vertex_idx))
-                            if closest_idx in vertex_mapping:
-                                new_face.append(vertex_mapping[closest_idx])
-                        
-                        if len(new_face) >= 3:
-                            optimized_faces.append(new_face)
-                    
-                    geometry.vertices = optimized_vertices
-                    geometry.faces = optimized_faces
-                    
-                    print(f"Malla optimizada: {geometry_name} - Vértices reducidos de {len(geometry.vertices)} a {len(optimized_vertices)}")
-                break
+    def optimize_mesh(self, geometry_name: Union[int, str], target_vertices: Optional[int] = None,
+                      target_faces: Optional[int] = None, max_error: Optional[float] = None,
+                      preserve_boundary: bool = True,
+                      face_materials: Optional[List] = None) -> Optional[Dict]:
+        """Optimizar malla por colapso de aristas con métrica de error cuadrático
+        
+        La malla se triangula y se simplifica hasta `target_vertices`,
+        `target_faces` o el error `max_error` (suma de distancias al cuadrado
+        a los planos originales); sin ninguno de los tres, hasta 1000
+        vértices. `face_materials` asigna una etiqueta a cada cara: las
+        fronteras entre etiquetas se conservan igual que los bordes. Si no
+        se colapsa ninguna arista la geometría queda intacta (no se
+        triangula). Devuelve un informe de la reducción.
+        """
+        geometry = self.find_geometry(geometry_name)
+        if geometry is None:
+            return None
+        if target_vertices is None and target_faces is None and max_error is None:
+            target_vertices = 1000
+        
+        original_vertices = len(geometry.vertex_array)
+        original_faces = len(geometry.face_offsets) - 1
+        triangles = geometry.get_triangles()
+        face_of_triangle = geometry.get_triangle_faces()
+        labels = None
+        if face_materials is not None:
+            _, codes = np.unique(np.asarray(face_materials), return_inverse=True)
+            labels = codes.ravel()[face_of_triangle]
+        
+        result = decimate_triangles(geometry.vertex_array, triangles,
+                                    target_faces=target_faces,
+                                    target_vertices=target_vertices,
+                                    max_error=max_error,
+                                    triangle_labels=labels,
+                                    preserve_boundary=preserve_boundary)
+        
+        # Cada colapso elimina al menos un vértice usado por los triángulos
+        if len(result['vertices']) == len(np.unique(triangles)):
+            print(f"Malla sin cambios: {geometry_name} - {original_vertices} vértices, {original_faces} caras")
+            report = {
+                'geometry_id': geometry.id,
+                'original_vertices': original_vertices,
+                'original_faces': original_faces,
+                'original_triangles': len(triangles),
+                'vertices': original_vertices,
+                'faces': original_faces,
+                'vertex_reduction': 0.0,
+                'face_reduction': 0.0,
+                'max_error': 0.0
+            }
+            if face_materials is not None:
+                report['face_materials'] = list(face_materials)
+            return report
+        
+        new_triangles = result['triangles']
+        geometry.vertex_array = result['vertices']
+        geometry.set_face_arrays(new_triangles.ravel(), np.arange(0, new_triangles.size + 1, 3))
+        
+        report = {
+            'geometry_id': geometry.id,
+            'original_vertices': original_vertices,
+            'original_faces': original_faces,
+            'original_triangles': len(triangles),
+            'vertices': len(result['vertices']),
+            'faces': len(new_triangles),
+            'vertex_reduction': 1.0 - len(result['vertices']) / max(original_vertices, 1),
+            'face_reduction': 1.0 - len(new_triangles) / max(len(triangles), 1),
+            'max_error': result['max_error']
+        }
+        if face_materials is not None:
+            report['face_materials'] = [face_materials[face]
+                                        for face in face_of_triangle[result['source_triangles']]]
+        
+        print(f"Malla optimizada: {geometry_name} - Vértices reducidos de {original_vertices} a {report['vertices']}, "
+              f"triángulos de {len(triangles)} a {report['faces']}")
+        return report
     
     def generate_technical_drawing(self, scale: float = 1.0, 
                                  include_dimensions: bool = True,
@@ -1095,24 +5357,21 @@ class Professional3DModeler:
             
             # Seleccionar coordenadas según la vista
             if view == 'top':
-                coords = [(v.x * scale, v.y * scale) for v in geometry.vertices]
+                axes = (0, 1)
                 ax.set_xlabel('X (mm)')
                 ax.set_ylabel('Y (mm)')
             elif view == 'front':
-                coords = [(v.x * scale, v.z * scale) for v in geometry.vertices]
+                axes = (0, 2)
                 ax.set_xlabel('X (mm)')
                 ax.set_ylabel('Z (mm)')
             elif view == 'side':
-                coords = [(v.y * scale, v.z * scale) for v in geometry.vertices]
+                axes = (1, 2)
                 ax.set_xlabel('Y (mm)')
                 ax.set_ylabel('Z (mm)')
             
             # Dibujar contornos
-            for face in geometry.faces:
-                if len(face) >= 3:
-                    face_coords = [coords[idx] for idx in face] + [coords[face[0]]]
-                    x_coords, y_coords = zip(*face_coords)
-                    ax.plot(x_coords, y_coords, color=color, linewidth=1.5, alpha=0.8)
+            x_coords, y_coords = geometry.outline_coords(axes, scale)
+            ax.plot(x_coords, y_coords, color=color, linewidth=1.5, alpha=0.8)
         
         ax.grid(True, alpha=0.3)
         ax.set_aspect('equal')
@@ -1134,19 +5393,10 @@ class Professional3DModeler:
         for i, geometry in enumerate(self.geometries):
             color = colors[i % len(colors)]
             
-            # Transformar vértices a vista isométrica
-            iso_coords = []
-            for vertex in geometry.vertices:
-                vertex_3d = np.array([vertex.x * scale, vertex.y * scale, vertex.z * scale])
-                iso_point = iso_matrix @ vertex_3d
-                iso_coords.append((iso_point[0], iso_point[1]))
-            
-            # Dibujar caras
-            for face in geometry.faces:
-                if len(face) >= 3:
-                    face_coords = [iso_coords[idx] for idx in face] + [iso_coords[face[0]]]
-                    x_coords, y_coords = zip(*face_coords)
-                    ax.plot(x_coords, y_coords, color=color, linewidth=1.2, alpha=0.7)
+            # Transformar vértices a vista isométrica y dibujar caras
+            x_coords, y_coords, z_coords = geometry.outline_coords((0, 1, 2), scale)
+            iso_x, iso_y = iso_matrix @ np.stack([x_coords, y_coords, z_coords])
+            ax.plot(iso_x, iso_y, color=color, linewidth=1.2, alpha=0.7)
         
         ax.set_aspect('equal')
         ax.grid(True, alpha=0.2)
@@ -1157,39 +5407,77 @@ class Professional3DModeler:
             return
         
         # Obtener límites del modelo
-        all_vertices = []
-        for geometry in self.geometries:
-            all_vertices.extend(geometry.vertices)
+        all_vertices = np.concatenate([geometry.vertex_array for geometry in self.geometries]) * scale
         
         if view == 'top':
-            x_coords = [v.x * scale for v in all_vertices]
-            y_coords = [v.y * scale for v in all_vertices]
+            x_coords, y_coords = all_vertices[:, 0], all_vertices[:, 1]
         elif view == 'front':
-            x_coords = [v.x * scale for v in all_vertices]
-            y_coords = [v.z * scale for v in all_vertices]
+            x_coords, y_coords = all_vertices[:, 0], all_vertices[:, 2]
         elif view == 'side':
-            x_coords = [v.y * scale for v in all_vertices]
-            y_coords = [v.z * scale for v in all_vertices]
+            x_coords, y_coords = all_vertices[:, 1], all_vertices[:, 2]
         
-        if x_coords and y_coords:
-            x_range = max(x_coords) - min(x_coords)
-            y_range = max(y_coords) - min(y_coords)
+        if len(x_coords) and len(y_coords):
+            x_min, x_max = x_coords.min(), x_coords.max()
+            y_min, y_max = y_coords.min(), y_coords.max()
+            x_range = x_max - x_min
+            y_range = y_max - y_min
             
             # Agregar dimensión horizontal
-            ax.annotate('', xy=(max(x_coords), min(y_coords) - y_range * 0.1),
-                       xytext=(min(x_coords), min(y_coords) - y_range * 0.1),
+            ax.annotate('', xy=(x_max, y_min - y_range * 0.1),
+                       xytext=(x_min, y_min - y_range * 0.1),
                        arrowprops=dict(arrowstyle='<->', color='red', lw=1))
-            ax.text((max(x_coords) + min(x_coords))/2, min(y_coords) - y_range * 0.15,
+            ax.text((x_max + x_min)/2, y_min - y_range * 0.15,
                    f'{x_range:.1f}', ha='center', va='top', color='red', fontsize=10)
             
             # Agregar dimensión vertical
-            ax.annotate('', xy=(min(x_coords) - x_range * 0.1, max(y_coords)),
-                       xytext=(min(x_coords) - x_range * 0.1, min(y_coords)),
+            ax.annotate('', xy=(x_min - x_range * 0.1, y_max),
+                       xytext=(x_min - x_range * 0.1, y_min),
                        arrowprops=dict(arrowstyle='<->', color='red', lw=1))
-            ax.text(min(x_coords) - x_range * 0.15, (max(y_coords) + min(y_coords))/2,
+            ax.text(x_min - x_range * 0.15, (y_max + y_min)/2,
                    f'{y_range:.1f}', ha='right', va='center', color='red', fontsize=10, rotation=90)
 
 
+# Comparativa de rendimiento de los generadores de primitivas
+def benchmark_primitives(segment_counts=(16, 64, 256, 512, 1024), repeats: int = 3) -> Dict[int, Dict[str, float]]:
+    """Comparar los generadores escalares y vectorizados de primitivas
+
+    Para cada número de segmentos se mide (mejor de `repeats`, en segundos)
+    la construcción de tablas y caras del cilindro (n segmentos), la esfera
+    (n/2 x n) y el engranaje (n/2 dientes), sin pasar por la caché, y se
+    comprueba que ambas versiones den arrays idénticos.
+    """
+    def best_time(builder, *args):
+        best, result = np.inf, None
+        for _ in range(max(repeats, 1)):
+            start = time.perf_counter()
+            result = builder(*args)
+            best = min(best, time.perf_counter() - start)
+        return best, result
+    
+    results = {}
+    print("Segmentos | escalar (s) | vectorizado (s) | aceleración")
+    for segments in segment_counts:
+        cases = [
+            (_reference_cylinder_primitive, _cylinder_primitive, (segments,)),
+            (_reference_sphere_primitive, _sphere_primitive, (max(segments // 2, 1), segments)),
+            (_reference_gear_primitive, _gear_primitive, (max(segments // 2, 1),))
+        ]
+        scalar = vectorized = 0.0
+        identical = True
+        for reference, builder, args in cases:
+            old_time, old_arrays = best_time(reference, *args)
+            new_time, new_arrays = best_time(builder, *args)
+            scalar += old_time
+            vectorized += new_time
+            identical &= all(np.array_equal(old_arrays[key], new_arrays[key]) for key in old_arrays)
+        speedup = scalar / vectorized if vectorized > 0 else float('inf')
+        results[segments] = {'scalar': scalar, 'vectorized': vectorized,
+                             'speedup': speedup, 'identical': identical}
+        print(f"{segments:9d} | {scalar:11.4f} | {vectorized:15.4f} | {speedup:8.1f}x"
+              + ("" if identical else "  (¡resultados distintos!)"))
+    return results
+
+
 # Ejemplo de uso del sistema profesional
 def example_architectural_house():
     """Ejemplo: Casa arquitectónica completa"""
@@ -124,38 +124,209 @@ class Transformations3D:
             [0, 0, 0, 1]
         ])
 
+def _to_vertex_array(data) -> np.ndarray:
+    """Convertir vértices (Vector3D, listas o arrays) a un array contiguo (N, 3)"""
+    if isinstance(data, VertexView):
+        return data.geometry.vertex_array.copy()
+    if isinstance(data, np.ndarray):
+        return np.ascontiguousarray(data, dtype=np.float64).reshape(-1, 3)
+    data = list(data)
+    if data and isinstance(data[0], Vector3D):
+        return np.array([(v.x, v.y, v.z) for v in data], dtype=np.float64).reshape(-1, 3)
+    return np.asarray(data, dtype=np.float64).reshape(-1, 3)
+
+def _to_face_arrays(faces) -> Tuple[np.ndarray, np.ndarray]:
+    """Convertir lista de caras a índices planos más offsets (estilo CSR)"""
+    if isinstance(faces, FaceView):
+        return faces.geometry.face_indices.copy(), faces.geometry.face_offsets.copy()
+    faces = [list(face) for face in faces]
+    sizes = np.fromiter((len(face) for face in faces), dtype=np.int64, count=len(faces))
+    offsets = np.zeros(len(faces) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    indices = np.fromiter((idx for face in faces for idx in face),
+                          dtype=np.int64, count=int(offsets[-1]))
+    return indices, offsets
+
+class VertexView:
+    """Vista de compatibilidad: entrega Vector3D sobre el arreglo de vértices"""
+
+    def __init__(self, geometry: 'Geometry3D'):
+        self.geometry = geometry
+
+    def __len__(self):
+        return len(self.geometry.vertex_array)
+
+    def __getitem__(self, index):
+        data = self.geometry.vertex_array[index]
+        if data.ndim == 2:
+            return [Vector3D(x, y, z) for x, y, z in data.tolist()]
+        return Vector3D(*data.tolist())
+
+    def __setitem__(self, index, value):
+        data = self.geometry.vertex_array.copy()
+        data[index] = value.to_array() if isinstance(value, Vector3D) else value
+        self.geometry.vertex_array = data
+
+    def __iter__(self):
+        for x, y, z in self.geometry.vertex_array.tolist():
+            yield Vector3D(x, y, z)
+
+class FaceView:
+    """Vista de compatibilidad: entrega cada cara como lista de índices"""
+
+    def __init__(self, geometry: 'Geometry3D'):
+        self.geometry = geometry
+
+    def __len__(self):
+        return len(self.geometry.face_offsets) - 1
+
+    def __getitem__(self, index):
+        offsets = self.geometry.face_offsets
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        return self.geometry.face_indices[offsets[index]:offsets[index + 1]].tolist()
+
+    def __iter__(self):
+        indices = self.geometry.face_indices.tolist()
+        offsets = self.geometry.face_offsets.tolist()
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            yield indices[start:end]
+
+    def copy(self) -> List[List[int]]:
+        """Copia como lista de listas"""
+        return list(self)
+
 class Geometry3D:
-    """Clase base para todas las geometrías 3D"""
-    
+    """Clase base para todas las geometrías 3D
+
+    Los vértices se guardan en un array contiguo (N, 3) y las caras como
+    índices planos más offsets. `vertices` y `faces` son vistas de
+    compatibilidad que entregan Vector3D y listas de índices.
+    """
+
     def __init__(self, name: str = "Geometry"):
         self.name = name
-        self.vertices = []
-        self.faces = []
+        self._vertex_array = np.empty((0, 3), dtype=np.float64)
+        self._face_indices = np.empty(0, dtype=np.int64)
+        self._face_offsets = np.zeros(1, dtype=np.int64)
         self.normals = []
         self.materials = {}
         self.transform_matrix = np.identity(4)
-    
+
+    @property
+    def vertex_array(self) -> np.ndarray:
+        """Vértices como array (N, 3)"""
+        return self._vertex_array
+
+    @vertex_array.setter
+    def vertex_array(self, data):
+        self._vertex_array = _to_vertex_array(data)
+
+    @property
+    def vertices(self) -> VertexView:
+        """Vista de vértices como Vector3D"""
+        return VertexView(self)
+
+    @vertices.setter
+    def vertices(self, data):
+        self.vertex_array = data
+
+    @property
+    def face_indices(self) -> np.ndarray:
+        """Índices de todas las caras concatenados"""
+        return self._face_indices
+
+    @property
+    def face_offsets(self) -> np.ndarray:
+        """Inicio de cada cara en `face_indices` (longitud F + 1)"""
+        return self._face_offsets
+
+    @property
+    def faces(self) -> FaceView:
+        """Vista de caras como listas de índices"""
+        return FaceView(self)
+
+    @faces.setter
+    def faces(self, faces):
+        self.set_face_arrays(*_to_face_arrays(faces))
+
+    def set_face_arrays(self, indices: np.ndarray, offsets: np.ndarray):
+        """Asignar caras directamente en formato índices + offsets"""
+        self._face_indices = np.ascontiguousarray(indices, dtype=np.int64).ravel()
+        self._face_offsets = np.ascontiguousarray(offsets, dtype=np.int64).ravel()
+
+    @property
+    def face_sizes(self) -> np.ndarray:
+        """Número de vértices de cada cara"""
+        return np.diff(self.face_offsets)
+
+    def polygon_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Índices y offsets sólo de las caras con 3 o más vértices"""
+        sizes = self.face_sizes
+        if np.all(sizes >= 3):
+            return self.face_indices, self.face_offsets
+        keep = sizes >= 3
+        element_keep = np.repeat(keep, sizes)
+        offsets = np.zeros(int(keep.sum()) + 1, dtype=np.int64)
+        np.cumsum(sizes[keep], out=offsets[1:])
+        return self.face_indices[element_keep], offsets
+
+    def triangulate_fan(self) -> np.ndarray:
+        """Triangular todas las caras en abanico, devuelve array (T, 3)"""
+        indices, offsets = self.polygon_arrays()
+        sizes = np.diff(offsets)
+        tri_counts = sizes - 2
+        face_of_tri = np.repeat(np.arange(len(sizes)), tri_counts)
+        first = np.repeat(np.cumsum(tri_counts) - tri_counts, tri_counts)
+        j = np.arange(len(face_of_tri)) - first + 1
+        start = offsets[face_of_tri]
+        return np.stack([indices[start], indices[start + j], indices[start + j + 1]], axis=1)
+
+    def edge_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Aristas de cada cara en orden (inicio, fin), cerrando el polígono"""
+        indices, offsets = self.polygon_arrays()
+        following = np.arange(1, len(indices) + 1)
+        following[offsets[1:] - 1] = offsets[:-1]
+        return indices, indices[following]
+
+    def outline_indices(self) -> np.ndarray:
+        """Índices para dibujar el contorno cerrado de cada cara, separados por -1"""
+        indices, offsets = self.polygon_arrays()
+        sizes = np.diff(offsets)
+        face_of_element = np.repeat(np.arange(len(sizes)), sizes)
+        outline = np.full(len(indices) + 2 * len(sizes), -1, dtype=np.int64)
+        outline[np.arange(len(indices)) + 2 * face_of_element] = indices
+        outline[offsets[1:] + 2 * np.arange(len(sizes))] = indices[offsets[:-1]]
+        return outline
+
+    def outline_coords(self, axes: Tuple[int, ...], scale: float = 1.0) -> Tuple[np.ndarray, ...]:
+        """Coordenadas de los contornos de caras (con NaN entre caras) para graficar"""
+        outline = self.outline_indices()
+        points = self.vertex_array[outline][:, list(axes)] * scale
+        points[outline < 0] = np.nan
+        return tuple(points.T)
+
+    def copy(self) -> 'Geometry3D':
+        """Copia independiente de la geometría"""
+        new_geometry = Geometry3D(self.name)
+        new_geometry.vertex_array = self.vertex_array.copy()
+        new_geometry.set_face_arrays(self.face_indices.copy(), self.face_offsets.copy())
+        new_geometry.materials = self.materials.copy()
+        new_geometry.transform_matrix = self.transform_matrix.copy()
+        return new_geometry
+
     def apply_transformation(self, matrix: np.ndarray):
         """Aplicar transformación a la geometría"""
         self.transform_matrix = matrix @ self.transform_matrix
-    
+
     def get_bounding_box(self) -> Tuple[Vector3D, Vector3D]:
         """Obtener caja delimitadora"""
-        if not self.vertices:
+        if len(self.vertex_array) == 0:
             return Vector3D(), Vector3D()
-        
-        min_point = Vector3D(float('inf'), float('inf'), float('inf'))
-        max_point = Vector3D(float('-inf'), float('-inf'), float('-inf'))
-        
-        for vertex in self.vertices:
-            min_point.x = min(min_point.x, vertex.x)
-            min_point.y = min(min_point.y, vertex.y)
-            min_point.z = min(min_point.z, vertex.z)
-            max_point.x = max(max_point.x, vertex.x)
-            max_point.y = max(max_point.y, vertex.y)
-            max_point.z = max(max_point.z, vertex.z)
-        
-        return min_point, max_point
+
+        return Vector3D(*self.vertex_array.min(axis=0)), Vector3D(*self.vertex_array.max(axis=0))
 
 class ArchitecturalElements:
     """Clase para crear elementos arquitectónicos básicos"""
@@ -606,18 +777,12 @@ class Professional3DModeler:
             color = colors[i % len(colors)]
             
             # Extraer coordenadas
-            x = [v.x for v in geometry.vertices]
-            y = [v.y for v in geometry.vertices]
-            z = [v.z for v in geometry.vertices]
+            x, y, z = geometry.vertex_array.T
             
             if show_wireframe:
-                # Dibujar wireframe
-                for face in geometry.faces:
-                    if len(face) >= 3:
-                        face_x = [geometry.vertices[idx].x for idx in face] + [geometry.vertices[face[0]].x]
-                        face_y = [geometry.vertices[idx].y for idx in face] + [geometry.vertices[face[0]].y]
-                        face_z = [geometry.vertices[idx].z for idx in face] + [geometry.vertices[face[0]].z]
-                        ax.plot(face_x, face_y, face_z, color=color, alpha=0.6)
+                # Dibujar wireframe (todas las caras en una sola línea separada por NaN)
+                face_x, face_y, face_z = geometry.outline_coords((0, 1, 2))
+                ax.plot(face_x, face_y, face_z, color=color, alpha=0.6)
             else:
                 # Scatter plot de vértices
                 ax.scatter(x, y, z, c=color, s=20, alpha=0.8, label=geometry.name)
@@ -644,9 +809,7 @@ class Professional3DModeler:
             color = colors[i % len(colors)]
             
             # Extraer coordenadas
-            x = [v.x for v in geometry.vertices]
-            y = [v.y for v in geometry.vertices]
-            z = [v.z for v in geometry.vertices]
+            x, y, z = geometry.vertex_array.T
             
             # Agregar vértices como scatter3d
             fig.add_trace(go.Scatter3d(
@@ -661,17 +824,10 @@ class Professional3DModeler:
             if len(geometry.faces) > 0 and len(geometry.vertices) > 3:
                 try:
                     # Convertir caras a formato de triángulos
-                    triangles = []
-                    for face in geometry.faces:
-                        if len(face) >= 3:
-                            # Triangular caras con más de 3 vértices
-                            for j in range(1, len(face) - 1):
-                                triangles.append([face[0], face[j], face[j+1]])
+                    triangles = geometry.triangulate_fan()
                     
-                    if triangles:
-                        i_indices = [t[0] for t in triangles]
-                        j_indices = [t[1] for t in triangles]
-                        k_indices = [t[2] for t in triangles]
+                    if len(triangles):
+                        i_indices, j_indices, k_indices = triangles.T
                         
                         fig.add_trace(go.Mesh3d(
                             x=x, y=y, z=z,
@@ -714,8 +870,8 @@ class Professional3DModeler:
                 f.write(f"o {geometry.name}\n")
                 
                 # Escribir vértices
-                for vertex in geometry.vertices:
-                    f.write(f"v {vertex.x} {vertex.y} {vertex.z}\n")
+                for x, y, z in geometry.vertex_array.tolist():
+                    f.write(f"v {x} {y} {z}\n")
                 
                 # Escribir caras
                 for face in geometry.faces:
@@ -723,7 +879,7 @@ class Professional3DModeler:
                         face_str = "f " + " ".join([str(idx + vertex_offset) for idx in face])
                         f.write(face_str + "\n")
                 
-                vertex_offset += len(geometry.vertices)
+                vertex_offset += len(geometry.vertex_array)
                 f.write("\n")
         
         print(f"Modelo exportado a: {filename}")
@@ -740,8 +896,8 @@ class Professional3DModeler:
         for geometry in self.geometries:
             geo_data = {
                 'name': geometry.name,
-                'vertices': [[v.x, v.y, v.z] for v in geometry.vertices],
-                'faces': geometry.faces,
+                'vertices': geometry.vertex_array.tolist(),
+                'faces': geometry.faces.copy(),
                 'materials': geometry.materials,
                 'transform_matrix': geometry.transform_matrix.tolist()
             }
@@ -764,8 +920,8 @@ class Professional3DModeler:
         for geo_data in model_data.get('geometries', []):
             geometry = Geometry3D(geo_data['name'])
             
-            # Reconstruir vértices
-            geometry.vertices = [Vector3D(v[0], v[1], v[2]) for v in geo_data['vertices']]
+            # Reconstruir vértices directamente como array
+            geometry.vertex_array = np.array(geo_data['vertices'], dtype=np.float64)
             geometry.faces = geo_data['faces']
             geometry.materials = geo_data.get('materials', {})
             geometry.transform_matrix = np.array(geo_data.get('transform_matrix', np.identity(4).tolist()))
@@ -785,16 +941,13 @@ class Professional3DModeler:
             
             if view == 'top':
                 # Vista superior (proyección X-Y)
-                x_coords = [v.x for v in geometry.vertices]
-                y_coords = [v.y for v in geometry.vertices]
+                x_coords = geometry.vertex_array[:, 0]
+                y_coords = geometry.vertex_array[:, 1]
                 ax.scatter(x_coords, y_coords, c=color, s=30, alpha=0.7, label=geometry.name)
                 
                 # Dibujar contornos de las caras
-                for face in geometry.faces:
-                    if len(face) >= 3:
-                        face_x = [geometry.vertices[idx].x for idx in face] + [geometry.vertices[face[0]].x]
-                        face_y = [geometry.vertices[idx].y for idx in face] + [geometry.vertices[face[0]].y]
-                        ax.plot(face_x, face_y, color=color, alpha=0.5, linewidth=1)
+                face_x, face_y = geometry.outline_coords((0, 1))
+                ax.plot(face_x, face_y, color=color, alpha=0.5, linewidth=1)
                 
                 ax.set_xlabel('X')
                 ax.set_ylabel('Y')
@@ -802,15 +955,12 @@ class Professional3DModeler:
             
             elif view == 'front':
                 # Vista frontal (proyección X-Z)
-                x_coords = [v.x for v in geometry.vertices]
-                z_coords = [v.z for v in geometry.vertices]
+                x_coords = geometry.vertex_array[:, 0]
+                z_coords = geometry.vertex_array[:, 2]
                 ax.scatter(x_coords, z_coords, c=color, s=30, alpha=0.7, label=geometry.name)
                 
-                for face in geometry.faces:
-                    if len(face) >= 3:
-                        face_x = [geometry.vertices[idx].x for idx in face] + [geometry.vertices[face[0]].x]
-                        face_z = [geometry.vertices[idx].z for idx in face] + [geometry.vertices[face[0]].z]
-                        ax.plot(face_x, face_z, color=color, alpha=0.5, linewidth=1)
+                face_x, face_z = geometry.outline_coords((0, 2))
+                ax.plot(face_x, face_z, color=color, alpha=0.5, linewidth=1)
                 
                 ax.set_xlabel('X')
                 ax.set_ylabel('Z')
@@ -818,15 +968,12 @@ class Professional3DModeler:
             
             elif view == 'side':
                 # Vista lateral (proyección Y-Z)
-                y_coords = [v.y for v in geometry.vertices]
-                z_coords = [v.z for v in geometry.vertices]
+                y_coords = geometry.vertex_array[:, 1]
+                z_coords = geometry.vertex_array[:, 2]
                 ax.scatter(y_coords, z_coords, c=color, s=30, alpha=0.7, label=geometry.name)
                 
-                for face in geometry.faces:
-                    if len(face) >= 3:
-                        face_y = [geometry.vertices[idx].y for idx in face] + [geometry.vertices[face[0]].y]
-                        face_z = [geometry.vertices[idx].z for idx in face] + [geometry.vertices[face[0]].z]
-                        ax.plot(face_y, face_z, color=color, alpha=0.5, linewidth=1)
+                face_y, face_z = geometry.outline_coords((1, 2))
+                ax.plot(face_y, face_z, color=color, alpha=0.5, linewidth=1)
                 
                 ax.set_xlabel('Y')
                 ax.set_ylabel('Z')
@@ -848,20 +995,14 @@ class Professional3DModeler:
             volume = 0.0
             
             # Método simplificado para calcular volumen usando triangulación
-            if len(geometry.vertices) >= 4 and len(geometry.faces) > 0:
+            if len(geometry.vertex_array) >= 4 and len(geometry.faces) > 0:
                 try:
-                    # Crear malla con trimesh para cálculo preciso
-                    vertices_array = np.array([[v.x, v.y, v.z] for v in geometry.vertices])
-                    
                     # Triangular todas las caras
-                    triangles = []
-                    for face in geometry.faces:
-                        if len(face) >= 3:
-                            for j in range(1, len(face) - 1):
-                                triangles.append([face[0], face[j], face[j+1]])
+                    triangles = geometry.triangulate_fan()
                     
-                    if triangles:
-                        mesh = trimesh.Trimesh(vertices=vertices_array, faces=triangles)
+                    if len(triangles):
+                        # Crear malla con trimesh para cálculo preciso
+                        mesh = trimesh.Trimesh(vertices=geometry.vertex_array, faces=triangles)
                         if mesh.is_volume:
                             volume = mesh.volume
                         else:
@@ -880,28 +1021,14 @@ class Professional3DModeler:
         areas = {}
         
         for geometry in self.geometries:
-            total_area = 0.0
+            # Triangular las caras y sumar áreas de todos los triángulos a la vez
+            triangles = geometry.vertex_array[geometry.triangulate_fan()]
+            edge1 = triangles[:, 1] - triangles[:, 0]
+            edge2 = triangles[:, 2] - triangles[:, 0]
             
-            for face in geometry.faces:
-                if len(face) >= 3:
-                    # Calcular área de cada cara
-                    face_vertices = [geometry.vertices[idx] for idx in face]
-                    
-                    # Triangular la cara y sumar áreas
-                    for j in range(1, len(face_vertices) - 1):
-                        v1 = face_vertices[0]
-                        v2 = face_vertices[j]
-                        v3 = face_vertices[j + 1]
-                        
-                        # Producto cruzado para área del triángulo
-                        edge1 = v2 - v1
-                        edge2 = v3 - v1
-                        cross = edge1.cross(edge2)
-                        triangle_area = cross.magnitude() / 2.0
-                        
-                        total_area += triangle_area
-            
-            areas[geometry.name] = total_area
+            # Producto cruzado para área de cada triángulo
+            cross = np.cross(edge1, edge2)
+            areas[geometry.name] = float(np.linalg.norm(cross, axis=1).sum() / 2.0)
         
         return areas
     
@@ -911,14 +1038,10 @@ class Professional3DModeler:
         for geometry in self.geometries:
             if geometry.name == geometry_name:
                 # Aplicar transformación a todos los vértices
-                transformed_vertices = []
-                for vertex in geometry.vertices:
-                    # Convertir a coordenadas homogéneas
-                    homogeneous = np.array([vertex.x, vertex.y, vertex.z, 1.0])
-                    transformed = transformation_matrix @ homogeneous
-                    transformed_vertices.append(Vector3D(transformed[0], transformed[1], transformed[2]))
+                vertices = geometry.vertex_array
+                transformed = vertices @ transformation_matrix[:3, :3].T + transformation_matrix[:3, 3]
                 
-                geometry.vertices = transformed_vertices
+                geometry.vertex_array = transformed
                 geometry.apply_transformation(transformation_matrix)
                 break
     
@@ -938,9 +1061,6 @@ class Professional3DModeler:
             print(f"Geometría '{geometry_name}' no encontrada")
             return frames
         
-        # Guardar vértices originales
-        original_vertices = [Vector3D(v.x, v.y, v.z) for v in target_geometry.vertices]
-        
         # Generar frames interpolados
         for frame in range(frame_count):
             # Crear copia del modelo
@@ -949,12 +1069,7 @@ class Professional3DModeler:
             
             # Copiar todas las geometrías
             for geometry in self.geometries:
-                new_geometry = Geometry3D(geometry.name)
-                new_geometry.vertices = [Vector3D(v.x, v.y, v.z) for v in geometry.vertices]
-                new_geometry.faces = geometry.faces.copy()
-                new_geometry.materials = geometry.materials.copy()
-                new_geometry.transform_matrix = geometry.transform_matrix.copy()
-                frame_model.add_geometry(new_geometry)
+                frame_model.add_geometry(geometry.copy())
             
             # Aplicar interpolación de transformaciones
             t = frame / (frame_count - 1) if frame_count > 1 else 0
@@ -978,35 +1093,34 @@ class Professional3DModeler:
         cross_sections = []
         
         plane_normal = plane_normal.normalize()
+        normal = plane_normal.to_array()
+        
+        # Aristas de todas las caras de todas las geometrías
+        starts, edge_dirs = [], []
+        for geometry in self.geometries:
+            edge_start, edge_end = geometry.edge_arrays()
+            starts.append(geometry.vertex_array[edge_start])
+            edge_dirs.append(geometry.vertex_array[edge_end] - geometry.vertex_array[edge_start])
+        starts = np.concatenate(starts) if starts else np.empty((0, 3))
+        edge_dirs = np.concatenate(edge_dirs) if edge_dirs else np.empty((0, 3))
+        
+        # Evitar división por cero
+        denominator = edge_dirs @ normal
+        valid = np.abs(denominator) > 1e-6
+        starts, edge_dirs, denominator = starts[valid], edge_dirs[valid], denominator[valid]
         
         for distance in plane_distances:
-            section_points = []
+            # Punto de referencia en el plano
+            plane_point = Vector3D(0, 0, distance) if plane_normal.z != 0 else Vector3D(0, distance, 0) if plane_normal.y != 0 else Vector3D(distance, 0, 0)
             
-            for geometry in self.geometries:
-                for face in geometry.faces:
-                    if len(face) >= 3:
-                        # Verificar intersección de cada arista de la cara con el plano
-                        for i in range(len(face)):
-                            v1 = geometry.vertices[face[i]]
-                            v2 = geometry.vertices[face[(i + 1) % len(face)]]
-                            
-                            # Calcular intersección línea-plano
-                            edge_dir = v2 - v1
-                            
-                            # Evitar división por cero
-                            denominator = edge_dir.dot(plane_normal)
-                            if abs(denominator) > 1e-6:
-                                # Punto de referencia en el plano
-                                plane_point = Vector3D(0, 0, distance) if plane_normal.z != 0 else Vector3D(0, distance, 0) if plane_normal.y != 0 else Vector3D(distance, 0, 0)
-                                
-                                t = (plane_point - v1).dot(plane_normal) / denominator
-                                
-                                # Verificar si la intersección está en el segmento
-                                if 0 <= t <= 1:
-                                    intersection = v1 + edge_dir * t
-                                    section_points.append(intersection)
+            # Calcular intersección línea-plano para todas las aristas
+            t = (plane_point.to_array() - starts) @ normal / denominator
+            
+            # Verificar si la intersección está en el segmento
+            inside = (t >= 0) & (t <= 1)
+            intersections = starts[inside] + edge_dirs[inside] * t[inside, None]
             
-            cross_sections.append(section_points)
+            cross_sections.append([Vector3D(x, y, z) for x, y, z in intersections.tolist()])
         
         return cross_sections
     
@@ -1014,30 +1128,22 @@ class Professional3DModeler:
         """Optimizar malla reduciendo número de vértices"""
         for geometry in self.geometries:
             if geometry.name == geometry_name:
-                if len(geometry.vertices) > target_vertices:
+                original_count = len(geometry.vertex_array)
+                if original_count > target_vertices:
                     # Simplificación básica: mantener cada n-ésimo vértice
-                    step = len(geometry.vertices) // target_vertices
-                    optimized_vertices = geometry.vertices[::max(1, step)]
+                    step = max(1, original_count // target_vertices)
+                    optimized_vertices = geometry.vertex_array[::step]
                     
-                    # Reajustar índices de caras
-                    vertex_mapping = {i * step: i for i in range(len(optimized_vertices))}
-                    optimized_faces = []
+                    # Reajustar índices de caras al vértice conservado más cercano
+                    quotient, remainder = np.divmod(geometry.face_indices, step)
+                    new_indices = np.minimum(quotient + (2 * remainder > step),
+                                             len(optimized_vertices) - 1)
                     
-                    for face in geometry.faces:
-                        new_face = []
-                        for vertex_idx in face:
-                            closest_idx = min(vertex_mapping.keys(), 
-                                             key=lambda x: abs(x - vertex_idx))
-                            if closest_idx in vertex_mapping:
-                                new_face.append(vertex_mapping[closest_idx])
-                        
-                        if len(new_face) >= 3:
-                            optimized_faces.append(new_face)
-                    
-                    geometry.vertices = optimized_vertices
-                    geometry.faces = optimized_faces
+                    geometry.vertex_array = optimized_vertices
+                    geometry.set_face_arrays(new_indices, geometry.face_offsets)
+                    geometry.set_face_arrays(*geometry.polygon_arrays())
                     
-                    print(f"Malla optimizada: {geometry_name} - Vértices reducidos de {len(geometry.vertices)} a {len(optimized_vertices)}")
+                    print(f"Malla optimizada: {geometry_name} - Vértices reducidos de {original_count} a {len(optimized_vertices)}")
                 break
     
     def generate_technical_drawing(self, scale: float = 1.0, 
@@ -1084,24 +1190,21 @@ class Professional3DModeler:
             
             # Seleccionar coordenadas según la vista
             if view == 'top':
-                coords = [(v.x * scale, v.y * scale) for v in geometry.vertices]
+                axes = (0, 1)
                 ax.set_xlabel('X (mm)')
                 ax.set_ylabel('Y (mm)')
             elif view == 'front':
-                coords = [(v.x * scale, v.z * scale) for v in geometry.vertices]
+                axes = (0, 2)
                 ax.set_xlabel('X (mm)')
                 ax.set_ylabel('Z (mm)')
             elif view == 'side':
-                coords = [(v.y * scale, v.z * scale) for v in geometry.vertices]
+                axes = (1, 2)
                 ax.set_xlabel('Y (mm)')
                 ax.set_ylabel('Z (mm)')
             
             # Dibujar contornos
-            for face in geometry.faces:
-                if len(face) >= 3:
-                    face_coords = [coords[idx] for idx in face] + [coords[face[0]]]
-                    x_coords, y_coords = zip(*face_coords)
-                    ax.plot(x_coords, y_coords, color=color, linewidth=1.5, alpha=0.8)
+            x_coords, y_coords = geometry.outline_coords(axes, scale)
+            ax.plot(x_coords, y_coords, color=color, linewidth=1.5, alpha=0.8)
         
         ax.grid(True, alpha=0.3)
         ax.set_aspect('equal')
@@ -1123,19 +1226,10 @@ class Professional3DModeler:
         for i, geometry in enumerate(self.geometries):
             color = colors[i % len(colors)]
             
-            # Transformar vértices a vista isométrica
-            iso_coords = []
-            for vertex in geometry.vertices:
-                vertex_3d = np.array([vertex.x * scale, vertex.y * scale, vertex.z * scale])
-                iso_point = iso_matrix @ vertex_3d
-                iso_coords.append((iso_point[0], iso_point[1]))
-            
-            # Dibujar caras
-            for face in geometry.faces:
-                if len(face) >= 3:
-                    face_coords = [iso_coords[idx] for idx in face] + [iso_coords[face[0]]]
-                    x_coords, y_coords = zip(*face_coords)
-                    ax.plot(x_coords, y_coords, color=color, linewidth=1.2, alpha=0.7)
+            # Transformar vértices a vista isométrica y dibujar caras
+            x_coords, y_coords, z_coords = geometry.outline_coords((0, 1, 2), scale)
+            iso_x, iso_y = iso_matrix @ np.stack([x_coords, y_coords, z_coords])
+            ax.plot(iso_x, iso_y, color=color, linewidth=1.2, alpha=0.7)
         
         ax.set_aspect('equal')
         ax.grid(True, alpha=0.2)
@@ -1146,36 +1240,33 @@ class Professional3DModeler:
             return
         
         # Obtener límites del modelo
-        all_vertices = []
-        for geometry in self.geometries:
-            all_vertices.extend(geometry.vertices)
+        all_vertices = np.concatenate([geometry.vertex_array for geometry in self.geometries]) * scale
         
         if view == 'top':
-            x_coords = [v.x * scale for v in all_vertices]
-            y_coords = [v.y * scale for v in all_vertices]
+            x_coords, y_coords = all_vertices[:, 0], all_vertices[:, 1]
         elif view == 'front':
-            x_coords = [v.x * scale for v in all_vertices]
-            y_coords = [v.z * scale for v in all_vertices]
+            x_coords, y_coords = all_vertices[:, 0], all_vertices[:, 2]
         elif view == 'side':
-            x_coords = [v.y * scale for v in all_vertices]
-            y_coords = [v.z * scale for v in all_vertices]
+            x_coords, y_coords = all_vertices[:, 1], all_vertices[:, 2]
         
-        if x_coords and y_coords:
-            x_range = max(x_coords) - min(x_coords)
-            y_range = max(y_coords) - min(y_coords)
+        if len(x_coords) and len(y_coords):
+            x_min, x_max = x_coords.min(), x_coords.max()
+            y_min, y_max = y_coords.min(), y_coords.max()
+            x_range = x_max - x_min
+            y_range = y_max - y_min
             
             # Agregar dimensión horizontal
-            ax.annotate('', xy=(max(x_coords), min(y_coords) - y_range * 0.1),
-                       xytext=(min(x_coords), min(y_coords) - y_range * 0.1),
+            ax.annotate('', xy=(x_max, y_min - y_range * 0.1),
+                       xytext=(x_min, y_min - y_range * 0.1),
                        arrowprops=dict(arrowstyle='<->', color='red', lw=1))
-            ax.text((max(x_coords) + min(x_coords))/2, min(y_coords) - y_range * 0.15,
+            ax.text((x_max + x_min)/2, y_min - y_range * 0.15,
                    f'{x_range:.1f}', ha='center', va='top', color='red', fontsize=10)
             
             # Agregar dimensión vertical
-            ax.annotate('', xy=(min(x_coords) - x_range * 0.1, max(y_coords)),
-                       xytext=(min(x_coords) - x_range * 0.1, min(y_coords)),
+            ax.annotate('', xy=(x_min - x_range * 0.1, y_max),
+                       xytext=(x_min - x_range * 0.1, y_min),
                        arrowprops=dict(arrowstyle='<->', color='red', lw=1))
-            ax.text(min(x_coords) - x_range * 0.15, (max(y_coords) + min(y_coords))/2,
+            ax.text(x_min - x_range * 0.15, (y_max + y_min)/2,
                    f'{y_range:.1f}', ha='right', va='center', color='red', fontsize=10, rotation=90)
 
 
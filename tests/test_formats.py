@@ -0,0 +1,252 @@
+"""Pruebas de ida y vuelta de los formatos de importación y exportación"""
+
+import json
+import struct
+
+import numpy as np
+import pytest
+
+from matrix import (ArchitecturalElements, GeometryInstance, MechanicalElements,
+                    Professional3DModeler, Transformations3D, Vector3D)
+
+
+def face_corners(geometry):
+    """Coordenadas de las esquinas de cada cara (independiente de la numeración)"""
+    vertices = geometry.vertex_array
+    offsets = geometry.face_offsets
+    return [vertices[geometry.face_indices[start:end]]
+            for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def assert_same_faces(first, second, atol=0.0):
+    first_corners, second_corners = face_corners(first), face_corners(second)
+    assert len(first_corners) == len(second_corners)
+    for a, b in zip(first_corners, second_corners):
+        np.testing.assert_allclose(a, b, atol=atol)
+
+
+def write(path, text):
+    path.write_text(text)
+    return str(path)
+
+
+@pytest.fixture
+def scene():
+    """Casa de ejemplo con UV en una pared y dos instancias de una puerta"""
+    modeler = Professional3DModeler()
+    modeler.scene_name = "Prueba"
+    modeler.metadata.update({'notes': {'faces': [[0, 1, 2]]}, 'tag': '__ndarray_0__'})
+    wall = ArchitecturalElements.create_wall(4, 3, 0.2)
+    wall.uv_array = np.random.default_rng(0).random((8, 2))
+    modeler.add_geometry(wall)
+    modeler.add_geometry(MechanicalElements.create_cylinder(0.5, 2.0, 16, Vector3D(1, 1, 0)))
+    door = ArchitecturalElements.create_door(1, 2.1, 0.05)
+    door.uv_array = np.random.default_rng(1).random((8, 2))
+    modeler.add_instance(door, Transformations3D.translation_matrix(2, 0, 0))
+    modeler.add_instance(door, Transformations3D.translation_matrix(6, 0, 0), {'color': '#FF0000'})
+    return modeler
+
+
+def assert_same_scene(original, loaded, atol=0.0):
+    assert len(loaded.geometries) == len(original.geometries)
+    for first, second in zip(original.geometries, loaded.geometries):
+        assert second.name == first.name
+        assert second.materials == first.materials
+        assert_same_faces(first, second, atol)
+
+
+# --- OBJ ---------------------------------------------------------------------
+
+def test_obj_round_trip(scene, tmp_path):
+    filename = str(tmp_path / "scene.obj")
+    scene.export_to_obj(filename, include_uvs=True)
+    loaded = Professional3DModeler()
+    loaded.import_from_obj(filename)
+    assert len(loaded.geometries) == len(scene.geometries)
+    for first, second in zip(scene.geometries, loaded.geometries):
+        assert_same_faces(first, second)
+    np.testing.assert_allclose(loaded.geometries[0].uv_array, scene.geometries[0].uv_array)
+
+
+def test_obj_negative_indices_and_full_corners(tmp_path):
+    filename = write(tmp_path / "corners.obj",
+                     "v 0 0 0\nv 1 0 0\nv 0 1 0\n"
+                     "vt 0 0\nvt 1 0\nvt 0 1\n"
+                     "vn 0 0 1\n"
+                     "f -3/-3/-1 -2/-2/-1 -1/-1/-1\n")
+    modeler = Professional3DModeler()
+    modeler.import_from_obj(filename)
+    geometry = modeler.geometries[0]
+    assert geometry.face_indices.tolist() == [0, 1, 2]
+    np.testing.assert_allclose(geometry.uv_array, [[0, 0], [1, 0], [0, 1]])
+    np.testing.assert_allclose(geometry.vertex_normals(), [[0, 0, 1]] * 3)
+
+
+def test_obj_groups_after_shared_vertex_block(tmp_path):
+    filename = write(tmp_path / "groups.obj",
+                     "v 0 0 0\nv 1 0 0\nv 0 1 0\nv 0 0 1\n"
+                     "g a\nf 1 2 3\n"
+                     "g b\nf 1 3 4\n")
+    modeler = Professional3DModeler()
+    modeler.import_from_obj(filename)
+    first, second = modeler.geometries
+    assert (first.name, second.name) == ("a", "b")
+    np.testing.assert_allclose(face_corners(first)[0], [[0, 0, 0], [1, 0, 0], [0, 1, 0]])
+    np.testing.assert_allclose(face_corners(second)[0], [[0, 0, 0], [0, 1, 0], [0, 0, 1]])
+
+
+def test_obj_trailing_comments(tmp_path):
+    filename = write(tmp_path / "comments.obj",
+                     "v 0 0 0 # origen\nv 1 0 0\nv 0 1 0\nv 1 1 0\n"
+                     "f 1 2 3 # tri\n"
+                     "f 2 4 3 #\n")
+    modeler = Professional3DModeler()
+    modeler.import_from_obj(filename)
+    geometry = modeler.geometries[0]
+    assert geometry.face_sizes.tolist() == [3, 3]
+    assert geometry.face_indices.tolist() == [0, 1, 2, 1, 3, 2]
+
+
+# --- JSON --------------------------------------------------------------------
+
+@pytest.mark.parametrize("options", [{}, {'compact': True}, {'compact': True, 'include_normals': True}])
+def test_json_round_trip(scene, tmp_path, options):
+    filename = str(tmp_path / "scene.json.gz")
+    scene.export_to_json(filename, **options)
+    loaded = Professional3DModeler()
+    loaded.import_from_json(filename)
+    assert loaded.metadata == scene.metadata
+    assert loaded.scene_name == scene.scene_name
+    assert_same_scene(scene, loaded)
+    first, second = loaded.geometries[2:]
+    assert isinstance(first, GeometryInstance) and first.prototype is second.prototype
+    for original, geometry in zip(scene.geometries, loaded.geometries):
+        if original.uv_array is None:
+            assert geometry.uv_array is None
+        else:
+            np.testing.assert_array_equal(geometry.uv_array, original.uv_array)
+
+
+def test_json_keeps_model_strings(tmp_path):
+    modeler = Professional3DModeler()
+    wall = ArchitecturalElements.create_wall(4, 3, 0.2)
+    wall.materials['label'] = '__ndarray_0__'
+    modeler.add_geometry(wall)
+    filename = str(tmp_path / "strings.json")
+    modeler.export_to_json(filename)
+    assert json.load(open(filename))['geometries'][0]['materials']['label'] == '__ndarray_0__'
+
+
+# --- Contenedor binario ------------------------------------------------------
+
+@pytest.mark.parametrize("memory_map", [True, False])
+def test_binary_round_trip(scene, tmp_path, memory_map):
+    filename = str(tmp_path / "scene.m3d")
+    scene.export_to_binary(filename)
+    loaded = Professional3DModeler()
+    loaded.import_from_binary(filename, memory_map=memory_map)
+    assert loaded.metadata == scene.metadata
+    assert_same_scene(scene, loaded)
+    first, second = loaded.geometries[2:]
+    assert first.prototype is second.prototype
+    np.testing.assert_array_equal(first.uv_array, scene.geometries[2].uv_array)
+
+
+def test_binary_overwrite_memory_mapped_source(scene, tmp_path):
+    filename = str(tmp_path / "scene.m3d")
+    scene.export_to_binary(filename)
+    loaded = Professional3DModeler()
+    loaded.import_from_binary(filename)
+    loaded.export_to_binary(filename)
+    reloaded = Professional3DModeler()
+    reloaded.import_from_binary(filename)
+    assert_same_scene(scene, reloaded)
+
+
+def test_binary_json_binary_is_lossless(scene, tmp_path):
+    scene.export_to_binary(str(tmp_path / "a.m3d"))
+    loaded = Professional3DModeler()
+    loaded.import_from_binary(str(tmp_path / "a.m3d"))
+    loaded.export_to_json(str(tmp_path / "b.json"))
+    again = Professional3DModeler()
+    again.import_from_json(str(tmp_path / "b.json"))
+    again.export_to_binary(str(tmp_path / "c.m3d"))
+    assert open(tmp_path / "a.m3d", 'rb').read() == open(tmp_path / "c.m3d", 'rb').read()
+
+
+# --- STL y PLY ---------------------------------------------------------------
+
+def scene_triangles(modeler):
+    return np.concatenate([geometry.vertex_array[geometry.get_triangles()]
+                           for geometry in modeler.geometries])
+
+
+def test_stl_round_trip(scene, tmp_path):
+    filename = str(tmp_path / "scene.stl")
+    scene.export_to_stl(filename)
+    loaded = Professional3DModeler()
+    geometry = loaded.get_geometry(loaded.import_from_stl(filename))
+    np.testing.assert_allclose(geometry.vertex_array[geometry.get_triangles()],
+                               scene_triangles(scene), atol=1e-5)
+
+
+def test_ply_round_trip(scene, tmp_path):
+    filename = str(tmp_path / "scene.ply")
+    scene.export_to_ply(filename)
+    loaded = Professional3DModeler()
+    geometry = loaded.get_geometry(loaded.import_from_ply(filename))
+    expected = [corners for original in scene.geometries for corners in face_corners(original)]
+    loaded_corners = face_corners(geometry)
+    assert len(loaded_corners) == len(expected)
+    for a, b in zip(loaded_corners, expected):
+        np.testing.assert_allclose(a, b, atol=1e-5)
+
+
+# --- GLB ---------------------------------------------------------------------
+
+def read_glb(filename):
+    data = open(filename, 'rb').read()
+    magic, version, length = struct.unpack('<4sII', data[:12])
+    assert (magic, version, length) == (b'glTF', 2, len(data))
+    json_length, json_type = struct.unpack('<II', data[12:20])
+    assert json_type == 0x4E4F534A
+    document = json.loads(data[20:20 + json_length])
+    binary_start = 20 + json_length
+    binary_length, binary_type = struct.unpack('<II', data[binary_start:binary_start + 8])
+    assert binary_type == 0x004E4942
+    return document, data[binary_start + 8:binary_start + 8 + binary_length]
+
+
+def glb_world_triangles(document, binary):
+    """Triángulos en coordenadas de mundo reconstruidos desde los nodos (sin cuantizar)"""
+    def accessor(index):
+        entry = document['accessors'][index]
+        view = document['bufferViews'][entry['bufferView']]
+        dtype = {5126: '<f4', 5123: '<u2', 5125: '<u4'}[entry['componentType']]
+        width = {'SCALAR': 1, 'VEC2': 2, 'VEC3': 3}[entry['type']]
+        start = view.get('byteOffset', 0) + entry.get('byteOffset', 0)
+        return np.frombuffer(binary, dtype, entry['count'] * width, start).reshape(entry['count'], width)
+
+    triangles = []
+    for node in document['nodes']:
+        if 'mesh' not in node:
+            continue
+        primitive = document['meshes'][node['mesh']]['primitives'][0]
+        positions = accessor(primitive['attributes']['POSITION']).astype(np.float64)
+        indices = accessor(primitive['indices']).reshape(-1, 3)
+        matrix = np.array(node.get('matrix', np.identity(4).ravel().tolist())).reshape(4, 4).T
+        world = positions @ matrix[:3, :3].T + matrix[:3, 3]
+        triangles.append(world[indices])
+    return np.concatenate(triangles)
+
+
+def test_glb_round_trip(scene, tmp_path):
+    filename = str(tmp_path / "scene.glb")
+    scene.export_to_glb(filename)
+    document, binary = read_glb(filename)
+    mesh_nodes = [node for node in document['nodes'] if 'mesh' in node]
+    assert len(mesh_nodes) == len(scene.geometries)
+    # Las dos instancias comparten los accesores de su prototipo
+    first, second = (document['meshes'][node['mesh']]['primitives'][0] for node in mesh_nodes[2:])
+    assert first['attributes'] == second['attributes']
+    np.testing.assert_allclose(glb_world_triangles(document, binary), scene_triangles(scene), atol=1e-5)